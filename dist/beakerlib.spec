@@ -104,12 +104,14 @@ could be used when writing operating system level integration tests.
 %files
 %dir %{_datadir}/%{name}
 %dir %{_datadir}/%{name}/xslt-templates
+%dir %{_datadir}/%{name}/python
 %dir %{_pkgdocdir}
 %dir %{_pkgdocdir}/examples
 %dir %{_pkgdocdir}/examples/*
 %{_datadir}/%{name}/dictionary.vim
 %{_datadir}/%{name}/*.sh
 %{_datadir}/%{name}/xslt-templates/*
+%{_datadir}/%{name}/python/*
 %{_bindir}/%{name}-*
 %{_mandir}/man1/%{name}*1*
 %doc %{_pkgdocdir}/*
@@ -135,6 +135,26 @@ Journal in XML format, requires python. This dependency can be avoided if the te
 
 XML journal can be transformed through XSLT template. Which template is used is configurable by setting BEAKERLIB_JOURNAL variable. Value can be either filename in which case beakerlib will try to use $INSTALL_DIR/xslt-template/$filename (e.g.: /usr/share/beakerlib/xstl-templates/xunit.xsl) or it can be path to a template anywhere on the system.
 
+=head3 Journal service
+
+If BEAKERLIB_JOURNAL_SERVICE variable is set to 1, rlJournalStart starts a journal service, a python process which receives journal records from the test, writes them to the metafile and keeps the journal converted, so journal.xml is created instantly. This saves execution of base64 and python for each record and journal update. If the service is not running any more, records are written directly to the metafile as usual.
+
+=head3 Journal statistics
+
+If BEAKERLIB_JOURNAL_STATS variable is set to a file name, each creation of journal.xml appends a line of JSON to the file with wall and CPU time spent in stages of the conversion (read, parse, decode, create, build, xslt, save, checkpoint), numbers of records, bytes and elements and peak RSS of the converter in KiB. Value '-' writes the line to standard error output instead. The journal service reports statistics collected since its start. Measuring slows the conversion down.
+
+=head3 Phase index
+
+If BEAKERLIB_JOURNAL_INDEX variable is set to 1, each creation of journal.xml writes also journal.index, a JSON file with byte range of each phase of the log in journal.xml together with its type, name and result. A single phase can be then read without parsing the whole journal, e.g. by 'beakerlib-journalling --journal journal.xml --index journal.index --phase NAME'. The index is not created if the journal is transformed by XSLT.
+
+=head3 Following the journal
+
+Progress of a running test can be followed by 'beakerlib-journalling --metafile journal.meta --follow EVENTS', which writes a line of JSON to file EVENTS, or standard output if it is '-', for each start and end of a phase and for each test and metric in a phase, as soon as the record is written to the metafile. EVENTS may be a FIFO. Records already in the metafile are reported first and the metafile is followed until it is removed.
+
+=head3 Metafile format
+
+Records of the journal are kept in journal.meta with values encoded in base64. If BEAKERLIB_METAFILE_FORMAT variable is set to 'compact' when the metafile is created, a length-prefixed format with raw values is used instead, which makes the metafile smaller and its conversion faster. Format of an existing metafile is kept.
+
 =head2 TestResults
 
 Overall results of the test in a 'sourceable' form. Each line contains a pair VAR=VALUE. All variable names have 'TESTRESULT_' prefix.
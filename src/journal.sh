@@ -107,6 +107,7 @@ rlJournalStart(){
 
     # set global internal BeakerLib journal and metafile variables
     export __INTERNAL_BEAKERLIB_JOURNAL="$BEAKERLIB_DIR/journal.xml"
+    export __INTERNAL_BEAKERLIB_JOURNAL_INDEX="$BEAKERLIB_DIR/journal.index"
     export __INTERNAL_BEAKERLIB_METAFILE="$BEAKERLIB_DIR/journal.meta"
     export __INTERNAL_BEAKERLIB_JOURNAL_TXT="$BEAKERLIB_DIR/journal.txt"
     export __INTERNAL_BEAKERLIB_JOURNAL_COLORED="$BEAKERLIB_DIR/journal_colored.txt"
@@ -123,12 +124,25 @@ rlJournalStart(){
       __INTERNAL_LogText "could not write to BEAKERLIB_DIR $BEAKERLIB_DIR" FATAL
       exit 1
     }
+    # format of the metafile is given by its first line
+    if [[ "$BEAKERLIB_METAFILE_FORMAT" == "compact" && ! -s "$__INTERNAL_BEAKERLIB_METAFILE" ]]; then
+      echo "#beakerlib-metafile compact" > "$__INTERNAL_BEAKERLIB_METAFILE"
+    fi
+    local first_line=''
+    read -r first_line < "$__INTERNAL_BEAKERLIB_METAFILE"
+    export __INTERNAL_METAFILE_COMPACT=''
+    [[ "$first_line" == "#beakerlib-metafile compact" ]] && __INTERNAL_METAFILE_COMPACT=1
 
     # Initialization of variables holding current state of the test
     export __INTERNAL_METAFILE_INDENT_LEVEL=0
     __INTERNAL_PHASE_TYPE=()
     __INTERNAL_PHASE_NAME=()
     export __INTERNAL_PERSISTENT_DATA="$BEAKERLIB_DIR/PersistentData"
+    export __INTERNAL_PERSISTENT_DELTA="$BEAKERLIB_DIR/PersistentData.delta"
+    # force loading of the snapshot, it exists after a reboot
+    __INTERNAL_PERSISTENT_GENERATION=''
+    __INTERNAL_PHASES_FINGERPRINT=''
+    __INTERNAL_ASSERTS_FINGERPRINT=''
     export __INTERNAL_TEST_RESULTS="$BEAKERLIB_DIR/TestResults"
     export __INTERNAL_ASSERT_STATUSES="$BEAKERLIB_DIR/ASSERT_STATUSES"
     export __INTERNAL_PHASE_STATUSES="$BEAKERLIB_DIR/PHASE_STATUSES"
@@ -169,6 +183,7 @@ rlJournalStart(){
 
     # Check BEAKERLIB_JOURNAL parameter
     [ -n "$BEAKERLIB_JOURNAL" ] && __INTERNAL_JournalParamCheck
+    __INTERNAL_JournalServiceStart
 
     # final cleanup file (atomic updates)
     export __INTERNAL_CLEANUP_FINAL="$BEAKERLIB_DIR/cleanup.sh"
@@ -281,7 +296,11 @@ rlJournalEnd(){
         rlLogDebug "Deleting temporary file(s) ${tmp_LOG// /, }"
     fi
 
-    echo "#End of metafile" >> "$__INTERNAL_BEAKERLIB_METAFILE"
+    if __INTERNAL_JournalServiceAlive; then
+      __INTERNAL_JournalServiceSend line "#End of metafile"
+    else
+      echo "#End of metafile" >> "$__INTERNAL_BEAKERLIB_METAFILE"
+    fi
 
     __INTERNAL_PrintFootLog $__INTERNAL_STARTTIME \
                             $__INTERNAL_ENDTIME \
@@ -293,6 +312,7 @@ rlJournalEnd(){
                             "($__INTERNAL_TEST_NAME)"
 
     __INTERNAL_JournalXMLCreate
+    __INTERNAL_JournalServiceStop
     __INTERNAL_TestResultsSave "complete"
 }
 
@@ -306,6 +326,8 @@ rlJournalEnd(){
 #=head3 __INTERNAL_JournalXMLCreate
 #
 #Create XML version of the journal from internal structure.
+#Only records added since the previous run are converted, the state of the
+#conversion is kept in the journal.meta.checkpoint directory.
 #
 #    __INTERNAL_JournalXMLCreate
 #
@@ -313,21 +335,27 @@ rlJournalEnd(){
 
 __INTERNAL_JournalXMLCreate() {
     local res=0
+    local index=()
+    [[ "$BEAKERLIB_JOURNAL_INDEX" == "1" ]] && index=(--index "$__INTERNAL_BEAKERLIB_JOURNAL_INDEX")
     [[ "$BEAKERLIB_JOURNAL" == "0" ]] || {
-      if which python &> /dev/null; then
-        $__INTERNAL_JOURNALIST $__INTERNAL_XSLT --metafile \
-          "$__INTERNAL_BEAKERLIB_METAFILE" --journal "$__INTERNAL_BEAKERLIB_JOURNAL"
+      if __INTERNAL_JournalServiceAlive && __INTERNAL_JournalServiceSend render && \
+         __INTERNAL_JournalServiceReply; then
+        res=$__INTERNAL_JOURNAL_SERVICE_RESULT
+      elif which python &> /dev/null; then
+        $__INTERNAL_JOURNALIST $__INTERNAL_XSLT --checkpoint --metafile \
+          "$__INTERNAL_BEAKERLIB_METAFILE" --journal "$__INTERNAL_BEAKERLIB_JOURNAL" "${index[@]}" \
+          ${BEAKERLIB_JOURNAL_STATS:+--stats "$BEAKERLIB_JOURNAL_STATS"}
         res=$?
-        if [[ $res -eq 2 ]]; then
-          rlLogWarning "cannot create journal.xml due to missing some python module"
-        elif [[ $res -eq 3 ]]; then
-          rlLogWarning "cannot create journal.xml due to missing python lxml module"
-        elif [[ $res -ne 0 ]]; then
-          rlLogError "journal.xml creation failed!"
-        fi
       else
         rlLogWarning "cannot create journal.xml due to missing python interpreter"
-        let res++
+        return 1
+      fi
+      if [[ $res -eq 2 ]]; then
+        rlLogWarning "cannot create journal.xml due to missing some python module"
+      elif [[ $res -eq 3 ]]; then
+        rlLogWarning "cannot create journal.xml due to missing python lxml module"
+      elif [[ $res -ne 0 ]]; then
+        rlLogError "journal.xml creation failed!"
       fi
     }
     return $res
@@ -520,6 +548,7 @@ __INTERNAL_TestResultsSave(){
         ;;
     esac
 
+    __INTERNAL_UpdateFingerprints
     cat > "$__INTERNAL_TEST_RESULTS" <<EOF
 # This is a result file of the test in a 'sourceable' form.
 # Description of individual variables can be found in beakerlib man page.
@@ -534,8 +563,8 @@ TESTRESULT_STARTTIME=$__INTERNAL_STARTTIME
 TESTRESULT_ENDTIME=$__INTERNAL_ENDTIME
 TESTRESULT_DURATION=$__INTERNAL_DURATION
 TESTRESULT_BEAKERLIB_DIR=$BEAKERLIB_DIR
-TESTRESULT_PHASES_FINGERPRINT=$(__INTERNAL_GetPhasesFingerprint)
-TESTRESULT_ASSERTS_FINGERPRINT=$(__INTERNAL_GetAssertsFingerprint)
+TESTRESULT_PHASES_FINGERPRINT=${__INTERNAL_PHASES_FINGERPRINT#* }
+TESTRESULT_ASSERTS_FINGERPRINT=${__INTERNAL_ASSERTS_FINGERPRINT#* }
 
 EOF
 }
@@ -726,14 +755,8 @@ rljAddTest(){
         echo "$2" >> $__INTERNAL_ASSERT_STATUSES
         __INTERNAL_LogText "$1" "$2"
         __INTERNAL_WriteToMetafile test --message "$1" ${3:+--command "$3"} -- "$2" >&2
-        if [ "$2" == "PASS" ]; then
-            let __INTERNAL_PHASE_PASSED++
-        else
-            let __INTERNAL_TEST_STATE++
-            let __INTERNAL_PHASE_FAILED++
-        fi
+        __INTERNAL_PersistentDataAppend test "$2"
     fi
-    __INTERNAL_PersistentDataSave
 }
 
 rljAddMetric(){
@@ -752,10 +775,9 @@ rljAddMetric(){
         let res++
     else
         rlLogDebug "rljAddMetric: Storing metric $MID with value $VALUE and tolerance $TOLERANCE"
-        __INTERNAL_PHASE_METRICS="$__INTERNAL_PHASE_METRICS $MID "
+        __INTERNAL_PersistentDataAppend metric "$MID"
         __INTERNAL_WriteToMetafile metric --type "$1" --name "$MID" \
             --value "$VALUE" --tolerance "$TOLERANCE" >&2 || let res++
-        __INTERNAL_PersistentDataSave
     fi
     return $?
 }
@@ -971,6 +993,7 @@ __INTERNAL_WriteToMetafile(){
     local lineraw=''
     local ARGS=("$@")
     local element=''
+    local values=()
 
     [[ "${1:0:2}" != "--" ]] && {
       local element="$1"
@@ -980,13 +1003,13 @@ __INTERNAL_WriteToMetafile(){
     while [[ $# -gt 0 ]]; do
       case $1 in
       --)
-        line+=" -- $(echo -n "$2" | base64 -w 0)"
+        values+=("--" "$2")
         printf -v lineraw "%s -- %q" "$lineraw" "$2"
         shift 2
         break
         ;;
       --*)
-        line+=" $1=$(echo -n "$2" | base64 -w 0)"
+        values+=("$1" "$2")
         printf -v lineraw "%s %s=%q" "$lineraw" "$1" "$2"
         shift
         ;;
@@ -1006,12 +1029,121 @@ __INTERNAL_WriteToMetafile(){
 
     printf -v indent '%*s' $__INTERNAL_METAFILE_INDENT_LEVEL
 
-    line="$indent${element:+$element }--timestamp=${__INTERNAL_TIMESTAMP}$line"
+    line="$indent${element:+$element }--timestamp=${__INTERNAL_TIMESTAMP}"
     lineraw="$indent${element:+$element }--timestamp=${__INTERNAL_TIMESTAMP}$lineraw"
+    # compact record has indent level, element or '-' and timestamp in its head
+    [[ -n "$__INTERNAL_METAFILE_COMPACT" ]] && \
+      line="$__INTERNAL_METAFILE_INDENT_LEVEL ${element:--} ${__INTERNAL_TIMESTAMP}"
+    # values are encoded and written by the journal service if it is running
+    if __INTERNAL_JournalServiceAlive; then
+      [[ -n "$DEBUG" ]] && __INTERNAL_JournalServiceSend line "#${lineraw:1}"
+      __INTERNAL_JournalServiceSend record "$line" "${values[@]}"
+      return
+    fi
+    if [[ -n "$__INTERNAL_METAFILE_COMPACT" ]]; then
+      # head with lengths of the values in bytes is followed by the raw values
+      local LC_ALL=C
+      local raw=''
+      for ((arg=0; arg<${#values[@]}; arg+=2)); do
+        line+=" ${values[arg]:2}=${#values[arg+1]}"
+        raw+="${values[arg+1]}"
+      done
+      [[ -n "$DEBUG" ]] && echo "#${lineraw:1}" >> "$__INTERNAL_BEAKERLIB_METAFILE"
+      printf '%s\n%s\n' "$line" "$raw" >> "$__INTERNAL_BEAKERLIB_METAFILE"
+      return
+    fi
+    for ((arg=0; arg<${#values[@]}; arg+=2)); do
+      if [[ "${values[arg]}" == "--" ]]; then
+        line+=" -- $(echo -n "${values[arg+1]}" | base64 -w 0)"
+      else
+        line+=" ${values[arg]}=$(echo -n "${values[arg+1]}" | base64 -w 0)"
+      fi
+    done
     [[ -n "$DEBUG" ]] && echo "#${lineraw:1}" >> "$__INTERNAL_BEAKERLIB_METAFILE"
     echo "$line" >> "$__INTERNAL_BEAKERLIB_METAFILE"
 }
 
+
+# Journal service is a long-lived beakerlib-journalling process which encodes
+# records, writes them to the metafile and keeps the journal converted, so
+# neither base64 nor python is executed for each record and journal update.
+# It is started by rlJournalStart if BEAKERLIB_JOURNAL_SERVICE is set to 1.
+# Requests are sent through a FIFO kept open for reading and writing, so
+# writing never fails, each of them as number of fields and the fields
+# terminated by NUL. Replies are read from another FIFO. Records appended to
+# the metafile directly, e.g. by a nested shell which is not connected to the
+# service, are read back by the service before the journal is saved.
+
+# Returns 0 if the journal service is running
+__INTERNAL_JournalServiceAlive() {
+    [[ -n "$__INTERNAL_JOURNAL_SERVICE_PID" ]] || return 1
+    kill -0 $__INTERNAL_JOURNAL_SERVICE_PID 2> /dev/null && return 0
+    # close first as the warning is written to the metafile too
+    __INTERNAL_JournalServiceClose
+    rlLogWarning "journal service is not running any more, metafile is written directly"
+    return 1
+}
+
+# Sends a request to the journal service. Only writes up to PIPE_BUF bytes
+# are atomic, so a bigger request, which could interleave with requests of
+# concurrent subshells, is written to a spool file passed to the service.
+__INTERNAL_JournalServiceSend() {
+    local LC_ALL=C arg size=$(( ${##} + 1 ))
+    for arg in "$@"; do
+      (( size += ${#arg} + 1 ))
+    done
+    if [[ $size -lt 4096 ]]; then
+      printf '%s\0' "$#" "$@" >&$__INTERNAL_JOURNAL_SERVICE_FD
+      return
+    fi
+    local spool="$BEAKERLIB_DIR/journal.spool.$BASHPID.$RANDOM"
+    printf '%s\0' "$#" "$@" > "$spool" && \
+      printf '%s\0' 2 spool "$spool" >&$__INTERNAL_JOURNAL_SERVICE_FD
+}
+
+# Waits for reply of the journal service and stores it in
+# __INTERNAL_JOURNAL_SERVICE_RESULT, fails if the service ends meanwhile
+__INTERNAL_JournalServiceReply() {
+    until read -r -t 1 -u $__INTERNAL_JOURNAL_SERVICE_REPLY_FD __INTERNAL_JOURNAL_SERVICE_RESULT; do
+      __INTERNAL_JournalServiceAlive || return 1
+    done
+}
+
+# Closes connection to the journal service
+__INTERNAL_JournalServiceClose() {
+    exec {__INTERNAL_JOURNAL_SERVICE_FD}>&- {__INTERNAL_JOURNAL_SERVICE_REPLY_FD}>&-
+    rm -f "$BEAKERLIB_DIR/journal.fifo" "$BEAKERLIB_DIR/journal.reply"
+    __INTERNAL_JOURNAL_SERVICE_PID=''
+}
+
+__INTERNAL_JournalServiceStart() {
+    [[ "$BEAKERLIB_JOURNAL_SERVICE" == "1" && "$BEAKERLIB_JOURNAL" != "0" ]] || return 0
+    __INTERNAL_JournalServiceAlive && return 0
+    local fifo="$BEAKERLIB_DIR/journal.fifo"
+    local reply="$BEAKERLIB_DIR/journal.reply"
+    rm -f "$fifo" "$reply"
+    mkfifo "$fifo" "$reply" || {
+      rlLogWarning "could not create FIFOs for journal service"
+      return 1
+    }
+    exec {__INTERNAL_JOURNAL_SERVICE_FD}<>"$fifo" {__INTERNAL_JOURNAL_SERVICE_REPLY_FD}<>"$reply"
+    local index=()
+    [[ "$BEAKERLIB_JOURNAL_INDEX" == "1" ]] && index=(--index "$__INTERNAL_BEAKERLIB_JOURNAL_INDEX")
+    $__INTERNAL_JOURNALIST $__INTERNAL_XSLT --service "$reply" --metafile "$__INTERNAL_BEAKERLIB_METAFILE" \
+      --journal "$__INTERNAL_BEAKERLIB_JOURNAL" "${index[@]}" ${BEAKERLIB_JOURNAL_STATS:+--stats "$BEAKERLIB_JOURNAL_STATS"} \
+      < "$fifo" > /dev/null \
+      {__INTERNAL_JOURNAL_SERVICE_FD}>&- {__INTERNAL_JOURNAL_SERVICE_REPLY_FD}>&- &
+    __INTERNAL_JOURNAL_SERVICE_PID=$!
+    # the service replies once it has read the metafile
+    __INTERNAL_JournalServiceReply
+}
+
+__INTERNAL_JournalServiceStop() {
+    __INTERNAL_JournalServiceAlive || return 0
+    __INTERNAL_JournalServiceSend stop
+    __INTERNAL_JournalServiceReply && __INTERNAL_JournalServiceClose
+}
+
 __INTERNAL_PrintHeadLog() {
     __INTERNAL_LogText "\n::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::::"
     __INTERNAL_LogText "::   $1"
@@ -1050,6 +1182,16 @@ __INTERNAL_PrintFootLog(){
 # whenever any of the persistent variable is touched,
 # functions __INTERNAL_PersistentDataLoad and __INTERNAL_PersistentDataSave
 # should be called before and after that respectively.
+#
+# The state is kept in memory of the shell, the full snapshot is written by
+# __INTERNAL_PersistentDataSave only at phase boundaries. The changes done by
+# asserts and metrics in between are appended by __INTERNAL_PersistentDataAppend
+# to the delta file as single lines, so the file is not rewritten and no
+# process is forked. The delta file starts with the generation of the snapshot
+# it belongs to, and as both files are up to date all the time, the state
+# survives a reboot or a process replaced by exec the same way the snapshot
+# alone did. Each process keeps the delta file open and reads only the lines
+# appended since its last load.
 
 __INTERNAL_PersistentDataSave_sed='s/^declare/\0 -g/'
 # ugly workaround for bash-4.1.2 and older, where -g does not exist
@@ -1060,6 +1202,7 @@ __INTERNAL_PersistentDataSave_sed='s/^declare/\0 -g/'
 declare -g &> /dev/null || __INTERNAL_PersistentDataSave_sed="s/^declare\s+-a\s+/eval /;s/^declare\s+\S+\s+//"
 
 __INTERNAL_PersistentDataSave() {
+  __INTERNAL_PERSISTENT_GENERATION="$BASHPID.$SECONDS.$RANDOM"
   declare -p \
     __INTERNAL_STARTTIME \
     __INTERNAL_TEST_STATE \
@@ -1078,25 +1221,125 @@ __INTERNAL_PersistentDataSave() {
     __INTERNAL_PHASE_TXTLOG_START \
     __INTERNAL_PHASE_METRICS \
     __INTERNAL_TEST_NAME \
-    | sed -r "$__INTERNAL_PersistentDataSave_sed" > "$__INTERNAL_PERSISTENT_DATA"
+    __INTERNAL_PERSISTENT_GENERATION \
+    | sed -r "$__INTERNAL_PersistentDataSave_sed" > "$__INTERNAL_PERSISTENT_DATA.new"
+  # the snapshot includes the changes in the delta file, so it replaces the
+  # previous one before the delta file is reset; if the save is interrupted
+  # in between, the delta file does not belong to the snapshot and the load
+  # finishes the save instead of replaying the changes again
+  mv -f "$__INTERNAL_PERSISTENT_DATA.new" "$__INTERNAL_PERSISTENT_DATA"
+  echo "#$__INTERNAL_PERSISTENT_GENERATION" > "$__INTERNAL_PERSISTENT_DELTA"
+  __INTERNAL_PersistentDataOpen
+}
+
+# opens the delta file for reading by this process, so the lines appended
+# later are read without reading the whole file again
+# $1 - number of lines already applied to skip, 1 (the generation) by default
+__INTERNAL_PersistentDataOpen() {
+  local line skip=${1:-1}
+  [[ -n "$__INTERNAL_PERSISTENT_DELTA_FD" ]] && exec {__INTERNAL_PERSISTENT_DELTA_FD}<&-
+  __INTERNAL_PERSISTENT_DELTA_FD=''
+  __INTERNAL_PERSISTENT_DELTA_PID=$BASHPID
+  __INTERNAL_PERSISTENT_APPLIED=0
+  [[ -r "$__INTERNAL_PERSISTENT_DELTA" ]] || return 0
+  exec {__INTERNAL_PERSISTENT_DELTA_FD}< "$__INTERNAL_PERSISTENT_DELTA"
+  while [[ $__INTERNAL_PERSISTENT_APPLIED -lt $skip ]] && read -r -u $__INTERNAL_PERSISTENT_DELTA_FD line; do
+    let __INTERNAL_PERSISTENT_APPLIED++
+  done
+  return 0
+}
+
+# applies a change recorded in the delta file to the state in memory
+# $1 - kind of the change, test or metric
+# $2 - result of the assert or name of the metric
+__INTERNAL_PersistentDataApply() {
+  case $1 in
+    test)
+      if [ "$2" == "PASS" ]; then
+          let __INTERNAL_PHASE_PASSED++
+      else
+          let __INTERNAL_TEST_STATE++
+          let __INTERNAL_PHASE_FAILED++
+      fi
+      ;;
+    metric)
+      __INTERNAL_PHASE_METRICS="$__INTERNAL_PHASE_METRICS $2 "
+      ;;
+  esac
+}
+
+# applies the lines appended to the delta file since the last read
+__INTERNAL_PersistentDataReplay() {
+  local line
+  [[ -n "$__INTERNAL_PERSISTENT_DELTA_FD" ]] || return 0
+  while read -r -u $__INTERNAL_PERSISTENT_DELTA_FD line; do
+    eval "__INTERNAL_PersistentDataApply $line"
+    let __INTERNAL_PERSISTENT_APPLIED++
+  done
+  return 0
 }
 
+# records the change to the delta file, it is applied in memory by reading
+# it back, so the state in memory always matches the lines read
+__INTERNAL_PersistentDataAppend() {
+  local record
+  printf -v record '%q ' "$@"
+  echo "$record" >> "$__INTERNAL_PERSISTENT_DELTA"
+  __INTERNAL_PersistentDataLoad
+}
+
+# the snapshot is sourced only if it is not the one in memory, i.e. after
+# a reboot or when it was saved by a subshell, then the changes not applied
+# yet are replayed from the delta file
 __INTERNAL_PersistentDataLoad() {
-  [[ -r "$__INTERNAL_PERSISTENT_DATA" ]] && . "$__INTERNAL_PERSISTENT_DATA"
+  local header=''
+  [[ -r "$__INTERNAL_PERSISTENT_DELTA" ]] && read -r header < "$__INTERNAL_PERSISTENT_DELTA"
+  if [[ "$header" != "#$__INTERNAL_PERSISTENT_GENERATION" ]]; then
+    [[ -r "$__INTERNAL_PERSISTENT_DATA" ]] && . "$__INTERNAL_PERSISTENT_DATA"
+    [[ "$header" == "#$__INTERNAL_PERSISTENT_GENERATION" ]] || \
+      echo "#$__INTERNAL_PERSISTENT_GENERATION" > "$__INTERNAL_PERSISTENT_DELTA"
+    __INTERNAL_PersistentDataOpen
+  elif [[ "$__INTERNAL_PERSISTENT_DELTA_PID" != "$BASHPID" ]]; then
+    # a subshell shares the offset of the file with its parent
+    __INTERNAL_PersistentDataOpen $__INTERNAL_PERSISTENT_APPLIED
+  fi
+  __INTERNAL_PersistentDataReplay
+}
+
+# prints the first 8 characters of base64 encoded sha256 of the statuses in
+# the file joined by spaces
+# $1 - file with the statuses
+# $2 - name of the variable caching the fingerprint with the number of
+#      statuses it was computed from, it is computed again only if the number
+#      differs
+__INTERNAL_Fingerprint() {
+  local statuses=() IFS=' '
+  mapfile -t statuses < "$1"
+  if [[ "${!2%% *}" != "${#statuses[@]}" ]]; then
+    local hash base64='ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+    hash=$(printf '%s' "${statuses[*]}" | sha256sum)
+    # 8 base64 characters encode the first 6 bytes of the hash
+    local bytes=$((16#${hash:0:12})) fingerprint='' i
+    for (( i=42; i>=0; i-=6 )); do
+      fingerprint+=${base64:$(( (bytes >> i) & 63 )):1}
+    done
+    printf -v $2 '%s %s' "${#statuses[@]}" "$fingerprint"
+  fi
+}
+
+__INTERNAL_UpdateFingerprints() {
+  __INTERNAL_Fingerprint "$__INTERNAL_PHASE_STATUSES" __INTERNAL_PHASES_FINGERPRINT
+  __INTERNAL_Fingerprint "$__INTERNAL_ASSERT_STATUSES" __INTERNAL_ASSERTS_FINGERPRINT
 }
 
 __INTERNAL_GetPhasesFingerprint() {
-  cat $__INTERNAL_PHASE_STATUSES | tr '\n' ' ' | head -c -1 | sha256sum | \
-    rlHash --stdin --algorithm hex --decode | \
-    rlHash --stdin --algorithm base64 | \
-    sed -r 's/(.{8}).*/\1/'
+  __INTERNAL_Fingerprint "$__INTERNAL_PHASE_STATUSES" __INTERNAL_PHASES_FINGERPRINT
+  echo "${__INTERNAL_PHASES_FINGERPRINT#* }"
 }
 
 __INTERNAL_GetAssertsFingerprint() {
-  cat $__INTERNAL_ASSERT_STATUSES | tr '\n' ' ' | head -c -1 | sha256sum | \
-    rlHash --stdin --algorithm hex --decode | \
-    rlHash --stdin --algorithm base64 | \
-    sed -r 's/(.{8}).*/\1/'
+  __INTERNAL_Fingerprint "$__INTERNAL_ASSERT_STATUSES" __INTERNAL_ASSERTS_FINGERPRINT
+  echo "${__INTERNAL_ASSERTS_FINGERPRINT#* }"
 }
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
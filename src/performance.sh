@@ -26,6 +26,9 @@
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 echo "${__INTERNAL_SOURCED}" | grep -qF -- " ${BASH_SOURCE} " && return || __INTERNAL_SOURCED+=" ${BASH_SOURCE} "
 
+__INTERNAL_RESOURCE_MONITOR=beakerlib-rlResMonitor
+__INTERNAL_BENCHMARK=beakerlib-rlBenchmark
+
 : <<'=cut'
 =pod
 
@@ -57,7 +60,8 @@ Measures, how many runs of some commands can be done in specified time.
 This approach is suitable for short-time running tasks (up to few seconds),
 where averaging few runs is not precise. This is done several times, and
 the final result is the average of all runs. It prints the number on stdout,
-so it has to be captured.
+so it has to be captured. See L</rlPerfBenchmark> for a measurement with
+known precision.
 
     rlPerfTime_RunsInTime command [time] [runs]
 
@@ -124,6 +128,7 @@ precise enough. Measured runs can be preceded by dry run, which is not
 measured and it's purpose is to warm up various caches.
 It prints the number on stdout, so it has to be captured.
 Or, result is then stored in special rl_retval variable.
+See L</rlPerfBenchmark> for a measurement with known precision.
 
     rlPerfTime_AvgFromRuns command [count] [warmup]
 
@@ -173,6 +178,231 @@ rlPerfTime_AvgFromRuns(){
     rm -f $__INTERNAL_TIMER
 }
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# rlPerfBenchmark
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+: <<'=cut'
+=pod
+
+=head3 rlPerfBenchmark
+
+Measures run time of a command repeatedly until the result is precise
+enough. Each run is timed by the monotonic clock. Warmup runs are done
+until the run time stops decreasing, then the command runs until the
+confidence interval of the median run time is narrower than the target
+relative error, or until the limit of runs or time is reached. The run
+times are stored in C<$BEAKERLIB_DIR/benchmark-NAME.txt>.
+
+The result is added to the current phase as metrics which should be as low
+as possible, all in seconds: C<NAME_median>, C<NAME_p95>, bounds of the
+confidence interval of the median C<NAME_ci_low> and C<NAME_ci_high>,
+and C<NAME_mean> of the runs without outliers. Number of the runs, the
+outliers and the reached error are logged.
+
+    rlPerfBenchmark [--name NAME] [--error ERROR] [--confidence LEVEL]
+                    [--warmup N|auto] [--min-runs N] [--max-runs N]
+                    [--max-time SECONDS] [--cpu LIST] [--tolerance TOLERANCE]
+                    command [arg...]
+
+=over
+
+=item --name NAME
+
+Name of the measurement used in the metric names, it has to be unique
+in a phase (optional, default=benchmark).
+
+=item --error ERROR
+
+Target relative error of the median (optional, default=0.02).
+
+=item --confidence LEVEL
+
+Confidence level of the interval (optional, default=0.95).
+
+=item --warmup N|auto
+
+Number of warmup runs, or detect the warmup (optional, default=auto).
+
+=item --min-runs N
+
+Minimal number of measured runs (optional, default=5).
+
+=item --max-runs N
+
+Maximal number of measured runs (optional, default=1000).
+
+=item --max-time SECONDS
+
+Stop once the target error is not reached in the time, the result is then
+less precise (optional, default=60).
+
+=item --cpu LIST
+
+Pin the command to CPUs given like C<0,2-3>, which lowers the noise caused
+by migration of the command (optional).
+
+=item --tolerance TOLERANCE
+
+Tolerance of the metrics, see L</rlLogMetricLow> (optional, default=0.2).
+
+=item command
+
+Command to run with its arguments. It is executed, so a shell function has
+to be run like C<bash -c '. ./lib.sh; function'>.
+
+=back
+
+Returns 0 if the result was measured, exit code of the command if a run
+failed.
+
+=cut
+
+rlPerfBenchmark(){
+    local OPTS name="benchmark" tolerance="0.2"
+    local engine=()
+    local IFS
+
+    # getopt will cut off first long opt when no short are defined
+    OPTS=$($__INTERNAL_GETOPT_CMD -o "+." -l "name:,error:,confidence:,warmup:,min-runs:,max-runs:,max-time:,cpu:,tolerance:" -- "$@" 2> >(while read -r line; do rlLogError "$FUNCNAME: $line"; done))
+    [ $? -ne 0 ] && return 1
+
+    eval set -- "$OPTS"
+    while true; do
+        case "$1" in
+            '--name') shift; name="$1"; ;;
+            '--error'|'--confidence'|'--warmup'|'--min-runs'|'--max-runs'|'--max-time'|'--cpu')
+                engine+=("$1" "$2"); shift; ;;
+            '--tolerance') shift; tolerance="$1"; ;;
+            --) shift; break ;;
+        esac
+        shift
+    done;
+
+    if [ -z "$1" ]; then
+        rlLogError "$FUNCNAME: No command to run"
+        return 1
+    fi
+    if [ -z "$BEAKERLIB_DIR" ]; then
+        rlLogError "$FUNCNAME: BEAKERLIB_DIR not set, run rlJournalStart first"
+        return 1
+    fi
+
+    local times="$BEAKERLIB_DIR/benchmark-$name.txt"
+    local summary=$(mktemp) # no-reboot
+    rlLog "Benchmarking command '$*'"
+    $__INTERNAL_BENCHMARK "${engine[@]}" --output "$times" --summary "$summary" -- "$@"
+    local res=$?
+    if [[ $res -ne 0 ]]; then
+        rlLogError "$FUNCNAME: benchmark of '$*' failed"
+        rm -f "$summary"
+        return $res
+    fi
+    rlLog "Run times stored in $times"
+
+    local metric value
+    while read -r metric value; do
+        rlLog "$metric: $value"
+        case $metric in
+            median|p95|ci_low|ci_high|mean)
+                rljAddMetric "low" "${name}_$metric" "$value" "$tolerance"
+                ;;
+        esac
+    done < "$summary"
+    rm -f "$summary"
+    return 0
+}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# rlPerfResources
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+: <<'=cut'
+=pod
+
+=head2 Resource Consumption
+
+=head3 rlPerfResources
+
+Runs a command and samples resources consumed by the whole tree of its
+processes: CPU time, resident memory, bytes read from and written to
+storage and context switches. The samples are stored in
+C<$BEAKERLIB_DIR/resources-NAME.bin>, which can be printed as a table by
+C<beakerlib-rlResMonitor --dump FILE>. When the command ends, its summary
+is added to the current phase as metrics which should be as low as
+possible: C<NAME_wall_time> and C<NAME_cpu_time> in seconds,
+C<NAME_rss_peak> and time-weighted C<NAME_rss_avg> in kB,
+C<NAME_read_bytes>, C<NAME_write_bytes> and C<NAME_ctx_switches>.
+
+    rlPerfResources [--name NAME] [--interval SECONDS] [--tolerance TOLERANCE] command [arg...]
+
+=over
+
+=item --name NAME
+
+Name of the measurement used in the metric names, it has to be unique
+in a phase (optional, default=resources).
+
+=item --interval SECONDS
+
+Sampling interval (optional, default=0.1).
+
+=item --tolerance TOLERANCE
+
+Tolerance of the metrics, see L</rlLogMetricLow> (optional, default=0.2).
+
+=item command
+
+Command to run with its arguments.
+
+=back
+
+Returns exit code of the command.
+
+=cut
+
+rlPerfResources(){
+    local OPTS name="resources" interval="0.1" tolerance="0.2"
+    local IFS
+
+    # getopt will cut off first long opt when no short are defined
+    OPTS=$($__INTERNAL_GETOPT_CMD -o "+." -l "name:,interval:,tolerance:" -- "$@" 2> >(while read -r line; do rlLogError "$FUNCNAME: $line"; done))
+    [ $? -ne 0 ] && return 1
+
+    eval set -- "$OPTS"
+    while true; do
+        case "$1" in
+            '--name') shift; name="$1"; ;;
+            '--interval') shift; interval="$1"; ;;
+            '--tolerance') shift; tolerance="$1"; ;;
+            --) shift; break ;;
+        esac
+        shift
+    done;
+
+    if [ -z "$1" ]; then
+        rlLogError "$FUNCNAME: No command to run"
+        return 1
+    fi
+    if [ -z "$BEAKERLIB_DIR" ]; then
+        rlLogError "$FUNCNAME: BEAKERLIB_DIR not set, run rlJournalStart first"
+        return 1
+    fi
+
+    local samples="$BEAKERLIB_DIR/resources-$name.bin"
+    local summary=$(mktemp) # no-reboot
+    rlLog "Measuring resources of command '$*'"
+    $__INTERNAL_RESOURCE_MONITOR --interval "$interval" --output "$samples" --summary "$summary" -- "$@"
+    local res=$?
+    rlLog "Samples of resources stored in $samples"
+
+    local metric value
+    while read -r metric value; do
+        rlLog "$metric: $value"
+        rljAddMetric "low" "${name}_$metric" "$value" "$tolerance"
+    done < "$summary"
+    rm -f "$summary"
+    return $res
+}
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # AUTHORS
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
@@ -51,32 +51,125 @@ Set environment variable BEAKERLIB_PROFILING=1
     BEAKERLIB_PROFILING=1 make run
 
 A file /dev/shm/beakerlib_profile will be created for later processing.
+If BEAKERLIB_PROFILING is set to a file name, the profile is written to it
+instead.
+
+Each command is recorded with its time, source line, stack of functions and
+the command itself. The profile is kept open, so recording is a single write,
+and the time is taken from $EPOCHREALTIME, or from /proc/uptime in bash
+older than 5.0, with no fork. The overhead can be lowered further:
+
+=over
+
+=item BEAKERLIB_PROFILING_FORMAT=compact
+
+Commands are not recorded, which saves their quoting and makes the profile
+much smaller. Function hits are counted by calls seen in the stacks.
+
+=item BEAKERLIB_PROFILING_SAMPLE=N
+
+Only every Nth command is recorded, time between the recorded commands is
+accounted to the earlier one. The times are statistical estimates and hits
+are counted only for the recorded calls.
+
+=item BEAKERLIB_PROFILING_SAMPLE=calls
+
+Only calls of functions and returns from them are recorded, which gives
+exact time spent in functions, but no time of single lines. It saves most
+in long functions, the tiny ones are recorded twice per call.
+
+=back
+
+Profiles in these modes start with line '#beakerlib-profile FORMAT SAMPLE'
+and they can be processed only by beakerlib-profiling.
 
 =head3 Process the profile
 
-    /usr/share/beakerlib/profiling.sh process > profile.csv
+    /usr/share/beakerlib/profiling.sh process [--lines LINES] [--stacks STACKS] [PROFILE] > profile.csv
+
+The profile is processed by beakerlib-profiling if it is available, which
+can also write time spent on each source line to CSV file LINES and
+collapsed stacks of functions to file STACKS, which can be turned into
+a flame graph by flamegraph.pl:
+
+    flamegraph.pl STACKS > profile.svg
+
+Otherwise the profile is processed in bash, which is much slower and
+creates only the CSV of functions of profiles in the default format.
 
 =cut
 
 __INTERNAL_PROFILING_DB=/dev/shm/beakerlib_profile
 
 BEAKERLIB_PROFILING=${BEAKERLIB_PROFILING-}
+BEAKERLIB_PROFILING_FORMAT=${BEAKERLIB_PROFILING_FORMAT-}
+BEAKERLIB_PROFILING_SAMPLE=${BEAKERLIB_PROFILING_SAMPLE-}
 
 if [[ -n "$BEAKERLIB_PROFILING" ]]; then
   [[ "$BEAKERLIB_PROFILING" != "1" ]] && __INTERNAL_PROFILING_DB="$BEAKERLIB_PROFILING"
   > $__INTERNAL_PROFILING_DB
+  # the profile stays open, each record is then written by a single write()
+  exec {__INTERNAL_PROFILING_FD}>>"$__INTERNAL_PROFILING_DB"
+  __INTERNAL_PROFILING_READ_TIME=''
   if [[ -n "$EPOCHREALTIME" ]]; then
     __INTERNAL_PROFILING_TIME='$EPOCHREALTIME'
-    __INTERNAL_PROFILING_TIME_FMT='%f'
+  elif [[ -r /proc/uptime ]]; then
+    # only differences of the times are used, uptime is read with no fork
+    __INTERNAL_PROFILING_READ_TIME='read -r __INTERNAL_PROFILING_UPTIME _ < /proc/uptime;'
+    __INTERNAL_PROFILING_TIME='$__INTERNAL_PROFILING_UPTIME'
   else
     __INTERNAL_PROFILING_TIME='$(date +%s.%N)'
-    __INTERNAL_PROFILING_TIME_FMT='%f'
   fi
+  __INTERNAL_PROFILING_TIME_FMT='%f'
+  [[ "$BEAKERLIB_PROFILING_FORMAT" == "compact" ]] || BEAKERLIB_PROFILING_FORMAT=default
+  # prints code recording the command, or the given one, with the stack of
+  # functions of the caller; it is the body of the function called by the
+  # DEBUG trap and the RETURN trap itself, both have the recording or the
+  # returning function on top
+  __INTERNAL_PROFILING_record() {
+    local record="\"$__INTERNAL_PROFILING_TIME_FMT|\${BASH_SOURCE[1]}(\${BASH_LINENO[0]})|\${FUNCNAME[*]:1}"
+    if [[ -n "$1" ]]; then
+      record+="|$1\n\" $__INTERNAL_PROFILING_TIME"
+    elif [[ "$BEAKERLIB_PROFILING_FORMAT" == "compact" ]]; then
+      record+="\n\" $__INTERNAL_PROFILING_TIME"
+    else
+      record+="|%q\n\" $__INTERNAL_PROFILING_TIME \"\$BASH_COMMAND\""
+    fi
+    echo "$__INTERNAL_PROFILING_READ_TIME
+      printf $record >&$__INTERNAL_PROFILING_FD"
+    # the depth is the size of FUNCNAME seen by the DEBUG trap, it is empty
+    # out of functions; commands of the RETURN trap are traced as well, so
+    # the depth is changed by its last command
+    if [[ "$BEAKERLIB_PROFILING_SAMPLE" == "calls" ]]; then
+      echo "      __INTERNAL_PROFILING_DEPTH=\$((\${#FUNCNAME[@]} > 2 ? \${#FUNCNAME[@]} - 1 : 0))"
+    fi
+  }
   eval "__INTERNAL_PROFILING() {
-    printf \"$__INTERNAL_PROFILING_TIME_FMT|\${BASH_SOURCE[1]}(\${BASH_LINENO[0]})|\${FUNCNAME[*]:1}|%q\n\" $__INTERNAL_PROFILING_TIME \"\$BASH_COMMAND\" >> $__INTERNAL_PROFILING_DB
+    $(__INTERNAL_PROFILING_record)
   }"
+  __INTERNAL_PROFILING_DEPTH=0
+  __INTERNAL_PROFILING_COUNT=0
+  # the condition is evaluated in the trap itself, so the commands which are
+  # not recorded do not call the function
+  if [[ "$BEAKERLIB_PROFILING_SAMPLE" == "calls" ]]; then
+    # returns are recorded too, so the return from a function called in
+    # a subshell is seen; the RETURN trap runs also on return of the
+    # recording function itself
+    __INTERNAL_PROFILING_TRAP='[[ $FUNCNAME == __INTERNAL_PROFILING ]] || (( ${#FUNCNAME[@]} == __INTERNAL_PROFILING_DEPTH )) || __INTERNAL_PROFILING'
+    __INTERNAL_PROFILING_RETURN="[[ \$FUNCNAME == __INTERNAL_PROFILING ]] || { $(__INTERNAL_PROFILING_record return); }"
+  elif [[ "$BEAKERLIB_PROFILING_SAMPLE" =~ ^[0-9]+$ && "$BEAKERLIB_PROFILING_SAMPLE" -gt 1 ]]; then
+    __INTERNAL_PROFILING_TRAP="(( ++__INTERNAL_PROFILING_COUNT % $BEAKERLIB_PROFILING_SAMPLE )) || __INTERNAL_PROFILING"
+  else
+    BEAKERLIB_PROFILING_SAMPLE=all
+    __INTERNAL_PROFILING_TRAP='__INTERNAL_PROFILING'
+  fi
+  [[ "$BEAKERLIB_PROFILING_FORMAT" == "default" && "$BEAKERLIB_PROFILING_SAMPLE" == "all" ]] || \
+    echo "#beakerlib-profile $BEAKERLIB_PROFILING_FORMAT $BEAKERLIB_PROFILING_SAMPLE" >&$__INTERNAL_PROFILING_FD
   if [[ -z "$1" ]]; then
-    set -o functrace; trap "__INTERNAL_PROFILING" DEBUG
+    set -o functrace; trap "$__INTERNAL_PROFILING_TRAP" DEBUG
+    if [[ "$BEAKERLIB_PROFILING_SAMPLE" == "calls" ]]; then
+      trap "$__INTERNAL_PROFILING_RETURN" RETURN
+    fi
   fi
 fi
 
@@ -86,7 +179,13 @@ return >/dev/null 2>&1
 __INTERNAL_profilingPrint() {
   cat $__INTERNAL_PROFILING_DB
 }
+__INTERNAL_PROFILING_PROCESSOR=beakerlib-profiling
+
 __INTERNAL_profiling_process() {
+  if command -v $__INTERNAL_PROFILING_PROCESSOR &> /dev/null; then
+    $__INTERNAL_PROFILING_PROCESSOR "$@"
+    return
+  fi
   local prev_func curr_func counting total_cummulative_spent prev_ts total_spent
   declare -A hits total_cummulative_spent total_spent
   hits[main]=1
@@ -15,9 +15,19 @@
 #
 # Author: Petr Muller <pmuller@redhat.com>
 
-from __future__ import print_function
-import xml.dom.minidom
+from __future__ import division, print_function
+import collections
+import math
 import sys
+from optparse import OptionParser
+try:
+	import xml.etree.cElementTree as ElementTree
+except ImportError:
+	import xml.etree.ElementTree as ElementTree
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 class Result:
 	def __init__(self):
@@ -48,11 +58,11 @@ class Metric:
 		if self.type == "low":
 			first = self.value
 			second = other.value
-			message = "First %s, second %s, toleranced first %s" % (first, second, first+first*tolerance)
+			message = "First %s, second %s, toleranced first %s" % (first, second, first+first*self.tolerance)
 		else:
 			first = other.value
 			second = self.value
-			message = "First %s, second %s, toleranced first %s" % (second, first, second+second*tolerance)
+			message = "First %s, second %s, toleranced first %s" % (second, first, second+second*self.tolerance)
 
 		result = Result()
 		result.name = self.name
@@ -60,7 +70,7 @@ class Metric:
 
 		if first >= second:
 			result.result = "PASS"
-		elif first+first*tolerance >= second:
+		elif first+first*self.tolerance >= second:
 			result.result = "WARN"
 		else:
 			result.result = "FAIL"
@@ -139,61 +149,269 @@ class TestSet:
 				print("[WARN] Could not find corresponding test for: %s" % key)
 		return result_list
 
-try:
-  old = sys.argv[1]
-  new = sys.argv[2]
-except IndexError:
-  old = "old/rcw-journal"
-  new = "new/rcw-journal"
-
-journal_old = xml.dom.minidom.parse(old)
-journal_new = xml.dom.minidom.parse(new)
-
-old_log = journal_old.getElementsByTagName("log")[0]
-new_log = journal_new.getElementsByTagName("log")[0]
-
-old_phases = old_log.getElementsByTagName("phase")
-new_phases = new_log.getElementsByTagName("phase")
-
-walk_through = range(len(new_phases))
-
-for i in walk_through:
-	old_type, old_name = old_phases[i].getAttribute("type"), old_phases[i].getAttribute("name")
-	new_type, new_name = new_phases[i].getAttribute("type"), new_phases[i].getAttribute("name")
-
-	if old_type == new_type and old_name == new_name:
-		print( "Types match, so we are comparing phase %s of type %s" % (old_type, new_type))
-		old_tests = TestSet()
-		new_tests = TestSet()
-		old_metrics = {}
-		new_metrics = {}
+class Phase:
+	def __init__(self, type, name):
+		self.type = type
+		self.name = name
+		self.tests = TestSet()
+		self.metrics = collections.OrderedDict()
 
-		for phases, results, metrics in ((old_phases, old_tests, old_metrics), (new_phases, new_tests, new_metrics)):
-			for test in phases[i].getElementsByTagName("test"):
-				key = test.getAttribute("message")
-				result = test.childNodes[0].data.strip()
-				results.addTestResult(key, result)
+	def addTest(self, test):
+		self.tests.addTestResult(test.get("message", ""), (test.text or "").strip())
 
-			for metric in phases[i].getElementsByTagName("metric"):
-				key = metric.getAttribute("name")
-				value = float(metric.childNodes[0].data.strip())
-				tolerance = float(metric.getAttribute("tolerance"))
-				metrics[key] = Metric(key, value, metric.getAttribute("type"), tolerance)
+	def addMetric(self, metric):
+		key = metric.get("name", "")
+		# Value is an attribute in journals created by beakerlib, text in older ones
+		value = float(metric.get("value", metric.text or "").strip())
+		tolerance = float(metric.get("tolerance"))
+		self.metrics[key] = Metric(key, value, metric.get("type"), tolerance)
 
+	def compare(self, other):
 		print("==== Actual compare ====")
 		print(" * Metrics * ")
 		metric_results = []
-		for key in old_metrics.keys():
-			metric_results.append(old_metrics[key].compare(new_metrics[key]))
+		for key in self.metrics.keys():
+			try:
+				metric_results.append(self.metrics[key].compare(other.metrics[key]))
+			except KeyError:
+				print("[WARN] Could not find corresponding metric for: %s" % key)
 		for metric in metric_results:
 			for message in metric.messages:
 				print("[%s] %s (%s)" % (metric.result, metric.name, message))
 		print(" * Tests * ")
-		test_results = old_tests.compare(new_tests)
+		test_results = self.tests.compare(other.tests)
 		for test in test_results:
 			print("[%s] %s" % (test.result, test.name))
 			for message in test.messages:
 				print("\t - %s" % message)
 
-	else:
-		print("We are not doing any compare, types dont match")
+# Yields phases of the log in the journal as they end, so nested phases come
+# before the phase containing them. Tests and metrics count in all phases
+# containing them, also in the enclosing ones of a nested phase. Elements are
+# dropped once they are processed, so only the currently parsed element is
+# kept in memory.
+def readPhases(journal):
+	elements = []
+	phases = []
+	in_log = 0
+	for event, element in ElementTree.iterparse(journal, ("start", "end")):
+		if event == "start":
+			elements.append(element)
+			if element.tag == "log":
+				in_log += 1
+			elif element.tag == "phase" and in_log:
+				phases.append(Phase(element.get("type", ""), element.get("name", "")))
+			continue
+		elements.pop()
+		if element.tag == "log":
+			in_log -= 1
+		elif element.tag == "phase" and in_log:
+			yield phases.pop()
+		elif element.tag == "test":
+			for phase in phases:
+				phase.addTest(element)
+		elif element.tag == "metric":
+			for phase in phases:
+				phase.addMetric(element)
+		# Attributes of the parent were already used at its start
+		if elements:
+			elements[-1].clear()
+
+# Returns continued fraction of the incomplete beta function
+def betaFraction(a, b, x):
+	tiny = 1e-300
+	c = 1.0
+	d = 1.0 - (a + b) * x / (a + 1.0)
+	d = 1.0 / (d if abs(d) > tiny else tiny)
+	h = d
+	for m in range(1, 301):
+		for aa in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+		           -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+			d = 1.0 + aa * d
+			d = 1.0 / (d if abs(d) > tiny else tiny)
+			c = 1.0 + aa / c
+			c = c if abs(c) > tiny else tiny
+			h *= d * c
+		if abs(d * c - 1.0) < 3e-14:
+			break
+	return h
+
+# Returns regularized incomplete beta function I_x(a, b)
+def betaIncomplete(a, b, x):
+	if x <= 0.0:
+		return 0.0
+	if x >= 1.0:
+		return 1.0
+	front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x))
+	if x < (a + 1.0) / (a + b + 2.0):
+		return front * betaFraction(a, b, x) / a
+	return 1.0 - front * betaFraction(b, a, 1.0 - x) / b
+
+# Returns probability that Student's t with df degrees of freedom exceeds t
+def tUpperTail(t, df):
+	tail = 0.5 * betaIncomplete(df / 2.0, 0.5, df / (df + t * t))
+	return tail if t > 0 else 1.0 - tail
+
+# Returns one-sided p-values of Welch's t-test that the changes to the worse
+# are only noise, None where a set has less than two values so the variance
+# is unknown
+def welchTest(changes, old_deviations, old_counts, new_deviations, new_counts):
+	p = []
+	for change, old_deviation, old_count, new_deviation, new_count in zip(changes, old_deviations, old_counts, new_deviations, new_counts):
+		if old_count < 2 or new_count < 2:
+			p.append(None)
+			continue
+		old_error = old_deviation ** 2 / old_count
+		new_error = new_deviation ** 2 / new_count
+		error = math.sqrt(old_error + new_error)
+		if error == 0:
+			p.append(0.0 if change > 0 else 1.0)
+		else:
+			df = (old_error + new_error) ** 2 / (old_error ** 2 / (old_count - 1) + new_error ** 2 / (new_count - 1))
+			p.append(tUpperTail(change / error, df))
+	return p
+
+# Returns means, sample standard deviations and numbers of values of rows
+# of values, None stands for a value which is missing
+def summarize(rows):
+	# An array of no rows would not have the second axis
+	if not rows:
+		return [], [], []
+	if numpy is not None:
+		values = numpy.array([[numpy.nan if value is None else value for value in row] for row in rows], dtype=float)
+		counts = numpy.sum(~numpy.isnan(values), axis=1)
+		sums = numpy.nansum(values, axis=1)
+		means = sums / numpy.maximum(counts, 1)
+		squares = numpy.nansum((values - means[:, None]) ** 2, axis=1)
+		deviations = numpy.sqrt(squares / numpy.maximum(counts - 1, 1))
+		return means.tolist(), deviations.tolist(), counts.tolist()
+	means, deviations, counts = [], [], []
+	for row in rows:
+		present = [value for value in row if value is not None]
+		mean = sum(present) / max(len(present), 1)
+		squares = sum((value - mean) ** 2 for value in present)
+		means.append(mean)
+		deviations.append(math.sqrt(squares / max(len(present) - 1, 1)))
+		counts.append(len(present))
+	return means, deviations, counts
+
+# Values of metrics in a set of journals, one value per journal,
+# by phase type, name, its occurrence in the journal and metric name
+class MetricSet:
+	def __init__(self):
+		self.values = collections.OrderedDict()
+		self.metrics = {}
+		self.journals = 0
+
+	def addJournal(self, journal):
+		occurrences = {}
+		for phase in readPhases(journal):
+			key = (phase.type, phase.name)
+			occurrences[key] = occurrences.get(key, 0) + 1
+			for name, metric in phase.metrics.items():
+				metric_key = key + (occurrences[key], name)
+				values = self.values.setdefault(metric_key, [])
+				values.extend([None] * (self.journals - len(values)))
+				values.append(metric.value)
+				self.metrics[metric_key] = metric
+		self.journals += 1
+
+	def getRows(self, keys):
+		return [self.values[key] + [None] * (self.journals - len(self.values[key])) for key in keys]
+
+# Compares metrics of candidate journals with baseline journals using Welch's
+# t-test. Metric is a regression if candidates are significantly worse at the
+# confidence level, FAIL if they are worse by more than its tolerance, WARN
+# otherwise. Returns number of FAIL results.
+def compareSets(baselines, candidates, confidence):
+	baseline = MetricSet()
+	for journal in baselines:
+		baseline.addJournal(journal)
+	candidate = MetricSet()
+	for journal in candidates:
+		candidate.addJournal(journal)
+
+	keys = [key for key in baseline.values if key in candidate.values]
+	for key in baseline.values:
+		if key not in candidate.values:
+			print("[WARN] Could not find corresponding metric for: %s in phase %s of type %s" % (key[3], key[1], key[0]))
+	old_means, old_deviations, old_counts = summarize(baseline.getRows(keys))
+	new_means, new_deviations, new_counts = summarize(candidate.getRows(keys))
+	# Positive change is a change to the worse
+	changes = [new_mean - old_mean if baseline.metrics[key].type == "low" else old_mean - new_mean
+	           for key, old_mean, new_mean in zip(keys, old_means, new_means)]
+	probabilities = welchTest(changes, old_deviations, old_counts, new_deviations, new_counts)
+
+	failures = 0
+	phase = None
+	for i, key in enumerate(keys):
+		if key[:3] != phase:
+			phase = key[:3]
+			print("==== Phase %s of type %s ====" % (key[1], key[0]))
+		metric = baseline.metrics[key]
+		old_mean, new_mean = old_means[i], new_means[i]
+		p = probabilities[i]
+		message = "baseline mean %g, stddev %g, n %d; candidate mean %g, stddev %g, n %d" % (
+			old_mean, old_deviations[i], old_counts[i], new_mean, new_deviations[i], new_counts[i])
+		if p is None:
+			# Variance is unknown, means are compared the same way as single values
+			result = Metric(metric.name, old_mean, metric.type, metric.tolerance).compare(
+				Metric(metric.name, new_mean, metric.type, metric.tolerance)).result
+			message += "; not enough runs for significance test"
+		else:
+			if p >= 1.0 - confidence:
+				result = "PASS"
+			elif changes[i] > abs(old_mean) * metric.tolerance:
+				result = "FAIL"
+			else:
+				result = "WARN"
+			message += "; confidence of regression %.2f%%" % (100.0 * (1.0 - p))
+		if old_mean:
+			message += "; change %+.2f%%" % (100.0 * (new_mean - old_mean) / abs(old_mean))
+		if result == "FAIL":
+			failures += 1
+		print("[%s] %s (%s)" % (result, metric.name, message))
+	return failures
+
+# Compares phases of two journals
+def comparePair(old, new):
+	# Old phases by type and name, phases with the same type and name
+	# are paired in the order they appear in the journals
+	old_phases = {}
+	for phase in readPhases(old):
+		old_phases.setdefault((phase.type, phase.name), collections.deque()).append(phase)
+
+	for new_phase in readPhases(new):
+		key = (new_phase.type, new_phase.name)
+		if old_phases.get(key):
+			print( "Types match, so we are comparing phase %s of type %s" % (new_phase.name, new_phase.type))
+			old_phases[key].popleft().compare(new_phase)
+		else:
+			print("We are not doing any compare, phase %s of type %s is not in the old journal" % (new_phase.name, new_phase.type))
+
+	for phases in old_phases.values():
+		for old_phase in phases:
+			print("We are not doing any compare, phase %s of type %s is not in the new journal" % (old_phase.name, old_phase.type))
+
+optparser = OptionParser(usage="%prog OLD NEW\n       %prog -b BASELINE [-b BASELINE ...] -c CANDIDATE [-c CANDIDATE ...]")
+optparser.add_option("-b", "--baseline", action="append", default=[], dest="baselines", metavar="BASELINE",
+                     help="baseline journal, metrics of several journals are compared statistically")
+optparser.add_option("-c", "--candidate", action="append", default=[], dest="candidates", metavar="CANDIDATE",
+                     help="candidate journal compared to the baseline ones")
+optparser.add_option("--confidence", type="float", default=0.95, dest="confidence",
+                     help="confidence level at which a difference is a regression, 0.95 by default")
+(options, args) = optparser.parse_args()
+
+if options.baselines or options.candidates:
+	if not options.baselines or not options.candidates:
+		optparser.error("both baseline and candidate journals are needed")
+	sys.exit(1 if compareSets(options.baselines, options.candidates, options.confidence) else 0)
+
+try:
+  old = args[0]
+  new = args[1]
+except IndexError:
+  old = "old/rcw-journal"
+  new = "new/rcw-journal"
+
+comparePair(old, new)
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+#
+# Description: Keeps history of journals in SQLite database and detects
+#              gradual drift of metrics over the last runs
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+from __future__ import division, print_function
+import glob
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+from optparse import OptionParser
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+# modules shared by the tools are installed to the data directory of
+# beakerlib, in the source tree they are next to the tools
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'share', 'beakerlib', 'python'))
+from journaltime import getEpoch
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    digest TEXT UNIQUE NOT NULL,
+    journal TEXT,
+    test TEXT,
+    host TEXT,
+    arch TEXT,
+    distro TEXT,
+    package TEXT,
+    starttime TEXT,
+    endtime TEXT,
+    started REAL
+);
+CREATE TABLE IF NOT EXISTS phases (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT,
+    type TEXT,
+    result TEXT,
+    score TEXT,
+    starttime TEXT,
+    endtime TEXT
+);
+CREATE TABLE IF NOT EXISTS tests (
+    phase INTEGER NOT NULL REFERENCES phases(id),
+    message TEXT,
+    result TEXT
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    phase INTEGER NOT NULL REFERENCES phases(id),
+    name TEXT,
+    type TEXT,
+    value REAL,
+    tolerance REAL
+);
+CREATE INDEX IF NOT EXISTS runs_test ON runs (test, host, started);
+CREATE INDEX IF NOT EXISTS runs_host ON runs (host);
+CREATE INDEX IF NOT EXISTS phases_run ON phases (run, name);
+CREATE INDEX IF NOT EXISTS phases_name ON phases (name);
+CREATE INDEX IF NOT EXISTS tests_phase ON tests (phase);
+CREATE INDEX IF NOT EXISTS metrics_phase ON metrics (phase, name);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics (name);
+"""
+
+# Elements of the journal header stored with the run and their columns
+HEADER = {"testname": "test", "hostname": "host", "arch": "arch", "release": "distro",
+          "package": "package", "starttime": "starttime", "endtime": "endtime"}
+
+
+# Opens the database, creating its tables if needed
+def openDatabase(path):
+    db = sqlite3.connect(path)
+    # Readers do not block ingest running in parallel
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute("PRAGMA foreign_keys = ON")
+    db.executescript(SCHEMA)
+    return db
+
+
+# Returns SHA1 digest of file content, which identifies the run
+def getDigest(path):
+    digest = hashlib.sha1()
+    journal = open(path, 'rb')
+    try:
+        for block in iter(lambda: journal.read(1024 * 1024), b''):
+            digest.update(block)
+    finally:
+        journal.close()
+    return digest.hexdigest()
+
+
+# Adds run of a journal with its phases, tests and metrics to the database.
+# The journal is parsed incrementally, elements are dropped once they are
+# stored. Returns False if the journal was already added.
+def ingestJournal(db, path):
+    digest = getDigest(path)
+    if db.execute("SELECT 1 FROM runs WHERE digest = ?", (digest,)).fetchone():
+        return False
+    run = db.execute("INSERT INTO runs (digest, journal) VALUES (?, ?)", (digest, path)).lastrowid
+    header = {}
+    elements = []
+    # Open phases as their row id, tests and metrics
+    phases = []
+    in_log = 0
+    for event, element in ElementTree.iterparse(path, ("start", "end")):
+        if event == "start":
+            elements.append(element)
+            if element.tag == "log":
+                in_log += 1
+            elif element.tag == "phase" and in_log:
+                phase = db.execute("INSERT INTO phases (run, name, type) VALUES (?, ?, ?)",
+                                   (run, element.get("name", ""), element.get("type", ""))).lastrowid
+                phases.append((phase, [], []))
+            continue
+        elements.pop()
+        if element.tag == "log":
+            in_log -= 1
+        elif element.tag == "phase" and in_log:
+            phase, tests, metrics = phases.pop()
+            # Result and times are known only once the phase ends
+            db.execute("UPDATE phases SET result = ?, score = ?, starttime = ?, endtime = ? WHERE id = ?",
+                       (element.get("result"), element.get("score"), element.get("starttime"),
+                        element.get("endtime"), phase))
+            db.executemany("INSERT INTO tests (phase, message, result) VALUES (?, ?, ?)",
+                           ((phase, message, result) for message, result in tests))
+            db.executemany("INSERT INTO metrics (phase, name, type, value, tolerance) VALUES (?, ?, ?, ?, ?)",
+                           ((phase,) + metric for metric in metrics))
+        elif element.tag == "test" and phases:
+            phases[-1][1].append((element.get("message", ""), (element.text or "").strip()))
+        elif element.tag == "metric" and phases:
+            try:
+                # Value is an attribute in journals created by beakerlib, text in older ones
+                value = float(element.get("value", element.text or "").strip())
+                tolerance = float(element.get("tolerance", 0))
+            except ValueError:
+                sys.stderr.write("Skipping metric %s with invalid value in %s\n" % (element.get("name"), path))
+            else:
+                phases[-1][2].append((element.get("name", ""), element.get("type", ""), value, tolerance))
+        elif len(elements) == 1 and element.tag in HEADER:
+            header.setdefault(HEADER[element.tag], (element.text or "").strip())
+        # Stored elements are dropped, so the memory does not grow with the journal
+        if elements:
+            elements[-1].remove(element)
+    if header:
+        # Times in the journal are not ordered as text across formats and zones
+        header["started"] = getEpoch(header.get("starttime"))
+        columns = sorted(header)
+        db.execute("UPDATE runs SET %s WHERE id = ?" % ", ".join("%s = ?" % column for column in columns),
+                   [header[column] for column in columns] + [run])
+    return True
+
+
+# Adds journals given as paths, glob patterns or '-' for their list on
+# standard input. Each journal is added in its own transaction, so a broken
+# one does not prevent adding the others. Returns number of failures.
+def ingest(db, patterns):
+    journals = []
+    for pattern in patterns:
+        if pattern == '-':
+            journals.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            journals.extend(sorted(glob.glob(pattern)) or [pattern])
+    failed = 0
+    for journal in journals:
+        try:
+            with db:
+                added = ingestJournal(db, journal)
+        except (IOError, OSError, SyntaxError, sqlite3.Error) as e:
+            # ElementTree.ParseError is a SyntaxError
+            sys.stderr.write("Failed to add %s: %s\n" % (journal, str(e)))
+            failed += 1
+            continue
+        print("%s %s" % ("ADDED" if added else "KNOWN", journal))
+    return failed
+
+
+# Returns Theil-Sen slope of values measured in consecutive runs
+def getSlope(values):
+    slopes = sorted((values[j] - values[i]) / (j - i)
+                    for i in range(len(values)) for j in range(i + 1, len(values)))
+    middle = len(slopes) // 2
+    return slopes[middle] if len(slopes) % 2 else (slopes[middle - 1] + slopes[middle]) / 2
+
+
+# Returns probability that there is no monotonic trend in values measured
+# in consecutive runs, by Mann-Kendall test with correction for ties
+def getTrendProbability(values):
+    n = len(values)
+    s = sum((values[j] > values[i]) - (values[j] < values[i])
+            for i in range(n) for j in range(i + 1, n))
+    variance = n * (n - 1) * (2 * n + 5)
+    for value in set(values):
+        ties = values.count(value)
+        variance -= ties * (ties - 1) * (2 * ties + 5)
+    variance /= 18.0
+    if variance <= 0 or s == 0:
+        return 1.0
+    z = (s - 1 if s > 0 else s + 1) / math.sqrt(variance)
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+# Reports metrics which are drifting to the worse in the last runs of each
+# test on each host. Drift is the change over the runs by Theil-Sen slope,
+# it is reported if the trend is significant at the confidence level and
+# the change is bigger than tolerance of the metric. Returns number of
+# drifting metrics.
+def drift(db, last, confidence, filters):
+    conditions = []
+    arguments = []
+    for column, value in filters:
+        if value is not None:
+            conditions.append("%s = ?" % column)
+            arguments.append(value)
+    query = ("SELECT runs.test, runs.host, phases.name, metrics.name, metrics.type, metrics.tolerance, metrics.value"
+             " FROM metrics JOIN phases ON metrics.phase = phases.id JOIN runs ON phases.run = runs.id"
+             + (" WHERE " + " AND ".join(conditions) if conditions else "") +
+             " ORDER BY runs.test, runs.host, phases.name, metrics.name, runs.started DESC, runs.id DESC")
+
+    drifting = 0
+    series = None
+    values = []
+
+    def report():
+        test, host, phase, name, type, tolerance = series
+        # Values were read from the newest one
+        values.reverse()
+        if len(values) < 3:
+            return 0
+        start = values[0]
+        change = getSlope(values) * (len(values) - 1)
+        relative = change / abs(start) if start else 0.0
+        probability = getTrendProbability(values)
+        # Increasing value is worse for metrics where lower is better
+        worse = relative > 0 if type == "low" else relative < 0
+        result = "DRIFT" if worse and probability < 1 - confidence and abs(relative) > tolerance else "OK"
+        print("[%s] %s on %s, phase %s, metric %s: %d runs, change %+.2f%%, trend confidence %.2f%%" % (
+            result, test, host, phase, name, len(values), 100 * relative, 100 * (1 - probability)))
+        return result == "DRIFT"
+
+    for row in db.execute(query, arguments):
+        if row[:6] != series:
+            if series is not None:
+                drifting += report()
+            series = row[:6]
+            values = []
+        if len(values) < last:
+            values.append(row[6])
+    if series is not None:
+        drifting += report()
+    return drifting
+
+
+def main():
+    usage = "%prog --database DB ingest JOURNAL|PATTERN|- ...\n" + \
+            "       %prog --database DB drift [--last N] [--test TEST] [--host HOST] [--phase PHASE] [--metric METRIC]"
+    optparser = OptionParser(usage=usage, description="Keeps history of journals and detects drift of metrics.")
+    optparser.add_option("-d", "--database", default="journal-history.db", dest="database", metavar="DB",
+                         help="SQLite database with the history, journal-history.db by default")
+    optparser.add_option("-n", "--last", default=10, type="int", dest="last", metavar="N",
+                         help="number of the last runs checked for drift, 10 by default")
+    optparser.add_option("--confidence", default=0.95, type="float", dest="confidence",
+                         help="confidence level at which a trend is a drift, 0.95 by default")
+    optparser.add_option("--test", default=None, dest="test", help="check only runs of the test")
+    optparser.add_option("--host", default=None, dest="host", help="check only runs on the host")
+    optparser.add_option("--phase", default=None, dest="phase", help="check only phases of the name")
+    optparser.add_option("--metric", default=None, dest="metric", help="check only metrics of the name")
+    (options, args) = optparser.parse_args()
+
+    if not args or args[0] not in ("ingest", "drift"):
+        optparser.error("mode ingest or drift is needed")
+    try:
+        db = openDatabase(options.database)
+    except sqlite3.Error as e:
+        sys.stderr.write("Failed to open database %s: %s\n" % (options.database, str(e)))
+        return 2
+
+    try:
+        if args[0] == "ingest":
+            if len(args) < 2:
+                optparser.error("journals to add are needed")
+            return 1 if ingest(db, args[1:]) else 0
+        filters = (("runs.test", options.test), ("runs.host", options.host),
+                   ("phases.name", options.phase), ("metrics.name", options.metric))
+        return 1 if drift(db, options.last, options.confidence, filters) else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+#
+# Description: Merges journals into one journal and/or xunit report
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# Journals are read incrementally, only one phase of each journal is kept in
+# memory. Header of the merged journal is the one of the first journal with
+# start and end time covering all the journals, the log holds phases of all
+# journals ordered by their start time, or in order of the journals. Times
+# are compared as the epoch, see journaltime.py.
+#
+# The xunit report holds a testsuite for each journal with testcases created
+# by journalling.py, the same ones as XSL transformation of the journal by
+# xslt-templates/xunit.xsl, in testsuites
+# element with total counts. Testsuites are spooled to a temporary file until
+# the counts are known.
+
+from __future__ import print_function
+import glob
+import heapq
+import os
+import shutil
+import sys
+import tempfile
+from optparse import OptionParser
+
+# modules shared by the tools are installed to the data directory of
+# beakerlib, in the source tree they are next to the tools
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'share', 'beakerlib', 'python'))
+import journalling
+from journalling import etree
+from journaltime import getEpoch
+
+
+class MergeError(Exception):
+    pass
+
+
+# Returns elements of the journal header preceding the log and attributes of the log
+def readHeader(journal):
+    header = []
+    depth = 0
+    try:
+        for event, element in etree.iterparse(journal, ("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2 and element.tag == "log":
+                    return header, dict(element.attrib)
+                continue
+            depth -= 1
+            if depth == 1:
+                header.append(element)
+    except SyntaxError as e:
+        # etree.XMLSyntaxError is a SyntaxError
+        raise MergeError("%s: %s" % (journal, str(e)))
+    return header, {}
+
+
+# Yields phases of the log of the journal, each one is dropped once it is used
+def readPhases(journal):
+    elements = []
+    try:
+        for event, element in etree.iterparse(journal, ("start", "end")):
+            if event == "start":
+                elements.append(element)
+                continue
+            elements.pop()
+            if len(elements) == 2 and element.tag == "phase" and elements[1].tag == "log":
+                yield element
+                elements[1].remove(element)
+            elif len(elements) == 1:
+                # Header elements and the log itself are not needed any more
+                elements[0].clear()
+    except SyntaxError as e:
+        raise MergeError("%s: %s" % (journal, str(e)))
+
+
+# Returns phases of the journals ordered by their start time; phases of
+# a journal are ordered already, so all journals are read at once. Times are
+# compared as the epoch, a phase without a known start keeps its place after
+# the previous phase of its journal, or at the start of the journal.
+def mergePhases(journals, starts):
+    def decorate(index, journal):
+        start = starts[index]
+        for number, phase in enumerate(readPhases(journal)):
+            epoch = getEpoch(phase.get("starttime"))
+            # Keys of a journal cannot decrease, heapq.merge relies on it
+            if epoch is not None and epoch > start:
+                start = epoch
+            yield start, index, number, phase
+    for _, _, _, phase in heapq.merge(*[decorate(index, journal) for index, journal in enumerate(journals)]):
+        yield phase
+
+
+def concatPhases(journals):
+    for journal in journals:
+        for phase in readPhases(journal):
+            yield phase
+
+
+def serialize(element, indent=b"  "):
+    element.tail = None
+    return indent + etree.tostring(element, encoding="us-ascii") + b"\n"
+
+
+# Returns start tag of the element without its content
+def startTag(element, indent=b"  "):
+    return indent + etree.tostring(element, encoding="us-ascii")[:-2].rstrip() + b">\n"
+
+
+# Returns times of the header and the log attributes as pairs of the epoch
+# and the time as it is in the journal, times not recognized are skipped
+def getTimes(header, log, name):
+    texts = [element.text for element in header if element.tag == name and element.text]
+    if log.get(name):
+        texts.append(log[name])
+    times = []
+    for text in texts:
+        epoch = getEpoch(text)
+        if epoch is not None:
+            times.append((epoch, text))
+    return times
+
+
+def mergeJournals(journals, output, order):
+    headers = [readHeader(journal) for journal in journals]
+    starttimes = []
+    endtimes = []
+    # Start of each journal for its phases without a known start
+    starts = []
+    for header, log in headers:
+        times = getTimes(header, log, "starttime")
+        starts.append(min(times)[0] if times else float("-inf"))
+        starttimes.extend(times)
+        endtimes.extend(getTimes(header, log, "endtime"))
+
+    output.write(b"<?xml version='1.0' encoding='utf-8'?>\n<BEAKER_TEST>\n")
+    for element in headers[0][0]:
+        if element.tag == "starttime" and starttimes:
+            element.text = min(starttimes)[1]
+        elif element.tag == "endtime" and endtimes:
+            element.text = max(endtimes)[1]
+        output.write(serialize(element))
+    log = etree.Element("log")
+    if starttimes:
+        log.set("starttime", min(starttimes)[1])
+    if endtimes:
+        log.set("endtime", max(endtimes)[1])
+    output.write(startTag(log))
+    if order == "time":
+        phases = mergePhases(journals, starts)
+    else:
+        phases = concatPhases(journals)
+    for phase in phases:
+        output.write(serialize(phase, b"    "))
+    output.write(b"  </log>\n</BEAKER_TEST>\n")
+
+
+def mergeXunit(journals, output):
+    totals = {"tests": 0, "failures": 0, "errors": 0}
+    spool = tempfile.TemporaryFile()
+    testcases = tempfile.TemporaryFile()
+    for journal in journals:
+        # The first element with the tag is used, like in the template
+        header = dict((element.tag, element.text or "") for element in reversed(readHeader(journal)[0]))
+        counts = {"tests": 0, "failures": 0, "errors": 0}
+        testcases.seek(0)
+        testcases.truncate()
+        for phase in readPhases(journal):
+            counts["tests"] += 1
+            for test in phase.findall("test"):
+                if test.text == "FAIL" and phase.get("type") == "FAIL":
+                    counts["failures"] += 1
+                elif test.text == "FAIL" and phase.get("type") == "WARN":
+                    counts["errors"] += 1
+            tests = phase.findall("test")
+            results = [test for test in tests if test.text != "PASS"]
+            testcase = journalling.XunitStream.testcase(phase, len(tests), results)
+            testcases.write(serialize(testcase, b"    "))
+        testsuite = etree.Element("testsuite")
+        testsuite.set("name", header.get("testname", ""))
+        for name in ("tests", "failures", "errors"):
+            testsuite.set(name, str(counts[name]))
+            totals[name] += counts[name]
+        testsuite.set("hostname", header.get("hostname", ""))
+        testsuite.set("id", header.get("test_id", ""))
+        testsuite.set("package", header.get("package", ""))
+        spool.write(startTag(testsuite))
+        # Properties are always empty, catch-all template of the header wins
+        spool.write(b"    <properties/>\n")
+        testcases.seek(0)
+        shutil.copyfileobj(testcases, spool)
+        spool.write(b"  </testsuite>\n")
+
+    testsuites = etree.Element("testsuites")
+    for name in ("tests", "failures", "errors"):
+        testsuites.set(name, str(totals[name]))
+    output.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+    output.write(startTag(testsuites, b""))
+    spool.seek(0)
+    shutil.copyfileobj(spool, output)
+    output.write(b"</testsuites>\n")
+
+
+def openOutput(path):
+    if path == "-":
+        return getattr(sys.stdout, "buffer", sys.stdout)
+    return open(path, "wb")
+
+
+def main():
+    optparser = OptionParser(usage="%prog [options] JOURNAL|PATTERN|- ...",
+                             description="Merges journals into one journal and/or xunit report.")
+    optparser.add_option("-o", "--output", default=None, dest="output", metavar="FILE",
+                         help="merged journal, '-' for standard output, which is the default without --xunit")
+    optparser.add_option("-x", "--xunit", default=None, dest="xunit", metavar="FILE",
+                         help="merged xunit report, '-' for standard output")
+    optparser.add_option("--order", default="time", dest="order", choices=("time", "input"),
+                         help="order of phases in the merged journal, by start 'time' (default) or as in 'input'; " +
+                              "'input' reads one journal at a time")
+    (options, args) = optparser.parse_args()
+
+    if not args:
+        optparser.error("journals to merge are needed")
+    journals = []
+    for pattern in args:
+        if pattern == "-":
+            journals.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            journals.extend(sorted(glob.glob(pattern)) or [pattern])
+    if not journals:
+        optparser.error("no journals to merge")
+    if options.output is None and options.xunit is None:
+        options.output = "-"
+
+    try:
+        if options.output is not None:
+            output = openOutput(options.output)
+            mergeJournals(journals, output, options.order)
+            output.flush()
+        if options.xunit is not None:
+            output = openOutput(options.xunit)
+            mergeXunit(journals, output)
+            output.flush()
+    except (IOError, OSError, MergeError) as e:
+        sys.stderr.write("Failed to merge journals: %s\n" % str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+# Description: Follows metafile and writes events of the journal as it grows
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# Run by journalling.py --follow, records of the metafile are converted by
+# its stream of the journal.
+
+import collections
+import ctypes
+import errno
+import json
+import os
+import select
+import sys
+import time
+from journalling import JournalStream, readMetafile, COMPACT_MAGIC
+
+# Interval in seconds of checking the followed metafile for new records
+# when inotify is not available, and for its removal otherwise
+FOLLOW_INTERVAL = 1.0
+# inotify flags from <sys/inotify.h>
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+
+
+# Writes events of the journal as lines of JSON to output while metafile
+# records are fed to it: start and end of phases in the log, and tests and
+# metrics in them. Only the stack of open elements is kept in memory, closed
+# elements are dropped.
+class EventStream(JournalStream):
+    def __init__(self, output):
+        JournalStream.__init__(self)
+        self.output = output
+        # Frame created by the last record and the last phase with end event
+        self.created = None
+        self.ended = None
+
+    # Writes event with attributes of the element, fields are pairs of event
+    # field and attribute name or a value
+    def emit(self, event, element, *fields):
+        record = collections.OrderedDict([("event", event)])
+        for field, value in fields:
+            if value is None:
+                value = element.get(field)
+            if value is not None:
+                record[field] = value
+        self.output.write(json.dumps(record).encode('utf-8') + b'\n')
+
+    def newFrame(self, new_el, element, attributes, content):
+        self.created = JournalStream.newFrame(self, new_el, element, attributes, content)
+        return self.created
+
+    def feedParsed(self, indent, element, attributes, content, new_el=None):
+        JournalStream.feedParsed(self, indent, element, attributes, content, new_el)
+        if self.created is None:
+            return
+        # The record created the current element, its ancestors are on the stack
+        element = self.created.element
+        self.created = None
+        level = self.getPhaseLevel(self.stack.items, element)
+        if level is not None:
+            self.emit("phase-start", element, ("name", None), ("type", None), ("level", level),
+                      ("time", element.get("timestamp")))
+            return
+        parent = self.stack.peek().element
+        if self.getPhaseLevel(self.stack.items[:-1], parent) is None:
+            return
+        if element.tag == "test":
+            self.emit("test", element, ("phase", parent.get("name")), ("message", None), ("result", element.text),
+                      ("command", None), ("time", element.get("timestamp")))
+        elif element.tag == "metric":
+            self.emit("metric", element, ("phase", parent.get("name")), ("name", None), ("type", None),
+                      ("value", None), ("tolerance", None), ("time", element.get("timestamp")))
+
+    # Phase ends with its closing record, or once an element follows it
+    # if there is no such record
+    def endPhase(self):
+        if self.current is self.ended:
+            return
+        level = self.getPhaseLevel(self.stack.items, self.current.element)
+        if level is None:
+            return
+        self.ended = self.current
+        element = self.current.element
+        starttime, endtime = element.get("starttime"), element.get("endtime")
+        if starttime is None:
+            starttime, endtime = self.current.getStartEndTime()
+        self.emit("phase-end", element, ("name", None), ("type", None), ("level", level), ("result", None),
+                  ("score", None), ("starttime", starttime), ("endtime", endtime))
+
+    def closeCurrent(self, attributes={}):
+        JournalStream.closeCurrent(self, attributes)
+        self.endPhase()
+
+    def append(self):
+        self.endPhase()
+        starttime, endtime = self.current.getStartEndTime()
+        self.stack.peek().addTimes(starttime, endtime)
+
+
+# Returns inotify descriptor watching changes of the file, None if inotify
+# is not available
+def watchFile(path):
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if not isinstance(path, bytes):
+        path = path.encode(sys.getfilesystemencoding())
+    # Removal of the file changes its link count
+    if libc.inotify_add_watch(fd, path, IN_MODIFY | IN_ATTRIB) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+# Follows metafile as it grows and writes events of the journal as lines of
+# JSON to a file, which may be a FIFO, or standard output. Each record is
+# parsed once, when it is complete. Ends when the metafile is removed or
+# the output is closed by its reader.
+def followJournal(options):
+    try:
+        fh = open(options.metafile, 'rb')
+        if options.follow == '-':
+            output = getattr(sys.stdout, 'buffer', sys.stdout)
+        else:
+            output = open(options.follow, 'wb')
+    except IOError as e:
+        sys.stderr.write('Failed to follow metafile %s: %s\n' % (options.metafile, str(e)))
+        return 1
+    watch = watchFile(options.metafile)
+    stream = EventStream(output)
+    compact = None
+    offset = 0
+    try:
+        while True:
+            stat = os.fstat(fh.fileno())
+            if stat.st_nlink == 0:
+                break
+            if stat.st_size < offset:
+                # Metafile was truncated and is written from scratch
+                stream = EventStream(output)
+                stream.emit("reset", None)
+                compact = None
+                offset = 0
+            if compact is None:
+                fh.seek(0)
+                first = fh.readline()
+                if first.endswith(b'\n'):
+                    compact = first == COMPACT_MAGIC
+            if compact is not None and stat.st_size > offset:
+                fh.seek(offset)
+                for parsed, size, complete in readMetafile(fh, compact):
+                    # Record which is still being written is read again later
+                    if not complete:
+                        break
+                    stream.feedParsed(*parsed)
+                    offset += size
+                output.flush()
+            if watch is None:
+                time.sleep(FOLLOW_INTERVAL)
+            elif select.select([watch], [], [], FOLLOW_INTERVAL)[0]:
+                os.read(watch, 65536)
+    except KeyboardInterrupt:
+        pass
+    except IOError as e:
+        # Reader of the output is gone
+        if e.errno != errno.EPIPE:
+            sys.stderr.write('Failed to follow metafile %s: %s\n' % (options.metafile, str(e)))
+            return 1
+    fh.close()
+    return 0
@@ -0,0 +1,99 @@
+# Description: Index of byte ranges of phases in the journal
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# The index is saved next to the journal by journalling.py, phases are then
+# read from the journal without parsing the whole of it.
+
+import json
+import os
+import sys
+from lxml import etree
+
+# Version of the phase index format, indexes of other versions are ignored
+INDEX_VERSION = 1
+
+
+# Writes index of phases of the journal saved by the stream. The index is
+# JSON with size and modification time of the journal, which identify it,
+# and list of phases in order of the journal, each with offsets of its first
+# byte and of the byte following it, type, name, result and nesting level.
+def saveIndex(stream, index_path, journal_path):
+    index = {"version": INDEX_VERSION, "size": stream.size, "mtime": None, "phases": [
+        {"start": start, "end": end, "type": type, "name": name, "result": result, "level": level}
+        for start, end, type, name, result, level in stream.phases]}
+    try:
+        if journal_path:
+            index["mtime"] = os.stat(journal_path).st_mtime
+        # Readers never see a partially written index
+        output = open(index_path + ".tmp", 'w')
+        json.dump(index, output, sort_keys=True)
+        output.close()
+        os.rename(index_path + ".tmp", index_path)
+        return 0
+    except (IOError, OSError) as e:
+        sys.stderr.write('Failed to save index to %s: %s\n' % (index_path, str(e)))
+        return 1
+
+
+# Returns phases of the index of the journal as saved by saveIndex.
+# Raises ValueError if the index belongs to another version of the journal,
+# IOError or OSError if it cannot be read.
+def loadIndex(index_path, journal_path):
+    index_file = open(index_path)
+    try:
+        index = json.load(index_file)
+    finally:
+        index_file.close()
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError("index %s has unsupported version" % index_path)
+    stat = os.stat(journal_path)
+    if stat.st_size != index["size"] or index["mtime"] is not None and stat.st_mtime != index["mtime"]:
+        raise ValueError("index %s does not match journal %s" % (index_path, journal_path))
+    return index["phases"]
+
+
+# Returns phases of the index with given name, type and result, None matches any
+def findPhases(phases, name=None, type=None, result=None):
+    return [phase for phase in phases if (name is None or phase["name"] == name) and
+            (type is None or phase["type"] == type) and (result is None or phase["result"] == result)]
+
+
+# Returns phase element of the index read from the journal, only the part
+# of the journal with the phase is read and parsed
+def readPhase(journal_path, phase):
+    journal = open(journal_path, 'rb')
+    try:
+        journal.seek(phase["start"])
+        data = journal.read(phase["end"] - phase["start"])
+    finally:
+        journal.close()
+    return etree.fromstring(data)
+
+
+# Prints phases of the journal with given name found by its index
+def lookupPhase(options):
+    if not options.journal or not options.index:
+        sys.stderr.write('Both journal and index are needed to look up a phase\n')
+        return 1
+    try:
+        phases = findPhases(loadIndex(options.index, options.journal), name=options.phase)
+        output = getattr(sys.stdout, 'buffer', sys.stdout)
+        for phase in phases:
+            output.write(etree.tostring(readPhase(options.journal, phase), encoding='utf-8') + b'\n')
+    except (IOError, OSError, ValueError, KeyError, etree.LxmlError) as e:
+        sys.stderr.write('Failed to look up phase %s: %s\n' % (options.phase, str(e)))
+        return 1
+    return 0 if phases else 1
@@ -28,8 +28,18 @@ try:
     import re
     import sys
     import six
+    import copy
+    import json
+    import collections
+    import fcntl
+    import glob
+    import multiprocessing
+    import resource
+    import hashlib
     import time
-    import base64
+    import binascii
+    import shutil
+    import tempfile
     from optparse import OptionParser
 except ImportError as e:
     sys.stderr.write("Python ImportError: " + str(e) + "\nExiting unsuccessfully.\n")
@@ -40,10 +50,54 @@ except ImportError as e:
     sys.stderr.write("Python ImportError: " + str(e) + "\nExiting unsuccessfully.\n")
     exit(3)
 
+# modules shared by the tools are installed to the data directory of
+# beakerlib, in the source tree they are next to the tools
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'share', 'beakerlib', 'python'))
+from journalindex import saveIndex, lookupPhase
+
 
 xmlForbidden = [0, 1, 2, 3, 4, 5, 6, 7, 8, 11, 12, 14, 15, 16, 17, 18, 19, 20,
                 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 0xFFFE, 0xFFFF]
 xmlTrans = dict([(x, None) for x in xmlForbidden])
+# Strings without any match are plain ASCII with no forbidden characters
+# and can be used as they are
+xmlUnsafe = re.compile(b'[^\t\n\r\x20-\x7e]')
+xmlUnsafeText = re.compile(u'[^\t\n\r\x20-\x7e]')
+
+# Leading whitespace and the first token of a metafile line
+lineHead = re.compile(r'(\s*)(\S*)')
+# Attribute '--name=value' or content indicator '--' followed by the content,
+# which also consumes the rest of the line as parsing ends with the content
+lineToken = re.compile(r'(?<!\S)--(?:([a-zA-Z0-9]+)=(\S*)|(?!\S)\s*(\S*).*)')
+
+# First line of metafile in the compact format. Each record of the format is
+# a head line with indent level, element name or '-' for closing record and
+# timestamp separated by spaces, followed by ' name=length' for each attribute
+# and ' =length' for content. Raw utf8 values of the given lengths in bytes
+# follow the head and the record ends with a newline. Lines starting with '#'
+# between records are comments.
+COMPACT_MAGIC = b'#beakerlib-metafile compact\n'
+COMPACT_CHUNK = 65536
+compactHead = re.compile(br'(\d+) (\S+) (\d+)((?: [a-zA-Z0-9]*=\d+)*)\n')
+compactField = re.compile(br' ([a-zA-Z0-9]*)=(\d+)')
+# Names of elements and attributes by their bytes, '-' is closing record
+compactNames = {b'-': ""}
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
+# Formatted timestamps by their epoch second as consecutive lines mostly share
+# the same one. The cache is emptied once it reaches its size.
+TIME_CACHE_SIZE = 4096
+timeCache = {}
+
+# Serialized children of an open element are kept in memory up to this size,
+# bigger ones are moved to a temporary file.
+SPOOL_SIZE = 1024 * 1024
+
+# Version of the checkpoint format, checkpoints of other versions are ignored
+CHECKPOINT_VERSION = 3
+# Size of the metafile part preceding the checkpoint offset which is verified
+# to be unchanged before the checkpoint is used
+CHECKPOINT_TAIL = 4096
 
 
 class Stack:
@@ -60,6 +114,120 @@ class Stack:
         return self.items[-1]
 
 
+# Clocks of wall and CPU time, falling back to ones available in python 2
+wallClock = getattr(time, 'perf_counter', time.time)
+cpuClock = getattr(time, 'process_time', getattr(time, 'clock', time.time))
+
+
+# Measures wall and CPU time of stages of the conversion. Time of a stage
+# excludes time of stages measured inside it, e.g. decoding inside parsing.
+class Stats:
+    def __init__(self):
+        # Wall time, CPU time and number of calls by stage
+        self.stages = {}
+        self.records = 0
+        self.bytes = 0
+        # Stage, its wall and CPU start and time of stages inside it
+        self.running = []
+        self.wall = wallClock()
+        self.cpu = cpuClock()
+
+    def start(self, stage):
+        self.running.append([stage, wallClock(), cpuClock(), 0.0, 0.0])
+
+    def stop(self):
+        stage, wall, cpu, inner_wall, inner_cpu = self.running.pop()
+        wall = wallClock() - wall
+        cpu = cpuClock() - cpu
+        times = self.stages.setdefault(stage, [0.0, 0.0, 0])
+        times[0] += wall - inner_wall
+        times[1] += cpu - inner_cpu
+        times[2] += 1
+        if self.running:
+            self.running[-1][3] += wall
+            self.running[-1][4] += cpu
+
+    # Returns function measured as stage
+    def timed(self, stage, function):
+        def measured(*args, **kwargs):
+            self.start(stage)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.stop()
+        return measured
+
+    # Returns records of metafile with their reading measured
+    def read(self, records):
+        while True:
+            self.start("read")
+            try:
+                record = next(records)
+            except StopIteration:
+                return
+            finally:
+                self.stop()
+            self.records += 1
+            self.bytes += record[1]
+            yield record
+
+    # Returns the statistics as a structure which can be stored in JSON
+    def getReport(self, **fields):
+        wall = wallClock() - self.wall
+        cpu = cpuClock() - self.cpu
+        stages = {}
+        for stage, (stage_wall, stage_cpu, calls) in self.stages.items():
+            stages[stage] = {"wall": round(stage_wall, 6), "cpu": round(stage_cpu, 6), "calls": calls}
+            wall -= stage_wall
+            cpu -= stage_cpu
+        stages["other"] = {"wall": round(wall, 6), "cpu": round(cpu, 6), "calls": 1}
+        report = {"records": self.records, "bytes": self.bytes,
+                  "elements": self.stages.get("create", [0, 0, 0])[2], "stages": stages,
+                  # Peak of the whole process, in KiB on Linux
+                  "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+        report.update(fields)
+        return report
+
+    # Writes the statistics as a line of JSON appended to file or to
+    # standard error output if the path is '-'
+    def save(self, path, **fields):
+        line = json.dumps(self.getReport(**fields), sort_keys=True) + "\n"
+        try:
+            if path == '-':
+                sys.stderr.write(line)
+            else:
+                output = open(path, 'a')
+                output.write(line)
+                output.close()
+        except IOError as e:
+            sys.stderr.write('Failed to save statistics to %s: %s\n' % (path, str(e)))
+
+
+# Returns function measured as stage by statistics, the function itself if
+# the statistics are not collected, so the conversion is not slowed down
+def measured(stats, stage, function):
+    if stats is None:
+        return function
+    return stats.timed(stage, function)
+
+
+# Parsed XSL transformations by path of their template, so each process
+# parses the template only once
+transforms = {}
+
+
+# Returns XSL transformation for template file, raises etree.LxmlError
+def getTransform(xslt):
+    if xslt not in transforms:
+        transforms[xslt] = etree.XSLT(etree.parse(xslt))
+    return transforms[xslt]
+
+
+# Returns journal transformed by template file, raises etree.LxmlError
+def transformJournal(xslt, journal):
+    return getTransform(xslt)(journal)
+
+
 # Saves the XML journal to a file.
 def saveJournal(journal, journal_path):
     try:
@@ -82,104 +250,200 @@ def addStartEndTime(element, starttime, endtime):
     return 0
 
 
-# Find first and last timestamp to fill in starttime and endtime attributes of given element.
-def getStartEndTime(element):
-    starttime = ""
-    endtime = ""
-    for child in element.iter():
-        if child.get("timestamp"):
-            if starttime == "":
-                starttime = child.get("timestamp")
-            endtime = child.get("timestamp")
+# Decodes base64 encoded string from metafile, exits on failure
+def decodeBase64(value):
+    try:
+        return binascii.a2b_base64(value)
+    except (binascii.Error, TypeError, ValueError) as e:
+        sys.stderr.write('Failed to decode string \'%s\' from base64.\
+                \nError: %s\nExiting unsuccessfully.\n' % (value, e))
+        exit(1)
+
 
-    return starttime, endtime
+# Returns local time string for timestamp given as epoch seconds, exits on failure
+def formatTime(timestamp):
+    try:
+        return timeCache[timestamp]
+    except KeyError:
+        pass
+    try:
+        # Time zone is looked up for each second so DST changes are respected
+        formatted = time.strftime(TIME_FORMAT, time.localtime(int(timestamp)))
+    except ValueError as e:
+        sys.stderr.write('Failed to convert timestamp attribute to int.\
+                \nError: %s\nExiting unsuccessfully.\n' % (e))
+        exit(1)
+    if len(timeCache) >= TIME_CACHE_SIZE:
+        timeCache.clear()
+    timeCache[timestamp] = formatted
+    return formatted
 
 
-# Parses and decodes lines given to it
+# Parses and decodes lines given to it, decoding of base64 may be measured
 # Returns number of spaces before element, name of the element,
 # its attributes in a dictionary, and content of the element.
-def parseLine(line):
-    TIME_FORMAT = "%Y-%m-%d %H:%M:%S %Z"
-    CONTENT_FLAG = 0
+def parseLine(line, decode=decodeBase64):
     attributes = {}
     content = ""
 
     # Stripping comments
-    line = line.split('#')[0]
+    line = line.split('#', 1)[0]
+    head = lineHead.match(line)
+    element = head.group(2)
+    # Empty line is ending line
+    if not element:
+        return 0, "", {}, ""
     # Count number of leading spaces
-    indent = len(line) - len(line.lstrip())
+    indent = head.end(1)
+    # If first 2 characters are '-', it is not new element, but ending of pair element
+    if element.startswith('--'):
+        element = ""
 
-    # Splitting the line into a list
-    splitted = line.split()
+    # Parsing the rest of the line, tokens other than attributes and content are ignored
+    for attribute_name, attribute_value, part in lineToken.findall(line):
+        # Elements time attribute
+        if attribute_name == "timestamp":
+            attributes[attribute_name] = formatTime(attribute_value)
+        # Elements regular attribute
+        elif attribute_name:
+            attributes[attribute_name] = decode(attribute_value)
+        # Elements content, which is always the last one
+        elif part:
+            content = decode(part)
 
-    # If the line is not empty
-    if splitted:
-        # If first 2 characters are '-', it is not new element, but ending of pair element
-        if splitted[0][0] == '-' and splitted[0][1] == '-':
-            element = ""
-        else:
-            element = splitted[0]
-    # else it is ending line
-    else:
-        return 0, "", {}, ""
+    return indent, element, attributes, content
 
-    # Parsing the rest of the line
-    for part in splitted:
-        # If flag is set, string is an elements content
-        if CONTENT_FLAG == 1:
-            # String is decoded from base64
-            try:
-                content = base64.b64decode(part)
-            except TypeError as e:
-                sys.stderr.write('Failed to decode string \'%s\' from base64.\
-                        \nError: %s\nExiting unsuccessfully.\n' % (part[1:-1], e))
-                exit(1)
-            # End parsing after content is stored
-            break
-        # Test if string is an elements content indicator
-        if part == '--':
-            CONTENT_FLAG = 1
-            continue
 
-        # Test if string is the elements time attribute
-        if re.match(r'^--timestamp=', part):
-            attribute_name = "timestamp"
-            # Value is string after '=' sign
-            attribute_value = part.split('=', 1)[1]
-            try:
-                attributes[attribute_name] = time.strftime(TIME_FORMAT, time.localtime(int(attribute_value)))
-            except ValueError as e:
-                sys.stderr.write('Failed to convert timestamp attribute to int.\
-                        \nError: %s\nExiting unsuccessfully.\n' % (e))
-                exit(1)
+# Parses compact record starting at position of data. Returns the same
+# as parseLine and position after the record, or None if the record is not
+# complete or it is not a record at all.
+def parseCompact(data, pos=0):
+    head = compactHead.match(data, pos)
+    if head is None:
+        return None
+    indent, element, timestamp, fields = head.groups()
+    name = compactNames.get(element)
+    element = compactName(element) if name is None else name
+    attributes = {"timestamp": formatTime(timestamp)}
+    content = ""
+    end = head.end()
+    for name, length in compactField.findall(fields):
+        start = end
+        end += int(length)
+        if not name:
+            content = data[start:end]
             continue
+        key = compactNames.get(name)
+        attributes[compactName(name) if key is None else key] = data[start:end]
+    if end >= len(data):
+        return None
+    if data[end:end + 1] == b'\n':
+        end += 1
+    return (int(indent), element, attributes, content), end
 
-        # Test if string is the elements regular attribute
-        if re.match(r'^--[a-zA-Z0-9]+=', part):
-            attribute_name = part.split('=', 1)[0][2:]
-            # Value is string after '=' sign
-            attribute_value = part.split('=', 1)[1]
-            try:
-                attributes[attribute_name] = base64.b64decode(attribute_value)
-            except TypeError as e:
-                sys.stderr.write('Failed to decode string \'%s\' from base64.\
-                        \nError: %s\nExiting unsuccessfully.\n' % (attribute_value, e))
-                exit(1)
-            continue
 
-    return indent, element, attributes, content
+# Returns name of element or attribute in compact record as a string.
+# Names are cached the same way as timestamps.
+def compactName(name):
+    if len(compactNames) >= TIME_CACHE_SIZE:
+        compactNames.clear()
+        compactNames[b'-'] = ""
+    compactNames[name] = name.decode('utf8', 'replace')
+    return compactNames[name]
+
+
+# Returns records of compact metafile read from binary file parsed by parse,
+# see readMetafile. Lines which are not a record are skipped as comments.
+def compactRecords(fh, parse=parseCompact):
+    empty = (0, "", {}, "")
+    data = b''
+    eof = False
+    while not eof:
+        chunk = fh.read(COMPACT_CHUNK)
+        eof = not chunk
+        data += chunk
+        pos = 0
+        while pos < len(data):
+            record = parse(data, pos)
+            if record is not None:
+                yield record[0], record[1] - pos, True
+                pos = record[1]
+                continue
+            end = data.find(b'\n', pos)
+            # Record or line which is not complete yet
+            if end < 0 or compactHead.match(data, pos):
+                break
+            yield empty, end + 1 - pos, True
+            pos = end + 1
+        data = data[pos:]
+    # Record which is still being written
+    if data:
+        yield empty, len(data), False
+
+
+# Returns records of text metafile read from binary file parsed by parse,
+# see readMetafile
+def textRecords(fh, parse=parseLine):
+    for line in fh:
+        yield parse(line.decode('utf8', 'replace')), len(line), line.endswith(b'\n')
+
+
+# Returns True if metafile opened as binary file is in the compact format
+def isCompact(fh):
+    position = fh.tell()
+    fh.seek(0)
+    compact = fh.read(len(COMPACT_MAGIC)) == COMPACT_MAGIC
+    fh.seek(position)
+    return compact
+
+
+# Returns records of metafile read from binary file from its current position
+# as tuples of the record parsed as by parseLine, its size in bytes and whether
+# it is complete. If compact is not given, the format is detected by the first
+# line, so the file has to be at its beginning. Reading, parsing and decoding
+# are measured by stats if they are given.
+def readMetafile(fh, compact=None, stats=None):
+    if stats is None:
+        return metafileRecords(fh, compact, parseLine, parseCompact)
+    decode = stats.timed("decode", decodeBase64)
+    parse = stats.timed("parse", lambda line: parseLine(line, decode))
+    return stats.read(metafileRecords(fh, compact, parse, stats.timed("parse", parseCompact)))
+
+
+# Returns records of metafile with lines parsed by parseText and compact
+# records by parseRecord, see readMetafile
+def metafileRecords(fh, compact, parseText, parseRecord):
+    if compact is None:
+        first = fh.readline()
+        compact = first == COMPACT_MAGIC
+        if first:
+            yield parseText(first.decode('utf8', 'replace')), len(first), first.endswith(b'\n')
+    if compact:
+        for record in compactRecords(fh, parseRecord):
+            yield record
+    else:
+        for record in textRecords(fh, parseText):
+            yield record
+
+
+# Returns text usable in XML from a string or bytes encoded in utf8.
+# XML not compatible characters are stripped from the string.
+def xmlText(string):
+    if isinstance(string, bytes):
+        # Pure ASCII needs neither utf8 decoding nor stripping
+        if xmlUnsafe.search(string) is None:
+            return string.decode('ascii')
+        string = string.decode('utf8', 'replace')
+    elif xmlUnsafeText.search(string) is None:
+        return string
+    # Retyped to string, using 'six' module which adds python 2/3 compatible methods.
+    return six.text_type(string).translate(xmlTrans)
 
 
 # Returns XML element created with
 # information given as parameters
 def createElement(element, attributes, content):
-    # In python 3 decoding from base64 causes retyping into bytes.
-    if isinstance(element, bytes):
-        # First bytes are decoded from utf8.
-        element = element.decode('utf8', 'replace')
-    # And then retyped to string, using 'six' module which adds python 2/3 compatible methods.
-    # XML not compatible characters are then also stripped from the string.
-    element = six.text_type(element).translate(xmlTrans)
+    element = xmlText(element)
 
     try:
         new_el = etree.Element(element)
@@ -187,174 +451,904 @@ def createElement(element, attributes, content):
         sys.stderr.write('Failed to create element with name %s\nError: %s\nExiting unsuccessfully.\n' % (element, e))
         exit(1)
 
-    if isinstance(content, bytes):
-        content = content.decode('utf8', 'replace')
-    new_el.text = six.text_type(content).translate(xmlTrans)
+    new_el.text = xmlText(content)
 
     for key, value in attributes.items():
-        if isinstance(key, bytes):
-            key = key.decode('utf8', 'replace')
-        key = six.text_type(key).translate(xmlTrans)
-
-        if isinstance(value, bytes):
-            value = value.decode('utf8', 'replace')
-        value = six.text_type(value).translate(xmlTrans)
-        new_el.set(key, value)
+        new_el.set(xmlText(key), xmlText(value))
     return new_el
 
 
-# Main loop of the program
-# Reads metafile or stdin line by line and adds
-# information from them into XML document
-def createJournalXML(options):
-    # If --metafile option is used read from it, else read standard input
-    if options.metafile:
-        try:
-            fh = open(options.metafile, 'r+')
-        except IOError as e:
-            sys.stderr.write('Failed to open queue file with' + str(e), 'FAIL')
-            return 1
+# Returns serialized element split into the part before its children
+# and the part after them.
+def splitElement(element):
+    data = etree.tostring(element, encoding='utf-8')
+    tail = b'</' + six.text_type(element.tag).encode('utf-8') + b'>'
+    if data.endswith(tail):
+        return data[:-len(tail)], tail
+    # Element without text is serialized as an empty-element tag
+    return data[:-2] + b'>', tail
 
-        lines = fh.readlines()
-        fh.close()
+
+# Copies content of a spool from offset start to offset end to output.
+def copySpool(spool, output, start=0, end=None):
+    spool.seek(start)
+    if end is None:
+        shutil.copyfileobj(spool, output)
     else:
-        lines = sys.stdin.readlines()
-
-    # Indent level of previous line, initialized to -1
-    old_indent = -1
-    # Initialize root element
-    previous_el = etree.Element("BEAKER_TEST")
-    journal = previous_el
-    # Stack of elements
-    el_stack = Stack()
-
-    # Main loop, going through lines of metafile, adding elements
-    for line in lines:
-        indent, element, attributes, content = parseLine(line)
+        remaining = end - start
+        while remaining > 0:
+            chunk = spool.read(min(remaining, 65536))
+            if not chunk:
+                break
+            output.write(chunk)
+            remaining -= len(chunk)
+    # Further children are appended at the end
+    spool.seek(0, os.SEEK_END)
+
+
+# Returns first and last timestamp of an element extended by timestamps of its
+# following descendant.
+def mergeTimes(first, last, starttime, endtime):
+    return first or starttime, endtime or last
+
+
+# Output counting bytes written to it, used for offsets of indexed phases
+class CountingOutput:
+    def __init__(self, output):
+        self.output = output
+        self.position = 0
+
+    def write(self, data):
+        self.output.write(data)
+        self.position += len(data)
+
+
+# Element which is still open during conversion.
+# Its children are serialized to the spool as soon as they are closed,
+# only the element itself (without children) is kept in memory.
+class Frame:
+    def __init__(self, element):
+        self.element = element
+        self.spool = None
+        # File used as the spool when the state is checkpointed
+        self.path = None
+        # First and last timestamp of already closed descendants
+        self.first = ""
+        self.last = ""
+        # Indexed phases among closed descendants, each as list of start and
+        # end offset in the spool, type, name, result and nesting level
+        self.marks = []
+
+    def write(self, data):
+        if self.spool is None:
+            if self.path is None:
+                self.spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            else:
+                self.spool = open(self.path, 'w+b')
+        self.spool.write(data)
+
+    def release(self):
+        self.spool.close()
+        self.spool = None
+        if self.path is not None:
+            os.remove(self.path)
+
+    # Returns first and last timestamp of the element and its closed descendants.
+    def getStartEndTime(self):
+        timestamp = self.element.get("timestamp") or ""
+        return timestamp or self.first, self.last or timestamp
+
+    # Accounts first and last timestamp of a closed child.
+    def addTimes(self, starttime, endtime):
+        self.first, self.last = mergeTimes(self.first, self.last, starttime, endtime)
+
+    # Returns the frame as a structure which can be stored in JSON
+    def getState(self):
+        element = self.element
+        spool = None
+        if self.spool is not None:
+            self.spool.flush()
+            spool = self.spool.tell()
+        return {"tag": element.tag, "attributes": list(element.attrib.items()), "text": element.text,
+                "first": self.first, "last": self.last, "path": self.path, "spool": spool, "marks": self.marks}
+
+    # Creates the frame from structure returned by getState
+    @staticmethod
+    def fromState(state):
+        element = etree.Element(state["tag"])
+        for key, value in state["attributes"]:
+            element.set(key, value)
+        element.text = state["text"]
+        frame = Frame(element)
+        frame.first, frame.last, frame.path = state["first"], state["last"], state["path"]
+        frame.marks = state["marks"]
+        if state["spool"] is not None:
+            frame.spool = open(frame.path, 'r+b')
+            # Data written after the checkpoint are dropped
+            frame.spool.seek(0, os.SEEK_END)
+            if frame.spool.tell() < state["spool"]:
+                frame.spool.close()
+                raise ValueError("spool %s is shorter than expected" % frame.path)
+            frame.spool.truncate(state["spool"])
+            frame.spool.seek(0, os.SEEK_END)
+        return frame
+
+
+# Creates the journal out of metafile lines and streams it to output.
+# Elements are written out as soon as they are closed, so memory consumption
+# depends on nesting depth of the journal rather than on number of records.
+# First and last timestamp are tracked on the stack of open elements,
+# so start and end times are known the moment an element is closed.
+class JournalStream:
+    def __init__(self, directory=None, index=False, stats=None):
+        self.root = Frame(etree.Element("BEAKER_TEST"))
+        # Creation of elements is measured by stats if they are given
+        self.createElement = measured(stats, "create", createElement)
+        # Directory with spools of open elements if the state is checkpointed
+        self.directory = directory
+        # Byte ranges of phases in the log are tracked for the phase index,
+        # once the journal is saved they are in phases and its size in size
+        self.index = index
+        self.phases = []
+        self.size = 0
+        # Indent level of previous line, initialized to -1
+        self.old_indent = -1
+        # Element created by previous line and stack of its ancestors
+        self.current = self.root
+        self.stack = Stack()
+        # Position of elements starttime and endtime in the root spool,
+        # their content is filled in when the journal is saved
+        self.header = {}
+
+    # Puts element to the top of the stack
+    def push(self, frame):
+        if self.directory is not None:
+            frame.path = os.path.join(self.directory, "%d.spool" % len(self.stack.items))
+        self.stack.push(frame)
+
+    # Serialization of the journal, other formats override these
+
+    declaration = b"<?xml version='1.0' encoding='utf-8'?>\n"
+
+    # Returns serialized element without children
+    def serialize(self, element):
+        return etree.tostring(element, encoding='utf-8')
+
+    # Returns serialized element split into the part before its children
+    # and the part after them
+    def split(self, element):
+        return splitElement(element)
+
+    # Returns string written to parent before its next child
+    def separator(self, parent):
+        # Children of the root are the only pretty printed elements
+        if parent is self.root:
+            return b'\n  '
+        return b''
+
+    # Writes the element together with its children to output
+    # and releases the spool.
+    def dump(self, frame, output):
+        if frame.spool is None:
+            output.write(self.serialize(frame.element))
+            return
+        head, tail = self.split(frame.element)
+        output.write(head)
+        copySpool(frame.spool, output)
+        frame.release()
+        output.write(tail)
+
+    # Appends current element to the element 1 level above
+    def append(self):
+        parent = self.stack.peek()
+        starttime, endtime = self.current.getStartEndTime()
+        parent.addTimes(starttime, endtime)
+        separator = self.separator(parent)
+        if separator:
+            parent.write(separator)
+        tag = self.current.element.tag
+        # Only phases and elements containing them are indexed
+        marked = self.index and (tag == "phase" or self.current.marks)
+        if parent is not self.root and not marked:
+            self.dump(self.current, parent)
+            return
+        patch = tag in ("starttime", "endtime") and tag not in self.header and self.current.spool is None
+        start = parent.spool.tell() if parent.spool is not None else 0
+        self.dump(self.current, parent)
+        if parent is self.root and patch:
+            self.header[tag] = (start, parent.spool.tell(), self.current.element)
+        if marked:
+            self.mark(parent, start)
+
+    # Returns nesting level of element with ancestors in frames if it is a phase
+    # in the log, phases may be nested in other phases; None for other elements
+    def getPhaseLevel(self, frames, element):
+        if len(frames) < 2 or frames[1].element.tag != "log" or element.tag != "phase":
+            return None
+        for frame in frames[2:]:
+            if frame.element.tag != "phase":
+                return None
+        return len(frames) - 2
+
+    # Returns the index entry of a phase with its offsets
+    def getMark(self, element, start, end, level):
+        return [start, end, element.get("type", ""), element.get("name", ""), element.get("result", ""), level]
+
+    # Moves indexed phases of the current element written to parent at
+    # offset start to the parent, together with the current element itself
+    def mark(self, parent, start):
+        frame = self.current
+        if frame.marks:
+            offset = start + len(self.split(frame.element)[0])
+            for mark in frame.marks:
+                parent.marks.append([mark[0] + offset, mark[1] + offset] + mark[2:])
+            frame.marks = []
+        level = self.getPhaseLevel(self.stack.items, frame.element)
+        if level is not None:
+            parent.marks.append(self.getMark(frame.element, start, parent.spool.tell(), level))
+
+    # Updates start and end time of current element, closing line may update other attributes
+    def closeCurrent(self, attributes={}):
+        starttime, endtime = self.current.getStartEndTime()
+        # If the closing element has a --timestamp, this value will be used as endtime
+        if "timestamp" in attributes:
+            endtime = attributes["timestamp"]
+        # Updating attributes found on closing line
+        for key, value in attributes.items():
+            self.current.element.set(key, value)
+        # Add start/end time and remove timestamp attribute
+        addStartEndTime(self.current.element, starttime, endtime)
+
+    # Processes one line of metafile
+    def feed(self, line):
+        self.feedParsed(*parseLine(line))
+
+    # Returns frame for a new element, which may be passed already created
+    def newFrame(self, new_el, element, attributes, content):
+        if new_el is None:
+            new_el = self.createElement(element, attributes, content)
+        return Frame(new_el)
+
+    # Processes one line of metafile returned by parseLine
+    def feedParsed(self, indent, element, attributes, content, new_el=None):
         # Empty line is ignored
         if element == "" and attributes == {}:
-            continue
+            return
 
-        if indent > old_indent:
+        if indent > self.old_indent:
             # Creating new element
-            new_el = createElement(element, attributes, content)
+            new_frame = self.newFrame(new_el, element, attributes, content)
             # Putting previous element to the top of the stack
-            el_stack.push(previous_el)
+            self.push(self.current)
             # New element is now current element
-            previous_el = new_el
+            self.current = new_frame
 
-        elif indent == old_indent:
-            # TODO refactor
+        elif indent == self.old_indent:
             # Closing element with updates to it with no elements inside it
             if element == "":
-                # Updating start and end time
-                starttime, endtime = getStartEndTime(previous_el)
-                # If the closing element has a --timestamp, this value will be used as endtime
-                if "timestamp" in attributes:
-                    endtime = attributes["timestamp"]
-                # Updating attributes found on closing line
-                for key, value in attributes.items():
-                    previous_el.set(key, value)
-                # Add start/end time and remove timestamp attribute
-                addStartEndTime(previous_el, starttime, endtime)
+                self.closeCurrent(attributes)
             # New element is on the same level as previous one
             else:
                 # Previous element has ended so it is appended to the element 1 level above
-                el_stack.peek().append(previous_el)
-                # Creating new element
-                new_el = createElement(element, attributes, content)
-                # New element is now current element
-                previous_el = new_el
+                self.append()
+                self.current = self.newFrame(new_el, element, attributes, content)
 
         # New element is on higher level than previous one
-        elif indent < old_indent:
+        elif indent < self.old_indent:
             # Difference between indent levels = how many paired elements will be closed
-            indent_diff = old_indent - indent
-            for _ in range(indent_diff):
-                el_stack.peek().append(previous_el)
-                previous_el = el_stack.pop()
+            for _ in range(self.old_indent - indent):
+                self.append()
+                self.current = self.stack.pop()
 
             # Closing element with updates to it
             if element == "" and attributes != {}:
-                # Updating start and end time
-                starttime, endtime = getStartEndTime(previous_el)
-                # If the closing element has a --timestamp, this value will be used as endtime
-                if "timestamp" in attributes:
-                    endtime = attributes["timestamp"]
-                # Updating attributes found on closing line
-                for key, value in attributes.items():
-                    previous_el.set(key, value)
-                # Add start/end time and remove timestamp attribute
-                addStartEndTime(previous_el, starttime, endtime)
-
+                self.closeCurrent(attributes)
             # Ending paired element and creating new one on the same level as the paired one that just ended
             elif element != "":
-                # Updating start and end time
-                starttime, endtime = getStartEndTime(previous_el)
-                addStartEndTime(previous_el, starttime, endtime)
-                # Appending previous element to the element 1 level above
-                if el_stack.items:
-                    el_stack.peek().append(previous_el)
-
-                new_el = createElement(element, attributes, content)
-                previous_el = new_el
+                self.closeCurrent()
+                if self.stack.items:
+                    self.append()
+                self.current = self.newFrame(new_el, element, attributes, content)
 
         # Changing indent level to new value
-        old_indent = indent
+        self.old_indent = indent
+
+    # Returns state of the conversion as a structure which can be stored in JSON.
+    # Content of closed elements is kept in spools of the open ones.
+    def getState(self):
+        frames = self.stack.items + [self.current]
+        header = dict((tag, [start, end, Frame(element).getState()])
+                      for tag, (start, end, element) in self.header.items())
+        return {"indent": self.old_indent, "frames": [frame.getState() for frame in frames], "header": header}
+
+    # Restores state of the conversion returned by getState
+    def setState(self, state):
+        frames = []
+        try:
+            for frame in state["frames"]:
+                frames.append(Frame.fromState(frame))
+        except (IOError, OSError, ValueError):
+            for frame in frames:
+                if frame.spool is not None:
+                    frame.spool.close()
+            raise
+        self.root = frames[0]
+        self.stack.items = frames[:-1]
+        self.current = frames[-1]
+        self.old_indent = state["indent"]
+        for tag, (start, end, element) in state["header"].items():
+            self.header[tag] = (start, end, Frame.fromState(element).element)
+
+    # Returns elements below the root which are still open, each with start and
+    # end time it gets when closed at the end of the journal (None if it is not
+    # closed as a paired element), and start and end time of the whole test.
+    # Only the open child of the root is closed as a paired element, or the root
+    # itself if there is no such child.
+    def getOpenTimes(self):
+        opened = self.stack.items[1:] + [self.current] if self.stack.items else []
+        result = []
+        # Going from the innermost element, collect first and last timestamp
+        # each element passes to its parent
+        starttime, endtime = "", ""
+        for frame in reversed(opened):
+            first, last = mergeTimes(frame.first, frame.last, starttime, endtime)
+            timestamp = frame.element.get("timestamp") or ""
+            if frame is opened[0] and len(opened) > 1:
+                result.insert(0, (frame, (timestamp or first, last or timestamp)))
+                starttime, endtime = first, last
+            else:
+                result.insert(0, (frame, None))
+                starttime, endtime = timestamp or first, last or timestamp
+        return result, mergeTimes(self.root.first, self.root.last, starttime, endtime)
+
+    # Writes the journal to output. Elements which are still open are closed
+    # in the output only, so parsing can continue afterwards.
+    def save(self, output):
+        if self.index:
+            output = CountingOutput(output)
+            self.phases = []
+        opened, (starttime, endtime) = self.getOpenTimes()
+        elements = []
+        for frame, times in opened:
+            element = frame.element
+            if times is not None:
+                element = copy.copy(element)
+                addStartEndTime(element, *times)
+            elements.append((frame, element))
+        root = copy.copy(self.root.element)
+        if len(opened) < 2:
+            addStartEndTime(root, starttime, endtime)
+        times = {"starttime": starttime, "endtime": endtime}
+        if len(opened) == 1 and opened[0][0].spool is None:
+            element = opened[0][0].element
+            if element.tag in times and element.tag not in self.header:
+                element = copy.copy(element)
+                element.text = times[element.tag]
+                elements = [(opened[0][0], element)]
+
+        output.write(self.declaration)
+        if self.root.spool is None and not opened:
+            output.write(self.serialize(root) + b'\n')
+            self.size = getattr(output, "position", 0)
+            return
+        head, tail = self.split(root)
+        output.write(head)
+        # Copy closed children of the root, filling in test start and end time
+        position = 0
+        if self.root.spool is not None:
+            # Output offset of the spool and shifts of it by filled in elements
+            shifts = [(0, getattr(output, "position", 0))]
+            for start, end, element in sorted(self.header.values(), key=lambda x: x[0]):
+                copySpool(self.root.spool, output, position, start)
+                element = copy.copy(element)
+                element.text = times[element.tag]
+                data = self.serialize(element)
+                output.write(data)
+                shifts.append((end, shifts[-1][1] + len(data) - (end - start)))
+                position = end
+            copySpool(self.root.spool, output, position)
+            if self.index:
+                for mark in self.root.marks:
+                    shift = [offset for end, offset in shifts if end <= mark[0]][-1]
+                    self.phases.append([mark[0] + shift, mark[1] + shift] + mark[2:])
+        # Close elements which are still open
+        parent = self.root
+        starts = []
+        for frame, element in elements:
+            output.write(self.separator(parent))
+            starts.append(getattr(output, "position", 0))
+            head, _ = self.split(element)
+            output.write(head)
+            if frame.spool is not None:
+                if self.index:
+                    offset = output.position
+                    for mark in frame.marks:
+                        self.phases.append([mark[0] + offset, mark[1] + offset] + mark[2:])
+                copySpool(frame.spool, output)
+            parent = frame
+        for level in reversed(range(len(elements))):
+            frame, element = elements[level]
+            output.write(self.split(element)[1])
+            # Open phases are indexed as well, without their result
+            if self.index and level > 0 and elements[0][1].tag == "log" and \
+                    all(ancestor.tag == "phase" for _, ancestor in elements[1:level + 1]):
+                self.phases.append(self.getMark(element, starts[level], output.position, level - 1))
+        output.write(b'\n' + tail + b'\n')
+        if self.index:
+            self.phases.sort()
+            self.size = output.position
+
+
+# Creates the journal in JSON out of metafile lines. Each element is an object
+# with its tag, attributes, text and list of children.
+class JSONStream(JournalStream):
+    declaration = b''
+
+    def serialize(self, element):
+        head, tail = self.split(element)
+        return head + tail
+
+    def split(self, element):
+        head = json.dumps(collections.OrderedDict((
+            ("tag", element.tag),
+            ("attributes", collections.OrderedDict(element.attrib.items())),
+            ("text", element.text))))
+        return head[:-1].encode('utf-8') + b', "children": [', b']}'
+
+    def separator(self, parent):
+        if parent is self.root:
+            return b'\n  ' if parent.spool is None else b',\n  '
+        return b'' if parent.spool is None else b', '
+
+
+# Creates xunit report out of metafile lines, the same one as XSL transformation
+# of the journal by xslt-templates/xunit.xsl. Only the report is kept in memory.
+class XunitStream(JournalStream):
+    def __init__(self):
+        JournalStream.__init__(self)
+        self.testsuite = etree.Element("testsuite")
+        etree.SubElement(self.testsuite, "properties")
+        # Text of the first child of the root with given tag
+        self.properties = {}
+        # Number of tests and tests other than passed in currently open phase
+        self.assertions = 0
+        self.results = []
+
+    # Returns testcase for a phase with given number of tests and the tests
+    # with results other than PASS; it is used also by journal-merge
+    @staticmethod
+    def testcase(phase, assertions, results):
+        testcase = etree.Element("testcase")
+        testcase.set("name", phase.get("name", ""))
+        testcase.set("assertions", str(assertions))
+        for test in results:
+            if test.text == "FAIL" and phase.get("type") in ("FAIL", "WARN"):
+                tag = "error" if phase.get("type") == "FAIL" else "failure"
+                etree.SubElement(testcase, tag).set("message", test.get("message", ""))
+            # Other results are copied as text by the template, even the empty ones
+            elif len(testcase):
+                testcase[-1].tail = (testcase[-1].tail or "") + (test.text or "")
+            else:
+                testcase.text = (testcase.text or "") + (test.text or "")
+        return testcase
+
+    # Only phases in the log and their tests are reported
+    def append(self):
+        depth = len(self.stack.items)
+        element = self.current.element
+        if depth == 1:
+            self.properties.setdefault(element.tag, element.text or "")
+        elif self.stack.items[1].element.tag != "log":
+            return
+        elif depth == 2 and element.tag == "phase":
+            self.testsuite.append(self.testcase(element, self.assertions, self.results))
+            self.assertions, self.results = 0, []
+        elif depth == 3 and element.tag == "test" and self.stack.peek().element.tag == "phase":
+            self.assertions += 1
+            if element.text != "PASS":
+                self.results.append(element)
+
+    def save(self, output):
+        opened = [frame.element for frame, _ in self.getOpenTimes()[0]]
+        properties = dict(self.properties)
+        testcase = None
+        if opened:
+            properties.setdefault(opened[0].tag, opened[0].text or "")
+        if len(opened) > 1 and opened[0].tag == "log" and opened[1].tag == "phase":
+            assertions, results = self.assertions, self.results
+            if len(opened) > 2 and opened[2].tag == "test":
+                assertions += 1
+                if opened[2].text != "PASS":
+                    results = results + [opened[2]]
+            testcase = self.testcase(opened[1], assertions, results)
+            self.testsuite.append(testcase)
+
+        testsuite = self.testsuite
+        testsuite.set("name", properties.get("testname", ""))
+        testsuite.set("tests", str(len(testsuite) - 1))
+        testsuite.set("failures", str(len(testsuite.findall("testcase/error"))))
+        testsuite.set("errors", str(len(testsuite.findall("testcase/failure"))))
+        testsuite.set("hostname", properties.get("hostname", ""))
+        testsuite.set("id", properties.get("test_id", ""))
+        testsuite.set("package", properties.get("package", ""))
+        output.write(etree.tostring(testsuite, xml_declaration=True, encoding='utf-8', pretty_print=True))
+        # Open phase is not part of the report yet
+        if testcase is not None:
+            testsuite.remove(testcase)
+
+
+# Creates the journal as an element tree, which is needed for XSL transformation.
+# Uses the same bookkeeping of start and end times as JournalStream.
+class JournalTree(JournalStream):
+    def append(self):
+        parent = self.stack.peek()
+        starttime, endtime = self.current.getStartEndTime()
+        parent.addTimes(starttime, endtime)
+        parent.element.append(self.current.element)
+
+    # Closes elements which are still open and returns the root element
+    def getJournal(self):
+        opened, (starttime, endtime) = self.getOpenTimes()
+        parent = self.root.element
+        for frame, times in opened:
+            if times is not None:
+                addStartEndTime(frame.element, *times)
+            parent.append(frame.element)
+            parent = frame.element
+        journal = self.root.element
+        if len(opened) < 2:
+            addStartEndTime(journal, starttime, endtime)
+
+        # Updating start/end time of the whole test
+        for tag, value in (("starttime", starttime), ("endtime", endtime)):
+            element = journal.find(tag)
+            if element is not None:
+                element.text = value
+        return journal
+
+
+# Writes the journal to a file or standard output, and the index of its
+# phases if the stream tracks them
+def saveStream(stream, journal_path, index_path=None):
+    if not journal_path:
+        stream.save(getattr(sys.stdout, 'buffer', sys.stdout))
+        return saveIndex(stream, index_path, None) if index_path else 0
+    try:
+        output = open(journal_path, 'wb')
+        stream.save(output)
+        output.close()
+    except IOError as e:
+        sys.stderr.write('Failed to save journal to %s: %s' % (journal_path, str(e)))
+        return 1
+    return saveIndex(stream, index_path, journal_path) if index_path else 0
+
+
+# Reads records of metafile and streams the journal
+# to a file or standard output
+def streamJournalXML(records, journal_path, index_path=None, stats=None):
+    stream = JournalStream(index=bool(index_path), stats=stats)
+    feed = measured(stats, "build", stream.feedParsed)
+    for parsed, _, _ in records:
+        feed(*parsed)
+    return measured(stats, "save", saveStream)(stream, journal_path, index_path)
+
+
+# Returns identification of the metafile content preceding offset
+def getMetafileId(fh, offset):
+    start = max(0, offset - CHECKPOINT_TAIL)
+    fh.seek(start)
+    digest = hashlib.sha1(fh.read(offset - start)).hexdigest()
+    stat = os.fstat(fh.fileno())
+    return {"device": stat.st_dev, "inode": stat.st_ino, "offset": offset, "digest": digest}
+
+
+# Returns stream restored from checkpoint in directory and metafile offset
+# where the conversion continues. Fresh stream and offset 0 are returned when
+# there is no usable checkpoint, i.e. metafile is not the one the checkpoint
+# was created from or it was changed other way than by appending.
+def loadCheckpoint(directory, fh, index=False, stats=None):
+    state_path = os.path.join(directory, "state.json")
+    stream = JournalStream(directory, index, stats)
+    try:
+        state_file = open(state_path)
+        try:
+            state = json.load(state_file)
+        finally:
+            state_file.close()
+        # Spools are going to be changed, so the state is not valid any more
+        os.remove(state_path)
+        metafile = state["metafile"]
+        # Phases are tracked from the start only
+        if state["version"] != CHECKPOINT_VERSION or state["index"] != index \
+                or os.fstat(fh.fileno()).st_size < metafile["offset"] \
+                or getMetafileId(fh, metafile["offset"]) != metafile:
+            return stream, 0
+        stream.setState(state["stream"])
+        return stream, metafile["offset"]
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return JournalStream(directory, index, stats), 0
+
+
+# Saves state of the stream converted up to offset of metafile to directory
+def saveCheckpoint(directory, stream, fh, offset):
+    state_path = os.path.join(directory, "state.json")
+    state = {"version": CHECKPOINT_VERSION, "metafile": getMetafileId(fh, offset), "index": stream.index,
+             "stream": stream.getState()}
+    try:
+        state_file = open(state_path + ".tmp", 'w')
+        json.dump(state, state_file)
+        state_file.close()
+        os.rename(state_path + ".tmp", state_path)
+    except (IOError, OSError) as e:
+        sys.stderr.write('Failed to save checkpoint to %s: %s\n' % (directory, str(e)))
+
+
+# Streams the journal converting only lines appended to metafile since
+# the previous run. State of the conversion is checkpointed to a directory
+# next to the metafile, the checkpoint covers only complete lines.
+def streamJournalIncremental(metafile, journal_path, index_path=None, stats=None):
+    directory = metafile + ".checkpoint"
+    try:
+        if not os.path.isdir(directory):
+            os.mkdir(directory)
+        lock = open(os.path.join(directory, "lock"), 'w')
+        # Concurrent runs would change the same spools
+        fcntl.flock(lock, fcntl.LOCK_EX)
+    except (IOError, OSError) as e:
+        sys.stderr.write('Failed to use checkpoint directory %s: %s\n' % (directory, str(e)))
+        fh = open(metafile, 'rb')
+        res = streamJournalXML(readMetafile(fh, stats=stats), journal_path, index_path, stats)
+        fh.close()
+        return res
+
+    fh = open(metafile, 'rb')
+    stream, offset = measured(stats, "checkpoint", loadCheckpoint)(directory, fh, bool(index_path), stats)
+    compact = isCompact(fh)
+    fh.seek(offset)
+    partial = False
+    feed = measured(stats, "build", stream.feedParsed)
+    for parsed, size, complete in readMetafile(fh, compact, stats):
+        feed(*parsed)
+        # Last line is converted, but not checkpointed, so next run starts from scratch
+        if not complete:
+            partial = True
+            break
+        offset += size
+    if not partial:
+        measured(stats, "checkpoint", saveCheckpoint)(directory, stream, fh, offset)
+    fh.close()
+
+    res = measured(stats, "save", saveStream)(stream, journal_path, index_path)
+    lock.close()
+    return res
 
-    # Final appending
-    for _ in el_stack.items:
-        el_stack.peek().append(previous_el)
-        previous_el = el_stack.pop()
-    if el_stack.items:
-        el_stack.peek().append(previous_el)
 
-    # Updating start and end time of last opened paired element(log)
-    starttime, endtime = getStartEndTime(previous_el)
-    addStartEndTime(previous_el, starttime, endtime)
+# Main loop of the program
+# Reads metafile or stdin line by line and adds
+# information from them into XML document,
+# stages of the conversion are measured by stats if they are given
+def createJournalXML(options, stats=None):
+    # If --metafile option is used read from it, else read standard input
+    if options.metafile:
+        try:
+            fh = open(options.metafile, 'rb')
+        except IOError as e:
+            sys.stderr.write('Failed to open queue file with ' + str(e) + '\n')
+            return 1
+    else:
+        fh = getattr(sys.stdin, 'buffer', sys.stdin)
+
+    # Other formats created in the same pass as the journal
+    reports = []
+    if options.xunit:
+        reports.append((XunitStream(), options.xunit))
+    if options.json:
+        reports.append((JSONStream(), options.json))
+
+    # Without XSL transformation the whole document is never needed at once
+    if not options.xslt and options.checkpoint and options.metafile and not reports:
+        fh.close()
+        return streamJournalIncremental(options.metafile, options.journal, options.index, stats)
+
+    if options.xslt:
+        journal = JournalTree(stats=stats)
+    else:
+        journal = JournalStream(index=bool(options.index), stats=stats)
+    feed = measured(stats, "build", journal.feedParsed)
+    feeds = [measured(stats, "build", stream.feedParsed) for stream, _ in reports]
+    create = measured(stats, "create", createElement)
+    for parsed, _, _ in readMetafile(fh, stats=stats):
+        if not reports:
+            feed(*parsed)
+            continue
+        # Element is created once, other streams get its copy
+        new_el = create(*parsed[1:]) if parsed[1] else None
+        feed(*parsed, new_el=new_el)
+        for stream_feed in feeds:
+            stream_feed(*parsed, new_el=copy.copy(new_el) if new_el is not None else None)
+    fh.close()
 
-    # Updating start/end time of the whole test
-    starttime, endtime = getStartEndTime(journal)
-    journal.xpath("starttime")[0].text = starttime
-    journal.xpath("endtime")[0].text = endtime
+    res = 0
+    save = measured(stats, "save", saveStream)
+    for stream, path in reports:
+        res = save(stream, path) or res
+    if not options.xslt:
+        return save(journal, options.journal, options.index) or res
+    journal = journal.getJournal()
 
     # XSL transformation
     try:
-        if options.xslt:
-            xslt = etree.parse(options.xslt)
-            transform = etree.XSLT(xslt)
-            journal = transform(journal)
+        journal = measured(stats, "xslt", transformJournal)(options.xslt, journal)
     except etree.LxmlError as e:
         sys.stderr.write("\nTransformation template file \'" + options.xslt +
-                "\' could not be parsed.\nError: %s\nAborting journal creation.") % (e)
+                "\' could not be parsed.\nError: %s\nAborting journal creation." % (e))
         return 1
 
     if options.journal:
         # Save journal to a file and return its exit code
-        return saveJournal(journal, options.journal)
+        return measured(stats, "save", saveJournal)(journal, options.journal) or res
     else:
         # Write the XML on standard output
-        return sys.stdout.write(etree.tostring(journal, xml_declaration=True, encoding='utf-8', pretty_print=True))
+        getattr(sys.stdout, 'buffer', sys.stdout).write(
+            etree.tostring(journal, xml_declaration=True, encoding='utf-8', pretty_print=True))
+        return res
+
+
+# Creates journal measuring stages of the conversion if the statistics
+# are requested, they are saved once the journal is created
+def measureJournalXML(options):
+    if not options.stats:
+        return createJournalXML(options)
+    stats = Stats()
+    res = createJournalXML(options, stats)
+    stats.save(options.stats, metafile=options.metafile, result=res)
+    return res
+
+
+# Options of the batch conversion in worker processes
+batchOptions = None
+
+
+# Initializes worker process of the batch conversion
+def initBatch(options):
+    global batchOptions
+    batchOptions = options
+    if options.xslt:
+        try:
+            getTransform(options.xslt)
+        except etree.LxmlError:
+            # Reported for each metafile
+            pass
+
+
+# Converts metafile of the batch, returns the metafile and exit code.
+# Journal and reports are created in the directory of the metafile.
+def convertBatch(metafile):
+    options = copy.copy(batchOptions)
+    directory = os.path.dirname(metafile)
+    options.metafile = metafile
+    options.journal = os.path.join(directory, batchOptions.journal or "journal.xml")
+    if batchOptions.stats and batchOptions.stats != '-':
+        options.stats = os.path.join(directory, batchOptions.stats)
+    if batchOptions.xunit:
+        options.xunit = os.path.join(directory, batchOptions.xunit)
+    if batchOptions.json:
+        options.json = os.path.join(directory, batchOptions.json)
+    if batchOptions.index:
+        options.index = os.path.join(directory, batchOptions.index)
+    try:
+        return metafile, measureJournalXML(options)
+    except SystemExit as e:
+        return metafile, e.code if isinstance(e.code, int) else 1
+    except Exception as e:
+        sys.stderr.write('Failed to convert %s: %s\n' % (metafile, str(e)))
+        return metafile, 1
+
+
+# Converts metafiles given by glob patterns, '-' reads their list
+# from standard input, in a pool of processes. Result of each
+# metafile is reported on standard output.
+def batchJournalXML(options, patterns):
+    metafiles = []
+    for pattern in patterns:
+        if pattern == '-':
+            metafiles.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            # Pattern matching nothing is reported as missing metafile
+            metafiles.extend(sorted(glob.glob(pattern)) or [pattern])
+    jobs = options.jobs
+    if not jobs:
+        # Cores available to the process, not all in the system
+        try:
+            jobs = len(os.sched_getaffinity(0))
+        except AttributeError:
+            jobs = multiprocessing.cpu_count()
+    jobs = max(1, min(jobs, len(metafiles)))
+
+    if jobs == 1:
+        initBatch(options)
+        results = six.moves.map(convertBatch, metafiles)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(jobs, initBatch, (options,))
+        results = pool.imap_unordered(convertBatch, metafiles)
+    failed = 0
+    try:
+        for metafile, res in results:
+            if res:
+                failed += 1
+                sys.stdout.write("FAIL %s (exit code %s)\n" % (metafile, res))
+            else:
+                sys.stdout.write("PASS %s\n" % metafile)
+            sys.stdout.flush()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    sys.stdout.write("Converted %d metafiles, %d failed\n" % (len(metafiles) - failed, failed))
+    return 1 if failed else 0
 
 
 def main():
     DESCRIPTION = "Tool creating journal out of metafile."
-    usage = __file__ + " --metafile=METAFILE --journal=JOURNAL"
+    usage = __file__ + " --metafile=METAFILE --journal=JOURNAL [--index=INDEX]\n" + \
+        "       " + __file__ + " --batch [--journal=NAME] METAFILE|PATTERN|- ...\n" + \
+        "       " + __file__ + " --journal=JOURNAL --index=INDEX --phase=NAME"
     optparser = OptionParser(description=DESCRIPTION, usage=usage)
 
     optparser.add_option("-j", "--journal", default=None, dest="journal", metavar="JOURNAL")
     optparser.add_option("-m", "--metafile", default=None, dest="metafile", metavar="METAFILE")
     optparser.add_option("-x", "--xslt", default=None, dest="xslt", metavar="XSLT")
+    optparser.add_option("-u", "--xunit", default=None, dest="xunit", metavar="XUNIT",
+                         help="create also xunit report, the same as by xslt-templates/xunit.xsl")
+    optparser.add_option("--json", default=None, dest="json", metavar="JSON",
+                         help="create also the journal in JSON")
+    optparser.add_option("-i", "--index", default=None, dest="index", metavar="INDEX",
+                         help="create also index of byte ranges of phases in the journal, not used with XSLT")
+    optparser.add_option("-f", "--follow", default=None, dest="follow", metavar="EVENTS",
+                         help="follow METAFILE as it grows and write start and end of phases, tests and metrics"
+                         " as lines of JSON to EVENTS, '-' for standard output, until the metafile is removed")
+    optparser.add_option("-p", "--phase", default=None, dest="phase", metavar="NAME",
+                         help="print phases of the name from JOURNAL, reading only them by offsets in INDEX")
+    optparser.add_option("-c", "--checkpoint", default=False, action="store_true", dest="checkpoint",
+                         help="convert only lines added since the previous run, keeping state in METAFILE.checkpoint,"
+                         " used if only the journal is created")
+    optparser.add_option("-s", "--service", default=None, dest="service", metavar="REPLY",
+                         help="run as journal service reading requests from standard input, replying to FIFO REPLY")
+    optparser.add_option("--stats", default=None, dest="stats", metavar="FILE",
+                         help="append a line of JSON with time of conversion stages, numbers of records and"
+                         " elements and peak RSS to FILE, '-' for standard error output")
+    optparser.add_option("-b", "--batch", default=False, action="store_true", dest="batch",
+                         help="convert metafiles given as arguments, glob patterns or '-' for a list on standard"
+                         " input; journal, xunit and json are file names in the directory of each metafile")
+    optparser.add_option("--jobs", default=0, type="int", dest="jobs", metavar="JOBS",
+                         help="number of processes of the batch conversion, all available cores by default")
 
     (options, args) = optparser.parse_args()
 
+    if options.phase is not None:
+        return lookupPhase(options)
+
     # If metafile option is used, check if the value exists
     if options.metafile and not os.path.exists(options.metafile):
         sys.stderr.write("Metafile " + options.metafile + " does not exist.\nExiting unsuccessfully.\n")
         exit(1)
 
+    if options.service:
+        from journalservice import serveJournal
+        return serveJournal(options)
+
+    if options.follow:
+        if not options.metafile:
+            optparser.error("metafile to follow is needed")
+        from journalfollow import followJournal
+        return followJournal(options)
+
+    if options.batch:
+        return batchJournalXML(options, args)
+
     # Create journal
-    return createJournalXML(options)
+    return measureJournalXML(options)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+# Description: Journal service converting records as they are sent to it
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# Run by journalling.py --service, it is started by journal.sh, which sends
+# the requests through a FIFO, see __INTERNAL_JournalServiceSend.
+
+import base64
+import os
+import sys
+from journalling import JournalStream, Stats, measured, isCompact, readMetafile, saveStream, createJournalXML
+
+
+# Returns records read from file descriptor, each record is a list of fields.
+# Record starts with number of its fields and all fields are terminated by NUL.
+def readRecords(fd):
+    count = None
+    fields = []
+    rest = b''
+    while True:
+        data = os.read(fd, 65536)
+        if not data:
+            return
+        parts = (rest + data).split(b'\0')
+        rest = parts.pop()
+        for part in parts:
+            if count is None:
+                count = int(part)
+            else:
+                fields.append(part)
+            if len(fields) == count:
+                yield fields
+                count = None
+                fields = []
+
+
+# Returns metafile line for record sent as element with indent and timestamp,
+# followed by pairs of option and value as they are passed to rljAdd* functions
+def recordLine(fields):
+    line = fields[0]
+    for option, value in zip(fields[1::2], fields[2::2]):
+        value = base64.b64encode(value)
+        if option == b'--':
+            line += b' -- ' + value
+        else:
+            line += b' ' + option + b'=' + value
+    return line
+
+
+# Returns compact metafile record without the final newline for record sent
+# the same way as to recordLine, with the compact record head
+def recordCompact(fields):
+    head = fields[0]
+    for option, value in zip(fields[1::2], fields[2::2]):
+        head += b' ' + option[2:] + b'=' + str(len(value)).encode('ascii')
+    return head + b'\n' + b''.join(fields[2::2])
+
+
+# Returns requests read from file descriptor as by readRecords. Requests too
+# big to be written to the FIFO at once are passed in a spool file named by
+# the 'spool' request, they are read in its place and the file is removed.
+def readRequests(fd):
+    for fields in readRecords(fd):
+        if fields[0] != b'spool':
+            yield fields
+            continue
+        try:
+            spool = os.open(fields[1], os.O_RDONLY)
+        except OSError as e:
+            sys.stderr.write('Failed to read journal service spool: %s\n' % str(e))
+            continue
+        try:
+            for spooled in readRecords(spool):
+                yield spooled
+        finally:
+            os.close(spool)
+            os.remove(fields[1])
+
+
+# Writes result of a request to the reply FIFO of the journal service
+def replyService(path, res):
+    try:
+        reply = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError:
+        # Nobody is waiting for the reply
+        return
+    os.write(reply, ('%d\n' % res).encode())
+    os.close(reply)
+
+
+# Feeds stream with complete records of metafile following offset and returns
+# offset following them. Besides the records written by the service, these are
+# records appended directly by processes not connected to it, e.g. a nested
+# shell sourcing beakerlib, so the journal has them in order of the metafile.
+def readAppended(stream, metafile, compact, offset, stats=None):
+    metafile.seek(offset)
+    feed = measured(stats, "build", stream.feedParsed)
+    for parsed, size, complete in readMetafile(metafile, compact, stats):
+        if not complete:
+            break
+        feed(*parsed)
+        offset += size
+    return offset
+
+
+# Runs the journal service which saves the python startup on each journal
+# update. Records received on standard input are appended to metafile, so it
+# is complete if the service ends unexpectedly, and converted right away.
+# The journal is saved on request with result written to the reply FIFO.
+def serveJournal(options):
+    # Collected for the whole life of the service
+    stats = Stats() if options.stats else None
+    stream = JournalStream(index=bool(options.index) and not options.xslt, stats=stats)
+    try:
+        metafile = open(options.metafile, 'a+b')
+    except IOError as e:
+        sys.stderr.write('Failed to open metafile %s: %s\n' % (options.metafile, str(e)))
+        return 1
+    # Records written before the service was started
+    compact = isCompact(metafile)
+    offset = readAppended(stream, metafile, compact, 0, stats)
+    if os.fstat(metafile.fileno()).st_size > offset:
+        if compact:
+            # Incomplete record would swallow the following ones
+            metafile.truncate(offset)
+        else:
+            metafile.seek(0, os.SEEK_END)
+            metafile.write(b'\n')
+            metafile.flush()
+            offset = readAppended(stream, metafile, compact, offset, stats)
+    replyService(options.service, 0)
+
+    for fields in readRequests(sys.stdin.fileno()):
+        command = fields[0]
+        if command == b'record' and compact:
+            line = recordCompact(fields[1:])
+        elif command == b'record':
+            line = recordLine(fields[1:])
+        elif command == b'line':
+            line = fields[1]
+        elif command == b'render':
+            offset = readAppended(stream, metafile, compact, offset, stats)
+            if options.xslt:
+                res = createJournalXML(options, stats)
+            else:
+                res = measured(stats, "save", saveStream)(stream, options.journal, options.index)
+            if stats is not None:
+                stats.save(options.stats, metafile=options.metafile, result=res)
+            replyService(options.service, res)
+            continue
+        elif command == b'stop':
+            break
+        else:
+            sys.stderr.write('Unknown journal service request %s\n' % command)
+            continue
+        # Written in one piece, the record is converted once it is read back
+        # together with any records appended by others before it
+        metafile.seek(0, os.SEEK_END)
+        metafile.write(line + b'\n')
+        metafile.flush()
+        offset = readAppended(stream, metafile, compact, offset, stats)
+
+    metafile.close()
+    replyService(options.service, 0)
+    return 0
@@ -0,0 +1,53 @@
+# Description: Times in journals shared by the tools reading them
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# Times in journals are text which does not order across time zones and
+# changes of daylight saving time, the tools compare them as the epoch.
+
+import calendar
+import re
+import time
+
+# Time in the journal, like "2024-07-17 10:20:30 CEST", followed by a time
+# zone name or offset
+TIME = re.compile(r"^(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})(?:\.\d+)?\s*(.*)$")
+OFFSET = re.compile(r"^([+-])(\d{2}):?(\d{2})$")
+
+
+# Returns seconds since the epoch of a time in the journal, None if it is not
+# recognized. Times in a named zone other than UTC are in the local zone of
+# the host which created the journal, the local zone is used for them.
+def getEpoch(text):
+    text = (text or "").strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    match = TIME.match(text)
+    if not match:
+        return None
+    try:
+        parsed = time.strptime("%s %s" % match.group(1, 2), "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+    zone = match.group(3)
+    offset = OFFSET.match(zone)
+    if offset:
+        sign, hours, minutes = offset.groups()
+        return calendar.timegm(parsed) - (1 if sign == "+" else -1) * (int(hours) * 3600 + int(minutes) * 60)
+    if zone in ("UTC", "GMT", "Z"):
+        return calendar.timegm(parsed)
+    return time.mktime(parsed[:8] + (-1,))
@@ -0,0 +1,135 @@
+# Description: Process tree of an executed program shared by the tools
+#              measuring its resources
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# The tools run the program as a child of their own process, become its
+# subreaper and walk the tree of its descendants in /proc.
+
+import os, ctypes, fcntl, select, signal
+
+PAGE_KB = os.sysconf('SC_PAGE_SIZE') // 1024
+PR_SET_CHILD_SUBREAPER = 36
+
+
+# Orphaned processes of the tree are reparented to this process, so they
+# are still measured
+def becomeSubreaper():
+  try:
+    ctypes.CDLL(None).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+  except (OSError, AttributeError):
+    pass
+
+
+# Reaps all finished children, yields their pid, status and resource usage
+def reap():
+  while True:
+    try:
+      pid, status, rusage = os.wait4(-1, os.WNOHANG)
+    except OSError:
+      return
+    if not pid:
+      return
+    yield pid, status, rusage
+
+
+# Sleeps until a timeout or until a child of this process ends, so the end
+# of the program is not rounded up to the sampling interval. SIGCHLD wakes
+# it up through a pipe, so it has to be created before the program starts.
+class ChildWaiter(object):
+  def __init__(self):
+    self.pipe = os.pipe()
+    for fd in self.pipe:
+      fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+      fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(self.pipe[1])
+
+  def wait(self, timeout):
+    try:
+      select.select([self.pipe[0]], [], [], timeout)
+    except (select.error, OSError):
+      # interrupted by the signal on python 2
+      pass
+    try:
+      os.read(self.pipe[0], 4096)
+    except OSError:
+      # no signal came
+      pass
+
+
+# Resident memory of a process tree read from /proc; files of known processes
+# are kept open and reread from the start on each sample
+class Tree(object):
+  def __init__(self, root):
+    self.root = root
+    self.files = {}
+    # kernels without CONFIG_PROC_CHILDREN need a scan of all processes
+    self.scan = not os.path.exists('/proc/self/task/%d/children' % os.getpid())
+
+  def read(self, pid, name):
+    files = self.files.setdefault(pid, {})
+    try:
+      if name not in files:
+        files[name] = os.open('/proc/%d/%s' % (pid, name), os.O_RDONLY)
+      os.lseek(files[name], 0, os.SEEK_SET)
+      return os.read(files[name], 4096)
+    except OSError:
+      # the process is gone or the file is not readable
+      return None
+
+  def forget(self, pid):
+    for fd in self.files.pop(pid, {}).values():
+      os.close(fd)
+
+  # Returns pids of all processes in the tree
+  def pids(self):
+    found = []
+    if self.scan:
+      parents = {}
+      for entry in os.listdir('/proc'):
+        if entry.isdigit():
+          try:
+            stat = open('/proc/%s/stat' % entry).read()
+          except IOError:
+            continue
+          parents.setdefault(int(stat[stat.rfind(')') + 2:].split()[1]), []).append(int(entry))
+      todo = list(parents.get(self.root, []))
+      while todo:
+        pid = todo.pop()
+        found.append(pid)
+        todo.extend(parents.get(pid, []))
+    else:
+      todo = [self.root]
+      while todo:
+        pid = todo.pop()
+        if pid != self.root:
+          found.append(pid)
+        # only the children of the main thread are listed in its file
+        children = self.read(pid, 'task/%d/children' % pid)
+        if children:
+          todo.extend(int(child) for child in children.split())
+    for pid in set(self.files) - set(found) - set([self.root]):
+      self.forget(pid)
+    return found
+
+  # Returns resident memory of all processes in kB
+  def sample(self):
+    total = 0
+    for pid in self.pids():
+      statm = self.read(pid, 'statm')
+      if statm:
+        total += int(statm.split()[1]) * PAGE_KB
+    return total
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+#
+# Description: Processes profile of beakerlib created with BEAKERLIB_PROFILING
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# Each line of the profile is a record 'ts|source(line)|functions|command'
+# written on each command by the DEBUG trap, with time in seconds, the stack
+# of functions from FUNCNAME starting with the innermost one and the command.
+# Time from a record to the next one is spent by the command of the record:
+# it is exclusive time of the innermost function and of the source line and
+# inclusive time of all functions on the stack. A function is hit when its
+# first command is its own call.
+#
+# Profiles in the compact format have no commands, a function is hit when
+# it is added to the stack. Profiles recording only every Nth command or only
+# calls of functions start with a line '#beakerlib-profile FORMAT SAMPLE',
+# time from a record to the next one is still accounted to the record. When
+# only calls are recorded, returns from functions are recorded as well with
+# the stack of the caller and command 'return', any other record is a hit.
+#
+# The profile is read in one pass. The function CSV is the same one as
+# created by profiling.sh in bash, line hotspots and collapsed stacks for
+# flamegraph.pl are created optionally.
+
+from __future__ import print_function
+import re
+import sys
+from optparse import OptionParser
+
+PROFILE = "/dev/shm/beakerlib_profile"
+PROFILE_MAGIC = "#beakerlib-profile "
+
+# Name of a function counted in the profile
+functionName = re.compile(r'[a-zA-Z0-9_]+$')
+notDigit = re.compile(r'[^0-9]')
+
+
+# Returns time in microseconds as seconds the same way as bc with scale 6
+def formatTime(microseconds):
+    if microseconds == 0:
+        return "0"
+    sign = "-" if microseconds < 0 else ""
+    seconds, fraction = divmod(abs(microseconds), 1000000)
+    return "%s%s.%06d" % (sign, seconds or "0", fraction)
+
+
+# Opens the profile as text, commands with invalid characters are kept
+def openProfile(path):
+    if path == "-":
+        return sys.stdin
+    if sys.version_info[0] < 3:
+        return open(path)
+    return open(path, errors="replace")
+
+
+# Returns records of the profile as time in microseconds, source line,
+# stack of functions as written in the profile and command, which is None
+# in the compact format. Calls in the compact format recording only calls
+# have the called function as the command. Last two records are written by
+# the end of the test itself and they are skipped.
+def readProfile(profile):
+    pending = []
+    compact = calls = False
+    for line in profile:
+        if line.startswith(PROFILE_MAGIC):
+            header = line.split()
+            compact = header[1] == "compact"
+            calls = header[2] == "calls"
+            continue
+        pending.append(line)
+        if len(pending) < 3:
+            continue
+        fields = pending.pop(0).rstrip("\n").split("|", 3)
+        fields += [""] * (4 - len(fields))
+        ts, source, functions, command = fields
+        if compact and command != "return":
+            command = functions if calls else None
+        yield int(notDigit.sub("", ts) or 0), source, functions, command
+
+
+class Profile:
+    def __init__(self):
+        self.hits = {"main": 1}
+        # Exclusive and inclusive time of functions
+        self.spent = {}
+        self.cumulative = {}
+        # Hits and exclusive time of source lines
+        self.line_hits = {}
+        self.line_spent = {}
+        # Exclusive time of stacks of functions as written in the profile
+        self.stacks = {}
+        # Stacks split to functions, the same ones repeat a lot
+        self.split = {}
+
+    def read(self, records):
+        previous = None
+        depth = 0
+        for ts, source, stack, command in records:
+            functions = self.split.get(stack)
+            if functions is None:
+                functions = self.split[stack] = stack.split()
+            if not functions or not functionName.match(functions[0]):
+                continue
+            function = functions[0]
+            if command.startswith(function) if command is not None else previous and len(functions) > depth:
+                self.hits[function] = self.hits.get(function, 0) + 1
+            depth = len(functions)
+            self.line_hits[source] = self.line_hits.get(source, 0) + 1
+            if previous is not None:
+                prev_ts, prev_source, prev_stack = previous
+                delta = ts - prev_ts
+                # Recursive function is accounted for each of its calls on the stack
+                prev_functions = self.split[prev_stack]
+                for name in prev_functions:
+                    self.cumulative[name] = self.cumulative.get(name, 0) + delta
+                self.spent[prev_functions[0]] = self.spent.get(prev_functions[0], 0) + delta
+                self.line_spent[prev_source] = self.line_spent.get(prev_source, 0) + delta
+                self.stacks[prev_stack] = self.stacks.get(prev_stack, 0) + delta
+            previous = ts, source, stack
+
+    # Writes CSV of functions ordered by their inclusive time
+    def writeFunctions(self, output):
+        output.write("function,hits,spent,total spent,total cummulative spent\n")
+        for name in sorted(self.hits, key=lambda name: (-self.cumulative.get(name, 0), name)):
+            spent = self.spent.get(name, 0)
+            output.write("%s,%d,%s,%s,%s\n" % (name, self.hits[name], formatTime(spent // self.hits[name]),
+                                               formatTime(spent), formatTime(self.cumulative.get(name, 0))))
+
+    # Writes CSV of source lines ordered by time spent on them
+    def writeLines(self, output):
+        output.write("line,hits,spent,total spent\n")
+        for source in sorted(self.line_hits, key=lambda source: (-self.line_spent.get(source, 0), source)):
+            spent = self.line_spent.get(source, 0)
+            hits = self.line_hits[source]
+            output.write("%s,%d,%s,%s\n" % (source, hits, formatTime(spent // hits), formatTime(spent)))
+
+    # Writes collapsed stacks starting with the outermost function with time
+    # in microseconds, input of flamegraph.pl
+    def writeStacks(self, output):
+        stacks = {}
+        for stack, spent in self.stacks.items():
+            stack = ";".join(reversed(self.split[stack]))
+            stacks[stack] = stacks.get(stack, 0) + spent
+        for stack in sorted(stacks):
+            if stacks[stack] > 0:
+                output.write("%s %d\n" % (stack, stacks[stack]))
+
+
+def main():
+    optparser = OptionParser(usage="%prog [--lines FILE] [--stacks FILE] [PROFILE]",
+                             description="Prints CSV of functions in beakerlib profile, %s by default." % PROFILE)
+    optparser.add_option("-l", "--lines", default=None, dest="lines", metavar="FILE",
+                         help="write CSV of time spent on source lines to FILE")
+    optparser.add_option("-s", "--stacks", default=None, dest="stacks", metavar="FILE",
+                         help="write collapsed stacks for flamegraph.pl to FILE")
+    (options, args) = optparser.parse_args()
+    if len(args) > 1:
+        optparser.error("only one profile can be processed")
+
+    profile = Profile()
+    path = args[0] if args else PROFILE
+    try:
+        profile.read(readProfile(openProfile(path)))
+        profile.writeFunctions(sys.stdout)
+        if options.lines:
+            output = open(options.lines, "w")
+            profile.writeLines(output)
+            output.close()
+        if options.stacks:
+            output = open(options.stacks, "w")
+            profile.writeStacks(output)
+            output.close()
+    except IOError as e:
+        sys.stderr.write("Failed to process profile %s: %s\n" % (path, str(e)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
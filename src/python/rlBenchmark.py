@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+# Description: Measures run time of a command repeatedly until it is precise
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# Each run of the command is timed by the monotonic clock. Runs are warmup
+# until the median of the last window of runs is not lower than the median
+# of the window before by more than the target error, so caches are filled
+# and the frequency of CPU settles. Then the command runs until the
+# distribution-free confidence interval of the median is narrower than the
+# target relative error, or until the limit of runs or time is reached.
+#
+# The summary is printed as "name value" lines: median, p95 and the
+# confidence interval of the median in seconds, mean and standard deviation
+# without outliers beyond 3 interquartile ranges, number of measured and
+# warmup runs, outliers and the relative error reached.
+
+from __future__ import division, print_function
+import sys, os, math, time, subprocess
+from optparse import OptionParser
+
+try:
+  clock = time.monotonic
+except AttributeError:
+  clock = time.time
+
+# Runs compared by the warmup detection
+WINDOW = 5
+
+
+# Returns the percentile of sorted values with linear interpolation
+def percentile(values, fraction):
+  position = (len(values) - 1) * fraction
+  lower = int(math.floor(position))
+  upper = min(lower + 1, len(values) - 1)
+  return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+# Returns z so that the standard normal distribution has the probability
+# in (-z, z), found by bisection of erf
+def quantile(confidence):
+  low, high = 0.0, 10.0
+  for i in range(60):
+    middle = (low + high) / 2
+    if math.erf(middle / math.sqrt(2)) < confidence:
+      low = middle
+    else:
+      high = middle
+  return (low + high) / 2
+
+
+# Returns confidence interval of the median of sorted values by ranks of
+# the binomial distribution, normally approximated
+def medianInterval(values, z):
+  n = len(values)
+  spread = z * math.sqrt(n) / 2
+  lower = max(int(math.floor(n / 2 - spread)), 0)
+  upper = min(int(math.ceil(n / 2 + spread)), n - 1)
+  return values[lower], values[upper]
+
+
+def median(values):
+  return percentile(sorted(values), 0.5)
+
+
+class Benchmark(object):
+  def __init__(self, command, options):
+    self.command = command
+    self.options = options
+    self.z = quantile(options.confidence)
+    self.warmup = []
+    self.times = []
+    self.start = clock()
+
+  def pin(self):
+    os.sched_setaffinity(0, self.options.cpus)
+
+  # Returns run time of the command, raises CalledProcessError if it fails
+  def run(self):
+    start = clock()
+    task = subprocess.Popen(self.command, preexec_fn=self.pin if self.options.cpus else None)
+    task.wait()
+    elapsed = clock() - start
+    if task.returncode:
+      raise subprocess.CalledProcessError(task.returncode, self.command[0])
+    return elapsed
+
+  def timeout(self):
+    return self.options.max_time and clock() - self.start >= self.options.max_time
+
+  # Runs the command until it is warm, or given number of times
+  def warm(self):
+    if self.options.warmup != 'auto':
+      for i in range(int(self.options.warmup)):
+        self.warmup.append(self.run())
+      return
+    # warmup does not take more runs than the measurement may
+    limit = min(max(self.options.max_runs // 10, 2 * WINDOW), self.options.max_runs)
+    while len(self.warmup) < limit and not self.timeout():
+      self.warmup.append(self.run())
+      if len(self.warmup) >= 2 * WINDOW:
+        previous = median(self.warmup[-2 * WINDOW:-WINDOW])
+        if median(self.warmup[-WINDOW:]) >= previous * (1 - self.options.error):
+          # the last window is already measured, up to the limit of runs
+          kept = min(WINDOW, self.options.max_runs)
+          self.times = self.warmup[-kept:]
+          del self.warmup[-kept:]
+          return
+
+  # Returns relative half-width of the confidence interval of the median
+  def error(self):
+    values = sorted(self.times)
+    lower, upper = medianInterval(values, self.z)
+    middle = percentile(values, 0.5)
+    return (upper - lower) / 2 / middle if middle else 0.0
+
+  def measure(self):
+    while len(self.times) < self.options.max_runs:
+      if len(self.times) >= self.options.min_runs and (self.error() <= self.options.error or self.timeout()):
+        break
+      self.times.append(self.run())
+
+  def summary(self):
+    values = sorted(self.times)
+    lower, upper = medianInterval(values, self.z)
+    q1, q3 = percentile(values, 0.25), percentile(values, 0.75)
+    fence = 3 * (q3 - q1)
+    kept = [value for value in values if q1 - fence <= value <= q3 + fence]
+    mean = sum(kept) / len(kept)
+    stddev = math.sqrt(sum((value - mean) ** 2 for value in kept) / (len(kept) - 1)) if len(kept) > 1 else 0.0
+    return (('median', '%.6f' % percentile(values, 0.5)), ('p95', '%.6f' % percentile(values, 0.95)),
+            ('ci_low', '%.6f' % lower), ('ci_high', '%.6f' % upper),
+            ('mean', '%.6f' % mean), ('stddev', '%.6f' % stddev),
+            ('runs', len(values)), ('warmup_runs', len(self.warmup)),
+            ('outliers', len(values) - len(kept)), ('rel_error', '%.4f' % self.error()))
+
+
+# Returns CPUs given as a list like 0,2-3
+def parseCpus(cpus):
+  result = set()
+  for part in cpus.split(','):
+    first, _, last = part.partition('-')
+    result.update(range(int(first), int(last or first) + 1))
+  return result
+
+
+def main():
+  optparser = OptionParser(usage='%prog [options] <command>')
+  optparser.disable_interspersed_args()
+  optparser.add_option('-e', '--error', type='float', default=0.02,
+                       help='target relative error of the median, 0.02 by default')
+  optparser.add_option('-c', '--confidence', type='float', default=0.95,
+                       help='confidence level of the interval, 0.95 by default')
+  optparser.add_option('-w', '--warmup', default='auto', metavar='N|auto',
+                       help='number of warmup runs, detected by default')
+  optparser.add_option('--min-runs', type='int', default=5, dest='min_runs',
+                       help='minimal number of measured runs, 5 by default')
+  optparser.add_option('--max-runs', type='int', default=1000, dest='max_runs',
+                       help='maximal number of measured runs, 1000 by default')
+  optparser.add_option('-t', '--max-time', type='float', default=60, dest='max_time',
+                       help='stop once the precision is not reached in the time in seconds, 60 by default')
+  optparser.add_option('--cpu', default=None, dest='cpus', metavar='LIST',
+                       help='pin the command to the CPUs like 0,2-3')
+  optparser.add_option('-o', '--output', default=None,
+                       help='store run times of the measured runs to the file')
+  optparser.add_option('-s', '--summary', default=None,
+                       help='write the summary to the file instead of standard output')
+  (options, proglist) = optparser.parse_args()
+  if not proglist:
+    optparser.error('command is needed')
+  if options.warmup != 'auto' and not options.warmup.isdigit():
+    optparser.error('warmup has to be a number or auto')
+  if not 0 < options.confidence < 1:
+    optparser.error('confidence has to be between 0 and 1')
+  options.min_runs = max(options.min_runs, 2)
+  options.max_runs = max(options.max_runs, options.min_runs)
+  if options.cpus:
+    if not hasattr(os, 'sched_setaffinity'):
+      optparser.error('pinning to CPUs is not supported by this python')
+    try:
+      options.cpus = parseCpus(options.cpus)
+    except ValueError:
+      optparser.error('invalid list of CPUs %s' % options.cpus)
+
+  benchmark = Benchmark(proglist, options)
+  try:
+    benchmark.warm()
+    benchmark.measure()
+  except OSError as e:
+    sys.stderr.write('rlBenchmark: cannot run %s: %s\n' % (proglist[0], str(e)))
+    return 127
+  except subprocess.CalledProcessError as e:
+    sys.stderr.write('rlBenchmark: %s failed with exit code %d\n' % (proglist[0], e.returncode))
+    return e.returncode if e.returncode > 0 else 128 - e.returncode
+
+  if options.output:
+    open(options.output, 'w').write(''.join('%.6f\n' % value for value in benchmark.times))
+  lines = ''.join('%s %s\n' % item for item in benchmark.summary())
+  if options.summary:
+    open(options.summary, 'w').write(lines)
+  else:
+    sys.stdout.write(lines)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -18,46 +18,55 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
 
+# The average is the resident memory of the whole process tree of the program
+# in kB sampled in given interval, each sample is weighted by the time until
+# the next one.
+
 from __future__ import print_function
-import sys, time, re
+import sys, os, time, subprocess
+from optparse import OptionParser
 
-use_sub   = False
-use_popen = False
+# modules shared by the tools are installed to the data directory of
+# beakerlib, in the source tree they are next to the tools
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'share', 'beakerlib', 'python'))
+import processtree
 
 try:
-  import subprocess
-  use_sub = True
-except ImportError:
-  import popen2
-  use_popen = True
+  clock = time.monotonic
+except AttributeError:
+  clock = time.time
 
-if len(sys.argv) < 2:
-  print('syntax: rlMemAvg <command>')
-  sys.exit(1)
 
-proglist = sys.argv[1:]
+def main():
+  optparser = OptionParser(usage='%prog [-i INTERVAL] <command>')
+  optparser.disable_interspersed_args()
+  optparser.add_option('-i', '--interval', type='float', default=0.1,
+                       help='sampling interval in seconds, 0.1 by default')
+  (options, proglist) = optparser.parse_args()
+  if not proglist:
+    print('syntax: rlMemAvg [-i INTERVAL] <command>')
+    sys.exit(1)
 
-if use_sub:
+  processtree.becomeSubreaper()
+  waiter = processtree.ChildWaiter()
   task = subprocess.Popen(proglist)
-elif use_popen:
-  task = popen2.Popen3(" ".join(proglist))
-
-memsum = 0
-tick = 0
-fn = '/proc/%d/status' % task.pid
-mre = re.compile(r'VmRSS:[ \t]+(?P<mem>\d+)')
-
-while True:
-  for line in open(fn, 'r').readlines():
-    m = mre.search(line)
-    if m:
-      mem = int(m.group('mem'))
-      memsum += mem
-      tick += 1
-      break
-  time.sleep(0.1)
-  finish = task.poll()
-  if (use_sub and finish != None) or (use_popen and finish != -1):
-    break
-
-print("%d" % (memsum/tick))
+  sample = processtree.Tree(os.getpid()).sample
+  memsum = 0
+  start = last = clock()
+  mem = sample()
+  while task.returncode is None:
+    waiter.wait(options.interval)
+    now = clock()
+    memsum += mem * (now - last)
+    last = now
+    for pid, status, rusage in processtree.reap():
+      if pid == task.pid:
+        task.returncode = status
+    if task.returncode is None:
+      mem = sample()
+
+  print("%d" % (memsum / (last - start) if last > start else mem))
+
+
+if __name__ == '__main__':
+  main()
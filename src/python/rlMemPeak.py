@@ -18,44 +18,55 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
 
-from __future__ import print_function
-import sys, time, re
+# The peak is the resident memory of the whole process tree of the program in
+# kB. The tree is sampled in given interval and the sampled peak is corrected
+# by the exact peaks of single processes reported by wait4(), so a short peak
+# of a process is not lost between samples. The exact peak of the program is
+# used only if it exceeds the peak of this helper, which it inherits by fork.
 
-use_sub   = False
-use_popen = False
+from __future__ import print_function
+import sys, os, time, resource, subprocess
+from optparse import OptionParser
 
-try:
-  import subprocess
-  use_sub = True
-except ImportError:
-  import popen2
-  use_popen = True
+# modules shared by the tools are installed to the data directory of
+# beakerlib, in the source tree they are next to the tools
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'share', 'beakerlib', 'python'))
+import processtree
 
-if len(sys.argv) < 2:
-  print('syntax: rlMemPeak <command>')
-  sys.exit(1)
 
-proglist = sys.argv[1:]
+def main():
+  optparser = OptionParser(usage='%prog [-i INTERVAL] <command>')
+  optparser.disable_interspersed_args()
+  optparser.add_option('-i', '--interval', type='float', default=0.1,
+                       help='sampling interval in seconds, 0.1 by default')
+  (options, proglist) = optparser.parse_args()
+  if not proglist:
+    print('syntax: rlMemPeak [-i INTERVAL] <command>')
+    sys.exit(1)
 
-if use_sub:
+  processtree.becomeSubreaper()
+  waiter = processtree.ChildWaiter()
   task = subprocess.Popen(proglist)
-elif use_popen:
-  task = popen2.Popen3(" ".join(proglist))
-
-maxmem = 0
-fn = '/proc/%d/status' % task.pid
-mre = re.compile(r'VmRSS:[ \t]+(?P<mem>\d+)')
-
-while True:
-  for line in open(fn, 'r').readlines():
-    m = mre.search(line)
-    if m:
-      mem = int(m.group('mem'))
-      maxmem = max(mem, maxmem)
-      break
-  time.sleep(0.1)
-  finish = task.poll()
-  if (use_sub and finish != None) or (use_popen and finish != -1):
-    break
-
-print("%d" % (maxmem))
+  # the program is forked from this helper, so its peak is at least the
+  # peak of the helper even if the program itself is smaller
+  helper = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  tree = processtree.Tree(os.getpid())
+  maxmem = 0
+  while task.returncode is None:
+    maxmem = max(maxmem, tree.sample())
+    waiter.wait(options.interval)
+    # exact peak of the largest single process in the tree, a process
+    # includes its waited-for descendants
+    for pid, status, rusage in processtree.reap():
+      if pid == task.pid:
+        task.returncode = status
+        # the peak not above the helper is the helper before exec
+        if rusage.ru_maxrss <= helper:
+          continue
+      maxmem = max(maxmem, rusage.ru_maxrss)
+
+  print("%d" % (maxmem))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+# Description: Records resource consumption of an executed program over time
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# The whole process tree of the program is sampled in given interval. Each
+# sample holds the time since start, number of processes, CPU time in ms,
+# resident memory in kB, bytes read from and written to storage and number
+# of context switches; all but the processes and memory are cumulative.
+# Counters of processes which ended are kept and the final sample holds the
+# exact totals from wait4() of the reaped processes.
+#
+# Samples are stored in a binary file starting with the line
+#   #beakerlib-resources FORMAT NAME,NAME,...
+# followed by records packed by the struct FORMAT. When the program ends
+# a summary is printed as "name value" lines.
+
+from __future__ import print_function
+import sys, os, time, resource, struct, subprocess
+from optparse import OptionParser
+
+# modules shared by the tools are installed to the data directory of
+# beakerlib, in the source tree they are next to the tools
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'share', 'beakerlib', 'python'))
+import processtree
+
+try:
+  clock = time.monotonic
+except AttributeError:
+  clock = time.time
+
+MAGIC = b'#beakerlib-resources'
+FORMAT = '<dIQQQQQ'
+FIELDS = ('time', 'processes', 'cpu', 'rss', 'read', 'write', 'switches')
+CLK_MS = 1000.0 / os.sysconf('SC_CLK_TCK')
+
+
+# Resources of a process tree read from /proc
+class Tree(processtree.Tree):
+  def __init__(self, root):
+    processtree.Tree.__init__(self, root)
+    # cumulative counters of live processes and of those which ended
+    self.counters = {}
+    self.ended = [0, 0, 0, 0]
+
+  def forget(self, pid):
+    processtree.Tree.forget(self, pid)
+    counters = self.counters.pop(pid, None)
+    if counters:
+      self.ended = [a + b for a, b in zip(self.ended, counters)]
+
+  # Returns processes, CPU time, resident memory, bytes read and written
+  # and context switches of the tree
+  def sample(self):
+    pids = self.pids()
+    rss = 0
+    for pid in pids:
+      stat = self.read(pid, 'stat')
+      if not stat:
+        continue
+      fields = stat[stat.rfind(b')') + 2:].split()
+      rss += int(fields[21]) * processtree.PAGE_KB
+      counters = self.counters.get(pid, [0, 0, 0, 0])
+      counters[0] = int((int(fields[11]) + int(fields[12])) * CLK_MS)
+      io = self.read(pid, 'io')
+      if io:
+        io = io.split()
+        counters[1] = int(io[io.index(b'read_bytes:') + 1])
+        counters[2] = int(io[io.index(b'write_bytes:') + 1])
+      status = self.read(pid, 'status')
+      if status:
+        status = status[status.find(b'voluntary_ctxt_switches'):].split()
+        counters[3] = int(status[1]) + int(status[3])
+      self.counters[pid] = counters
+    total = list(self.ended)
+    for counters in self.counters.values():
+      total = [a + b for a, b in zip(total, counters)]
+    return [len(pids), total[0], rss, total[1], total[2], total[3]]
+
+
+# Prints samples stored in a file as tab separated values
+def dump(path):
+  data = open(path, 'rb')
+  head = data.readline().split()
+  if head[0] != MAGIC:
+    sys.stderr.write('rlResMonitor: %s is not a resource file\n' % path)
+    return 1
+  record = struct.Struct(head[1].decode())
+  print('\t'.join(head[2].decode().split(',')))
+  while True:
+    chunk = data.read(record.size)
+    if len(chunk) < record.size:
+      break
+    print('\t'.join(str(value) for value in record.unpack(chunk)))
+  return 0
+
+
+def main():
+  optparser = OptionParser(usage='%prog [-i INTERVAL] [-o FILE] [-s FILE] <command>\n       %prog --dump FILE')
+  optparser.disable_interspersed_args()
+  optparser.add_option('-i', '--interval', type='float', default=0.1,
+                       help='sampling interval in seconds, 0.1 by default')
+  optparser.add_option('-o', '--output', default=None,
+                       help='store the samples to the file')
+  optparser.add_option('-s', '--summary', default=None,
+                       help='write the summary to the file instead of standard output')
+  optparser.add_option('--dump', default=None, metavar='FILE',
+                       help='print samples stored in the file')
+  (options, proglist) = optparser.parse_args()
+  if options.dump:
+    return dump(options.dump)
+  if not proglist:
+    optparser.error('command is needed')
+
+  record = struct.Struct(FORMAT)
+  output = None
+  if options.output:
+    output = open(options.output, 'wb')
+    output.write(b' '.join((MAGIC, FORMAT.encode(), ','.join(FIELDS).encode())) + b'\n')
+
+  processtree.becomeSubreaper()
+  waiter = processtree.ChildWaiter()
+  try:
+    task = subprocess.Popen(proglist)
+  except OSError as e:
+    sys.stderr.write('rlResMonitor: cannot run %s: %s\n' % (proglist[0], str(e)))
+    return 127
+  # the program is forked from this helper, so its peak is at least the
+  # peak of the helper even if the program itself is smaller
+  helper = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  tree = Tree(os.getpid())
+  start = last = clock()
+  rusage_total = [0, 0, 0, 0]
+  peak = 0
+  rsssum = 0
+  sample = tree.sample()
+  while task.returncode is None:
+    if output:
+      output.write(record.pack(last - start, *sample))
+    peak = max(peak, sample[2])
+    waiter.wait(options.interval)
+    now = clock()
+    rsssum += sample[2] * (now - last)
+    last = now
+    # resource usage of a reaped process includes its waited-for descendants
+    for pid, status, rusage in processtree.reap():
+      rusage_total = [a + b for a, b in zip(rusage_total, (
+        int((rusage.ru_utime + rusage.ru_stime) * 1000), rusage.ru_inblock * 512,
+        rusage.ru_oublock * 512, rusage.ru_nvcsw + rusage.ru_nivcsw))]
+      # the peak not above the helper is the helper before exec
+      if pid != task.pid or rusage.ru_maxrss > helper:
+        peak = max(peak, rusage.ru_maxrss)
+      if pid == task.pid:
+        task.returncode = status
+    if task.returncode is None:
+      sample = tree.sample()
+
+  # totals of reaped processes are exact, sampled ones cover processes left running
+  total = [max(a, b) for a, b in zip(rusage_total, sample[1:2] + sample[3:])]
+  if output:
+    output.write(record.pack(last - start, 0, total[0], 0, total[1], total[2], total[3]))
+    output.close()
+
+  wall = last - start
+  summary = (('wall_time', '%.3f' % wall), ('cpu_time', '%.3f' % (total[0] / 1000.0)),
+             ('rss_peak', peak), ('rss_avg', int(rsssum / wall) if wall else sample[2]),
+             ('read_bytes', total[1]), ('write_bytes', total[2]), ('ctx_switches', total[3]))
+  lines = ''.join('%s %s\n' % item for item in summary)
+  if options.summary:
+    open(options.summary, 'w').write(lines)
+  else:
+    sys.stdout.write(lines)
+
+  if os.WIFSIGNALED(task.returncode):
+    return 128 + os.WTERMSIG(task.returncode)
+  return os.WEXITSTATUS(task.returncode)
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -28,11 +28,11 @@
 #   and export its path via an env variable
 # - hook LWD when run from Beaker
 #   - this hook will send SIGHUP to the watcher on LWD expire and block
-#     until the watcher process exits
+#     on a lock held by the watcher until the watcher process exits
 # - set up SIGHUP handling, which
 #   - sends SIGKILL to test if running
-#   - sets up SIGALRM handler for EWD and schedules alarm(2)
-#     - EWD handler SIGKILLs cleanup (if running)
+#   - sets up EWD deadline
+#     - when the deadline passes, cleanup is SIGKILLed (if running)
 # - run test
 #   - if it finishes in time, do nothing (unset pid)
 #   - if INT is received while it is running, SIGKILL the test, unset pid
@@ -41,10 +41,17 @@
 #   - if INT is received while it is running, SIGKILL cleanup, unset pid
 # - exit cleanly
 #
+# The watcher waits in an event loop (see watch()) on select() of a pidfd of
+# the process and a pipe which signal handlers wake it up through, with the
+# EWD deadline as a timeout. Signal handlers only queue the signal, actions
+# are executed by the loop. Without pidfd (older kernel or python) SIGCHLD
+# wakes the loop up. Resource usage of the test and cleanup is reported from
+# wait4().
+#
 # Some considerations taken into account / tested:
 #
 # - SIGHUP is received while running cleanup (TestTime expired after test exit)
-#   - testpid is already 0, only SIGALRM (cleanup kill) is scheduled, giving
+#   - testpid is already 0, only EWD deadline (cleanup kill) is set, giving
 #     the cleanup another ewd_maxsecs seconds to finish
 # - SIGTERM is received at any time
 #   - the only reasonable case is system reboot/poweroff, which we cannot
@@ -61,6 +68,7 @@ import signal
 import time
 import errno
 import fcntl
+import select
 import tempfile
 
 
@@ -83,6 +91,10 @@ lwd_guard_file = '/usr/share/rhts/hooks/watchdog/testwatcher-cleanup-guard'
 # to write path to cleanup executable into it, it's checked just before
 # cleanup execution
 clfd, clpath = tempfile.mkstemp(prefix='testwatcher-', dir='/var/tmp') # no-reboot
+# the file is locked as long as the watcher runs, the LWD guard waits for
+# the lock; the test must not inherit the descriptor, as it would hold the lock
+fcntl.fcntl(clfd, fcntl.F_SETFD, fcntl.fcntl(clfd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+fcntl.flock(clfd, fcntl.LOCK_EX)
 # env var containing the path, so the test can write to it
 os.environ['TESTWATCHER_CLPATH'] = clpath
 #
@@ -95,6 +107,18 @@ selfname = os.path.basename(__file__)
 testpid = 0
 cleanuppid = 0
 
+# monotonic time of EWD expiration, once LWD expired
+ewd_deadline = None
+
+# signals received, but not handled yet, and their handlers
+pending_signals = []
+signal_handlers = {}
+
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    monotonic = time.time
+
 if os.environ.get('TASKID'):
     beah = True
 else:
@@ -125,6 +149,15 @@ def sigpgkill_safe(pid):
     os.killpg(pid, signal.SIGKILL)
 
 
+def rusage_report(name, status, rusage):
+    if os.WIFSIGNALED(status):
+        result = 'was killed by signal '+str(os.WTERMSIG(status))
+    else:
+        result = 'exited with code '+str(os.WEXITSTATUS(status))
+    debug('%s %s, user %.3fs, system %.3fs, max RSS %d kB'
+          % (name, result, rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss))
+
+
 def beah_warn(part):
     # python "subprocess" not on RHEL4
     os.system('rhts-report-result "TESTWATCHER ('+part+')" WARN /dev/null')
@@ -139,12 +172,19 @@ watchdog_guard_cont = r"""
 #!/bin/sh
 rm -f "$0"
 wrap_pid='"""+str(os.getpid())+r"""'
-wrap_name="$(ps c --no-headers -o comm --pid $wrap_pid)"
+read wrap_name 2>/dev/null </proc/$wrap_pid/comm
 [ $? -ne 0 ] && { echo "wrapper pid is not running"; exit 0; }
 [ "$wrap_name" != '"""+selfname[:15]+r"""' ] && \
     { echo "wrapper pid not a testwatch process: $wrap_name"; exit 0; }
+# the wrapper holds the lock until it exits
+[ -e '"""+clpath+r"""' ] || { echo "wrapper is finishing"; exit 0; }
+exec 9<'"""+clpath+r"""'
 kill -HUP "$wrap_pid"
-while ps --no-headers -o pid --pid $wrap_pid >/dev/null; do sleep 1; done;
+if command -v flock >/dev/null; then
+    flock 9
+else
+    while [ -e /proc/$wrap_pid ]; do sleep 1; done;
+fi
 """
 
 
@@ -164,7 +204,7 @@ def beah_lwd_hook():
 
 
 # called when EWD (external watchdog) is about to expire
-def beah_ewd_action(signum, frame):
+def beah_ewd_action():
     debug('beah EWD is about to strike')
     global cleanuppid
     if cleanuppid != 0:
@@ -176,19 +216,111 @@ def beah_ewd_action(signum, frame):
 # called when LWD expires
 def beah_lwd_action(signum, frame):
     debug('beah LWD expired')
-    global testpid
-    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    global testpid, ewd_deadline
+    set_handler(signal.SIGHUP, None)
     if testpid != 0:
         sigpgkill_safe(testpid)
-        testpid = 0
-    signal.signal(signal.SIGALRM, beah_ewd_action)
-    signal.alarm(ewd_maxsecs)
+    ewd_deadline = monotonic() + ewd_maxsecs
     if beah:
         beah_warn('local watchdog')
 #
 ###
 
 
+### EVENT LOOP
+#
+# python writes a byte to the pipe when a signal arrives, so select() in
+# watch() returns even if the signal came right before it was called
+wakeup_r, wakeup_w = os.pipe()
+for fd in (wakeup_r, wakeup_w):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+    fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+signal.set_wakeup_fd(wakeup_w)
+
+
+def queue_signal(signum, frame):
+    pending_signals.append(signum)
+
+
+# handler is called by watch() with the signal number and None as a frame,
+# like a signal handler; no handler means the signal is ignored
+def set_handler(signum, handler):
+    if handler:
+        signal_handlers[signum] = handler
+        signal.signal(signum, queue_signal)
+    else:
+        signal_handlers.pop(signum, None)
+        signal.signal(signum, signal.SIG_IGN)
+
+
+# returns pidfd of the process, which is readable once the process exits,
+# or None if pidfd is not supported
+def open_pidfd(pid):
+    if hasattr(os, 'pidfd_open'):
+        try:
+            return os.pidfd_open(pid)
+        except OSError:
+            pass
+    return None
+
+
+def handle_signals():
+    while pending_signals:
+        signum = pending_signals.pop(0)
+        if signum in signal_handlers:
+            signal_handlers[signum](signum, None)
+
+
+# waits until one of fds is readable, a signal arrives or timeout expires
+def wait_event(fds, timeout):
+    try:
+        select.select([wakeup_r] + fds, [], [], timeout)
+    except (select.error, OSError) as e:
+        # no traceback if interrupted by a signal
+        if e.args[0] != errno.EINTR:
+            raise
+    try:
+        while os.read(wakeup_r, 64):
+            pass
+    except OSError as e:
+        if e.errno != errno.EAGAIN:
+            raise
+
+
+# waits until the process exits, handling signals and EWD deadline in the
+# meantime, returns its exit status and resource usage
+def watch(pid):
+    global ewd_deadline
+    pidfd = open_pidfd(pid)
+    fds = [] if pidfd is None else [pidfd]
+    try:
+        while True:
+            handle_signals()
+            if ewd_deadline is not None and monotonic() >= ewd_deadline:
+                ewd_deadline = None
+                beah_ewd_action()
+            try:
+                reaped, status, rusage = os.wait4(pid, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                # safety measure, shouldn't happen
+                if e.errno == errno.ECHILD:
+                    return None, None
+                raise
+            if reaped:
+                return status, rusage
+            timeout = None
+            if ewd_deadline is not None:
+                timeout = max(0, ewd_deadline - monotonic())
+            wait_event(fds, timeout)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+#
+###
+
+
 ### CLEANUP WATCHER
 #
 # executed by INT sent to the test watcher process
@@ -196,7 +328,7 @@ def cleanup_interrupt(signum, frame):
     debug('cleanup interrupted')
     global cleanuppid
 
-    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_handler(signal.SIGINT, None)
 
     if cleanuppid != 0:
         sigpgkill_safe(cleanuppid)
@@ -212,6 +344,8 @@ def exec_cleanup():
     os.lseek(clfd, 0, 0)
 
     filename = os.read(clfd, 1024).strip()
+    if not isinstance(filename, str):
+        filename = filename.decode()
 
     # no cleanup
     if not filename:
@@ -222,7 +356,7 @@ def exec_cleanup():
         debug('cleanup file not found / not executable, skipping')
         return
 
-    signal.signal(signal.SIGINT, cleanup_interrupt)
+    set_handler(signal.SIGINT, cleanup_interrupt)
 
     cleanuppid = os.fork()
     if cleanuppid == 0:
@@ -231,15 +365,10 @@ def exec_cleanup():
         os.execvp(filename, [filename])
     else:
         debug('parent waiting for cleanup '+str(cleanuppid))
-        while cleanuppid != 0:
-            try:
-                os.waitpid(cleanuppid, 0)
-                cleanuppid = 0
-            except OSError as e:
-                if e.errno == errno.EINTR:
-                    pass
-                if e.errno == errno.ECHILD:
-                    cleanuppid = 0
+        status, rusage = watch(cleanuppid)
+        if status is not None:
+            rusage_report('cleanup', status, rusage)
+        cleanuppid = 0
 #
 ###
 
@@ -252,7 +381,7 @@ def test_interrupt(signum, frame):
     global testpid
 
     # ignore future INT
-    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_handler(signal.SIGINT, None)
 
     # kill frozen test + its process group
     if testpid != 0:
@@ -270,9 +399,11 @@ def exec_test():
     #  to the parent, ie. right after fork)
 
     # beaker LWD
-    signal.signal(signal.SIGHUP, beah_lwd_action)
+    set_handler(signal.SIGHUP, beah_lwd_action)
     # user interrupt
-    signal.signal(signal.SIGINT, test_interrupt)
+    set_handler(signal.SIGINT, test_interrupt)
+    # wakes the event loop up when pidfd is not available
+    set_handler(signal.SIGCHLD, lambda signum, frame: None)
 
     # fork and exec the test, wait for it in the parent process
     global testpid
@@ -287,18 +418,267 @@ def exec_test():
 
     else:
         debug('parent waiting for test '+str(testpid))
-        while testpid != 0:
+        status, rusage = watch(testpid)
+        if status is not None:
+            rusage_report('test', status, rusage)
+            # processes of the test which outlived it, unless they were killed
+            if not os.WIFSIGNALED(status):
+                try:
+                    os.killpg(testpid, 0)
+                    debug('processes left in test process group '+str(testpid))
+                except OSError:
+                    pass
+        testpid = 0
+#
+###
+
+
+### PARALLEL SCHEDULER
+#
+# runs tests from a list concurrently, the test and then its cleanup run in
+# one slot, each test with its own BEAKERLIB_DIR and TESTWATCHER_CLPATH
+# - a test running longer than the timeout is SIGKILLed like on LWD and its
+#   cleanup gets ewd_maxsecs to finish
+# - SIGHUP (LWD) stops starting new tests, kills running tests and gives
+#   running cleanups ewd_maxsecs to finish
+# - SIGINT stops starting new tests and kills running tests, each next
+#   SIGINT kills running cleanups
+class Job(object):
+    def __init__(self, index, command, basedir):
+        self.index = index
+        self.command = command
+        self.dir = os.path.join(basedir, '%03d' % index)
+        self.clpath = os.path.join(self.dir, 'cleanup-path')
+        self.pid = 0
+        self.pidfd = None
+        # 'test', 'cleanup' or None when not running
+        self.phase = None
+        self.slot = None
+        self.cpu = None
+        self.deadline = None
+        self.timed_out = False
+        self.result = 'NOTRUN'
+        self.duration = 0.0
+        self.start = None
+
+
+scheduler_running = []
+scheduler_stopped = False
+
+
+def scheduler_spawn(job, argv):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.setpgrp()
+            if job.cpu is not None:
+                os.sched_setaffinity(0, [job.cpu])
+            log = os.open(os.path.join(job.dir, 'output.log'),
+                          os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            os.dup2(log, 1)
+            os.dup2(log, 2)
+            os.environ['BEAKERLIB_DIR'] = job.dir
+            os.environ['TESTWATCHER_CLPATH'] = job.clpath
+            os.execvp(argv[0], argv)
+        except Exception as e:
+            print('TESTWATCHER fatal: cannot execute '+argv[0]+': '+str(e), file=sys.stderr)
+        finally:
+            os._exit(127)
+    job.pid = pid
+    job.pidfd = open_pidfd(pid)
+
+
+def scheduler_kill(phase, ewd):
+    for job in scheduler_running:
+        if job.phase == phase:
+            if ewd:
+                job.deadline = monotonic() + ewd_maxsecs
+            else:
+                sigpgkill_safe(job.pid)
+
+
+# called when LWD expires
+def scheduler_lwd_action(signum, frame):
+    debug('beah LWD expired')
+    global scheduler_stopped
+    set_handler(signal.SIGHUP, None)
+    scheduler_stopped = True
+    scheduler_kill('test', False)
+    scheduler_kill('cleanup', True)
+    if beah:
+        beah_warn('local watchdog')
+
+
+# executed by INT sent to the test watcher process
+def scheduler_interrupt(signum, frame):
+    global scheduler_stopped
+    if not scheduler_stopped:
+        debug('tests interrupted')
+        scheduler_stopped = True
+        scheduler_kill('test', False)
+    else:
+        debug('cleanups interrupted')
+        scheduler_kill('cleanup', False)
+    if beah:
+        beah_warn('test interrupt')
+
+
+# called when the test or cleanup of the job is reaped
+def scheduler_finish(job, status, rusage):
+    if job.pidfd is not None:
+        os.close(job.pidfd)
+        job.pidfd = None
+    name = '%s %d' % (job.phase, job.index)
+    rusage_report(name, status, rusage)
+    job.deadline = None
+    if job.phase == 'test':
+        job.duration = monotonic() - job.start
+        if job.timed_out:
+            job.result = 'TIMEOUT'
+        elif os.WIFSIGNALED(status):
+            job.result = 'KILLED'
+        else:
+            job.result = 'PASS' if os.WEXITSTATUS(status) == 0 else 'FAIL'
+        try:
+            filename = open(job.clpath).read().strip()
+        except IOError:
+            filename = ''
+        if filename and os.path.isfile(filename) and os.access(filename, os.X_OK):
+            job.phase = 'cleanup'
+            # cleanup of a killed test has only till EWD
+            if job.timed_out or job.result == 'KILLED':
+                job.deadline = monotonic() + ewd_maxsecs
+            debug('executing cleanup %d at %s' % (job.index, filename))
+            scheduler_spawn(job, [filename])
+            return
+    job.phase = None
+    scheduler_running.remove(job)
+
+
+def schedule(commands, jobs, cpus, timeout, basedir):
+    queue = [Job(index, command, basedir) for index, command in enumerate(commands, 1)]
+    alljobs = list(queue)
+    slots = list(range(jobs))
+
+    set_handler(signal.SIGHUP, scheduler_lwd_action)
+    set_handler(signal.SIGINT, scheduler_interrupt)
+    # wakes the event loop up when pidfd is not available
+    set_handler(signal.SIGCHLD, lambda signum, frame: None)
+
+    while scheduler_running or (queue and not scheduler_stopped):
+        busy = [job.slot for job in scheduler_running]
+        while queue and not scheduler_stopped and len(scheduler_running) < jobs:
+            job = queue.pop(0)
+            job.slot = [slot for slot in slots if slot not in busy][0]
+            busy.append(job.slot)
+            if cpus:
+                job.cpu = cpus[job.slot % len(cpus)]
+            try:
+                os.makedirs(job.dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            open(job.clpath, 'w').close()
+            job.phase = 'test'
+            job.start = monotonic()
+            if timeout:
+                job.deadline = job.start + timeout
+            scheduler_spawn(job, ['/bin/sh', '-c', job.command])
+            debug('test %d started: %s' % (job.index, job.command))
+            scheduler_running.append(job)
+
+        handle_signals()
+        now = monotonic()
+        for job in scheduler_running:
+            if job.deadline is not None and now >= job.deadline:
+                debug('%s %d timed out' % (job.phase, job.index))
+                job.deadline = None
+                job.timed_out = job.timed_out or job.phase == 'test'
+                sigpgkill_safe(job.pid)
+
+        while scheduler_running:
             try:
-                # wait for entire process group
-                os.waitpid(testpid, 0)
-                testpid = 0
+                pid, status, rusage = os.wait4(-1, os.WNOHANG)
             except OSError as e:
-                # no traceback if interrupted by a signal
                 if e.errno == errno.EINTR:
-                    pass
-                # safety measure, shouldn't happen
-                if e.errno == errno.ECHILD:
-                    testpid = 0
+                    continue
+                break
+            if not pid:
+                break
+            for job in scheduler_running:
+                if job.pid == pid:
+                    scheduler_finish(job, status, rusage)
+                    break
+
+        if scheduler_running and (len(scheduler_running) == jobs or not queue or scheduler_stopped):
+            deadlines = [job.deadline for job in scheduler_running if job.deadline is not None]
+            wait_event([job.pidfd for job in scheduler_running if job.pidfd is not None],
+                       max(0, min(deadlines) - monotonic()) if deadlines else None)
+
+    summary = ['%-7s %9.3fs  %s  %s' % (job.result, job.duration, job.dir, job.command)
+               for job in alljobs]
+    results = [job.result for job in alljobs]
+    summary.append('%d tests: %s' % (len(alljobs), ', '.join(
+        '%d %s' % (results.count(result), result)
+        for result in ('PASS', 'FAIL', 'TIMEOUT', 'KILLED', 'NOTRUN') if result in results)))
+    f = open(os.path.join(basedir, 'summary'), 'w')
+    f.write('\n'.join(summary)+'\n')
+    f.close()
+    print('\n'.join(summary))
+    return results.count('PASS') == len(results)
+
+
+# parses CPU list like 0-3,8
+def parse_cpus(value):
+    cpus = []
+    for part in value.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def main_parallel(args):
+    from optparse import OptionParser
+    parser = OptionParser(usage='%prog --parallel [options] LIST|-',
+                          description='Runs test commands from LIST, one per line, concurrently.')
+    parser.add_option('-j', '--jobs', type='int', default=0,
+                      help='number of tests running at once, number of CPUs by default')
+    parser.add_option('--cpus', default=None,
+                      help='pin tests to the CPUs, each test to one, like 0-3,8')
+    parser.add_option('--timeout', type='float', default=0,
+                      help='seconds after which a test is killed like on LWD')
+    parser.add_option('--dir', default=None,
+                      help='directory for BEAKERLIB_DIRs of the tests')
+    (options, args) = parser.parse_args(args)
+    if len(args) != 1:
+        parser.error('list of tests is needed')
+
+    cpus = None
+    if options.cpus:
+        if not hasattr(os, 'sched_setaffinity'):
+            fatal('CPU pinning is not supported by this python')
+        cpus = parse_cpus(options.cpus)
+        if not set(cpus) <= os.sched_getaffinity(0):
+            fatal('CPUs not available: '+options.cpus)
+    jobs = options.jobs
+    if jobs <= 0:
+        if cpus:
+            jobs = len(cpus)
+        elif hasattr(os, 'sched_getaffinity'):
+            jobs = len(os.sched_getaffinity(0))
+        else:
+            import multiprocessing
+            jobs = multiprocessing.cpu_count()
+
+    lines = sys.stdin if args[0] == '-' else open(args[0])
+    commands = [line.strip() for line in lines
+                if line.strip() and not line.strip().startswith('#')]
+    basedir = options.dir or tempfile.mkdtemp(prefix='testwatcher-', dir='/var/tmp') # no-reboot
+    debug('running %d tests, %d at once, in %s' % (len(commands), jobs, basedir))
+    return schedule(commands, jobs, cpus, options.timeout, basedir)
 #
 ###
 
@@ -307,11 +687,18 @@ def exec_test():
 #
 # sanity check
 if len(sys.argv) < 2:
-    fatal('usage: '+selfname+' <command> [args]')
+    fatal('usage: '+selfname+' <command> [args]\n'
+          '       '+selfname+' --parallel [options] LIST|-')
 
 if beah:
     beah_lwd_hook()
 
+if sys.argv[1] == '--parallel':
+    passed = main_parallel(sys.argv[2:])
+    os.unlink(clpath)
+    debug('all done, finishing watcher')
+    sys.exit(0 if passed else 1)
+
 exec_test()
 debug('parent done waiting for test')
 
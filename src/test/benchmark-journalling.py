@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+#
+# Description: Benchmarks stages of the journalling pipeline on synthetic
+#              metafiles of growing size and compares them with a baseline
+#
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted
+# material is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+# or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License
+# for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+# Each stage is measured separately on the same synthetic metafile:
+#   parse      parseLine of all lines
+#   build      JournalTree built of the parsed records
+#   xslt       transformation of the built tree by xunit.xsl
+#   serialize  the built tree written as by saveJournal
+#   stream     JournalStream fed by the parsed records and saved, which is
+#              the conversion done without XSL transformation
+#   write      __INTERNAL_WriteToMetafile called in bash, in both formats
+#
+# Metafiles hold the given number of records in phases of one of the shapes:
+#   wide       flat phases of 10 records each
+#   deep       chains of phases nested 20 levels deep
+#
+# The best time of the repeats is kept for each stage, shape and size. The
+# results are printed as scaling curves with time per record and exponent
+# of growth between the sizes, where 1 is linear. They are stored as JSON,
+# and compared with a stored baseline; slowdown beyond the threshold is
+# a regression and the benchmark fails.
+
+from __future__ import division, print_function
+import base64
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+BEAKERLIB = os.path.dirname(TEST_DIR)
+sys.path.insert(0, os.path.join(BEAKERLIB, "python"))
+import journalling
+
+try:
+    clock = time.monotonic
+except AttributeError:
+    clock = time.time
+
+BASELINE = os.path.join(TEST_DIR, ".benchmark-journalling.json")
+BASELINE_VERSION = 1
+STAGES = ("parse", "build", "xslt", "serialize", "stream", "write")
+SHAPES = ("wide", "deep")
+# Records of a wide phase and nesting of a deep chain of phases
+PHASE_RECORDS = 10
+CHAIN_DEPTH = 20
+# Differences smaller than this are noise whatever the ratio is
+NOISE = 0.005
+
+
+def encode(text):
+    return base64.b64encode(text.encode()).decode()
+
+
+# Returns lines of a text metafile with the number of records, including
+# the header, in phases of the shape
+def generateMetafile(records, shape):
+    lines = ["test_id --timestamp=1000000000 -- %s" % encode("123456"),
+             "testname --timestamp=1000000000 -- %s" % encode("benchmark"),
+             "starttime --timestamp=1000000000",
+             "endtime --timestamp=1000000000",
+             "log --timestamp=1000000000"]
+    pass_result = encode("PASS")
+    number = 0
+    while len(lines) < records:
+        number += 1
+        timestamp = 1000000000 + number
+        depth = CHAIN_DEPTH if shape == "deep" else 1
+        for level in range(1, depth + 1):
+            lines.append("%sphase --timestamp=%d --name=%s --type=%s" % (
+                " " * level, timestamp, encode("Phase %d.%d" % (number, level)), encode("FAIL")))
+            count = PHASE_RECORDS if shape == "wide" else 2
+            for record in range(count // 2):
+                lines.append("%s message --timestamp=%d --severity=%s -- %s" % (
+                    " " * level, timestamp, encode("LOG"), encode("Message %d of phase %d" % (record, number))))
+                lines.append("%s test --timestamp=%d --message=%s -- %s" % (
+                    " " * level, timestamp, encode("Assert %d <&>" % record), pass_result))
+        for level in range(depth, 0, -1):
+            lines.append("%s--timestamp=%d --result=%s --score=%s" % (
+                " " * level, timestamp, pass_result, encode("0")))
+    return [line + "\n" for line in lines]
+
+
+# Returns the best wall time of the repeats of function called with the
+# result of setup, which is not measured
+def measure(repeat, function, setup=lambda: None):
+    best = None
+    for i in range(repeat):
+        argument = setup()
+        start = clock()
+        function(argument)
+        elapsed = clock() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def parseAll(lines):
+    return [journalling.parseLine(line) for line in lines]
+
+
+def buildTree(parsed):
+    tree = journalling.JournalTree()
+    for record in parsed:
+        tree.feedParsed(*record)
+    return tree.getJournal()
+
+
+def streamJournal(parsed):
+    stream = journalling.JournalStream()
+    for record in parsed:
+        stream.feedParsed(*record)
+    stream.save(io.BytesIO())
+
+
+def serializeJournal(journal):
+    journalling.etree.tostring(journal, xml_declaration=True, encoding='utf-8', pretty_print=True)
+
+
+# Returns time of records written by __INTERNAL_WriteToMetafile in bash,
+# measured in the shell itself so starting it is not counted
+def writeMetafile(records, compact):
+    directory = tempfile.mkdtemp(prefix="beakerlib-benchmark-")
+    metafile = os.path.join(directory, "journal.meta")
+    script = """
+        . "$BEAKERLIB/beakerlib.sh" || exit 1
+        export __INTERNAL_BEAKERLIB_METAFILE="$1" __INTERNAL_METAFILE_INDENT_LEVEL=2
+        __INTERNAL_METAFILE_COMPACT="$3"
+        [[ -n "$3" ]] && echo "#beakerlib-metafile compact" > "$1"
+        start=$(date +%s%N)
+        for ((i=0; i<$2; i++)); do
+            __INTERNAL_WriteToMetafile test --message "Assert $i <&>" -- "PASS"
+        done
+        echo $(( $(date +%s%N) - start ))
+    """
+    environment = dict(os.environ, BEAKERLIB=BEAKERLIB, BEAKERLIB_DIR=directory)
+    try:
+        output = subprocess.check_output(["bash", "-c", script, "bash", metafile, str(records),
+                                          "1" if compact else ""], env=environment)
+    finally:
+        for name in os.listdir(directory):
+            os.unlink(os.path.join(directory, name))
+        os.rmdir(directory)
+    return int(output.split()[-1]) / 1e9
+
+
+# Returns results of the stages on metafiles of the sizes as a dictionary
+# by 'stage shape size'
+def runBenchmarks(stages, shapes, sizes, write_sizes, repeat, xslt):
+    results = {}
+
+    def add(stage, shape, size, seconds):
+        results["%s %s %d" % (stage, shape, size)] = {
+            "stage": stage, "shape": shape, "records": size, "seconds": round(seconds, 6)}
+        print("%-9s %-7s %8d records: %.3f s" % (stage, shape, size, seconds))
+        sys.stdout.flush()
+
+    for shape in shapes:
+        for size in sizes:
+            lines = generateMetafile(size, shape)
+            parsed = parseAll(lines)
+            if "parse" in stages:
+                add("parse", shape, size, measure(repeat, parseAll, lambda: lines))
+            if "build" in stages:
+                add("build", shape, size, measure(repeat, buildTree, lambda: parsed))
+            if "stream" in stages:
+                add("stream", shape, size, measure(repeat, streamJournal, lambda: parsed))
+            if "xslt" in stages or "serialize" in stages:
+                journal = buildTree(parsed)
+                if "serialize" in stages:
+                    add("serialize", shape, size, measure(repeat, serializeJournal, lambda: journal))
+                if "xslt" in stages:
+                    add("xslt", shape, size,
+                        measure(repeat, lambda journal: journalling.transformJournal(xslt, journal), lambda: journal))
+                journal = None
+            # The next metafile does not need to fit into memory with this one
+            lines = parsed = None
+    if "write" in stages:
+        for size in write_sizes:
+            for shape, compact in (("text", False), ("compact", True)):
+                add("write", shape, size, min(writeMetafile(size, compact) for i in range(repeat)))
+    return results
+
+
+# Prints time per record and growth exponent of each curve of results
+def printCurves(results):
+    curves = {}
+    for result in results.values():
+        curves.setdefault((result["stage"], result["shape"]), []).append(result)
+    print("\nScaling:")
+    print("%-9s %-7s %8s %10s %12s %8s" % ("stage", "shape", "records", "seconds", "us/record", "growth"))
+    for stage, shape in sorted(curves):
+        previous = None
+        for result in sorted(curves[(stage, shape)], key=lambda result: result["records"]):
+            growth = ""
+            if previous and previous["seconds"] > 0 and result["seconds"] > 0:
+                growth = "%.2f" % (math.log(result["seconds"] / previous["seconds"]) /
+                                   math.log(result["records"] / previous["records"]))
+            print("%-9s %-7s %8d %10.3f %12.2f %8s" % (stage, shape, result["records"], result["seconds"],
+                                                      1e6 * result["seconds"] / result["records"], growth))
+            previous = result
+
+
+# Compares results with the baseline, returns number of regressions
+def compareBaseline(results, baseline, threshold):
+    regressions = 0
+    print("\nComparison with baseline:")
+    for key in sorted(results, key=lambda key: (results[key]["stage"], results[key]["shape"],
+                                                results[key]["records"])):
+        if key not in baseline:
+            continue
+        old = baseline[key]["seconds"]
+        new = results[key]["seconds"]
+        ratio = new / old if old else 1.0
+        if ratio > 1 + threshold and new - old > NOISE:
+            state = "REGRESSION"
+            regressions += 1
+        elif ratio < 1 - threshold and old - new > NOISE:
+            state = "IMPROVEMENT"
+        else:
+            state = "OK"
+        print("[%s] %s: %.3f s, baseline %.3f s, %+.1f%%" % (state, key, new, old, 100 * (ratio - 1)))
+    return regressions
+
+
+def loadBaseline(path):
+    try:
+        data = json.load(open(path))
+    except (IOError, ValueError):
+        return None
+    if data.get("version") != BASELINE_VERSION:
+        return None
+    return data["results"]
+
+
+def saveResults(path, results):
+    data = {"version": BASELINE_VERSION, "python": platform.python_version(),
+            "host": platform.node(), "created": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}
+    output = open(path + ".tmp", "w")
+    json.dump(data, output, indent=1, sort_keys=True)
+    output.close()
+    os.rename(path + ".tmp", path)
+
+
+def parseList(value, choices=None):
+    items = [item for item in value.split(",") if item]
+    if choices is not None:
+        unknown = [item for item in items if item not in choices]
+        if unknown:
+            raise ValueError("unknown %s" % ", ".join(unknown))
+    return items
+
+
+def main():
+    optparser = OptionParser(usage="%prog [options]",
+                             description="Benchmarks stages of the journalling pipeline on synthetic metafiles.")
+    optparser.add_option("--sizes", default="10000,100000,1000000",
+                         help="records of the metafiles, 10000,100000,1000000 by default")
+    optparser.add_option("--write-sizes", default="100,1000", dest="write_sizes",
+                         help="records written in bash, 100,1000 by default")
+    optparser.add_option("--stages", default=",".join(STAGES),
+                         help="stages to measure, %s by default" % ",".join(STAGES))
+    optparser.add_option("--shapes", default=",".join(SHAPES),
+                         help="shapes of phases, %s by default" % ",".join(SHAPES))
+    optparser.add_option("-r", "--repeat", type="int", default=3,
+                         help="repeats of each measurement, the best one is kept, 3 by default")
+    optparser.add_option("-b", "--baseline", default=BASELINE, metavar="FILE",
+                         help="baseline to compare with, %s by default" % os.path.basename(BASELINE))
+    optparser.add_option("-s", "--save", action="store_true", default=False,
+                         help="store the results as the new baseline")
+    optparser.add_option("-o", "--output", default=None, metavar="FILE",
+                         help="store the results as JSON to the file")
+    optparser.add_option("-t", "--threshold", type="float", default=0.25,
+                         help="relative slowdown which is a regression, 0.25 by default")
+    (options, args) = optparser.parse_args()
+
+    try:
+        sizes = [int(size) for size in parseList(options.sizes)]
+        write_sizes = [int(size) for size in parseList(options.write_sizes)]
+        stages = parseList(options.stages, STAGES)
+        shapes = parseList(options.shapes, SHAPES)
+    except ValueError as e:
+        optparser.error(str(e))
+
+    xslt = os.path.join(BEAKERLIB, "xslt-templates", "xunit.xsl")
+    results = runBenchmarks(stages, shapes, sizes, write_sizes, max(options.repeat, 1), xslt)
+    printCurves(results)
+
+    regressions = 0
+    baseline = loadBaseline(options.baseline)
+    if baseline is None:
+        print("\nNo baseline in %s" % options.baseline)
+    else:
+        regressions = compareBaseline(results, baseline, options.threshold)
+    if options.output:
+        saveResults(options.output, results)
+    if options.save:
+        if baseline:
+            # Results of stages and sizes which were not measured now are kept
+            baseline.update(results)
+            results = baseline
+        saveResults(options.baseline, results)
+        print("Baseline saved to %s" % options.baseline)
+    if regressions:
+        print("%d regressions beyond %d%%" % (regressions, 100 * options.threshold))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
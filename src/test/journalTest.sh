@@ -102,6 +102,329 @@ test_rlJournalPrint(){
     rm -rf $BEAKERLIB_DIR
 }
 
+test_rlJournalPrintOpenPhases(){
+    silentIfNotDebug 'rlPhaseStart FAIL outer'
+    silentIfNotDebug 'rlPhaseStart FAIL inner'
+    silentIfNotDebug 'rlAssert0 "passed" 0'
+    local out="$(rlJournalPrint raw)"
+    assertTrue "open phases are part of the journal" \
+            "echo \"\$out\" | grep -q '<log .*<phase [^>]*name=\"outer\".*<phase [^>]*name=\"inner\".*>PASS</test></phase></phase></log>'"
+    silentIfNotDebug 'rlPhaseEnd'
+    silentIfNotDebug 'rlPhaseEnd'
+    out="$(rlJournalPrint raw)"
+    assertTrue "closed phases get start and end time" \
+            "echo \"\$out\" | grep -q '<phase name=\"inner\" [^>]*starttime=\"[^\"]\+\" endtime=\"[^\"]\+\">'"
+    assertTrue "journal is well-formed XML" "rlJournalPrint | xmllint - >/dev/null"
+    rm -rf $BEAKERLIB_DIR
+}
+
+test_rlJournalPrintIncremental(){
+    journalReset
+    silentIfNotDebug 'rlPhaseStart FAIL first'
+    silentIfNotDebug 'rlAssert0 "first" 0'
+    rlJournalPrint raw > /dev/null
+    assertTrue "checkpoint is created" \
+            "[ -f $__INTERNAL_BEAKERLIB_METAFILE.checkpoint/state.json ]"
+    silentIfNotDebug 'rlAssert0 "second" 0'
+    silentIfNotDebug 'rlPhaseEnd'
+    silentIfNotDebug 'rlPhaseStart FAIL second'
+    silentIfNotDebug 'rlAssert0 "third" 1'
+    local out="$(rlJournalPrint raw)"
+    local full="$($__INTERNAL_JOURNALIST --metafile $__INTERNAL_BEAKERLIB_METAFILE)"
+    assertTrue "incremental journal equals full conversion" "[ \"\$out\" == \"\$full\" ]"
+    silentIfNotDebug 'rlPhaseEnd'
+    rm -rf $BEAKERLIB_DIR
+}
+
+test_rlJournalService(){
+    local BEAKERLIB_JOURNAL_SERVICE=1
+    journalReset
+    assertTrue "journal service is running" "__INTERNAL_JournalServiceAlive"
+    silentIfNotDebug 'rlPhaseStart FAIL first'
+    silentIfNotDebug 'rlAssert0 "first" 0'
+    silentIfNotDebug '( rlAssert0 "subshell" 1 )'
+    # not connected to the service, writes to the metafile directly
+    silentIfNotDebug "bash -c '. ../beakerlib.sh; rlAssert0 nested 0'"
+    local out="$(rlJournalPrint raw)"
+    assertTrue "record of nested process is in the journal" \
+            "echo \"\$out\" | grep -q 'message=\"nested (Assert: expected 0, got 0)\"'"
+    local big=$(printf '%05000d' 0)
+    # the service is a background job of this shell too
+    silentIfNotDebug "( rlAssert0 first$big 0 ) & local first=\$!; ( rlAssert0 second$big 0 ) & wait \$first \$!"
+    out="$(rlJournalPrint raw)"
+    assertTrue "big records of concurrent subshells are in the journal" \
+            "echo \"\$out\" | grep -q 'message=\"first$big ' && echo \"\$out\" | grep -q 'message=\"second$big '"
+    assertTrue "spool files of big records are removed" "! ls $BEAKERLIB_DIR/journal.spool.* &> /dev/null"
+    assertTrue "journal service is still running" "__INTERNAL_JournalServiceAlive"
+    local full="$($__INTERNAL_JOURNALIST --metafile $__INTERNAL_BEAKERLIB_METAFILE)"
+    assertTrue "journal from service equals full conversion" "[ \"\$out\" == \"\$full\" ]"
+    assertTrue "service writes records to metafile" \
+            "grep -q '^  test --timestamp=[0-9]* --message=[^ ]* -- RkFJTA==$' $__INTERNAL_BEAKERLIB_METAFILE"
+    silentIfNotDebug 'rlPhaseEnd'
+    __INTERNAL_JournalServiceStop
+    assertFalse "journal service is stopped" "__INTERNAL_JournalServiceAlive"
+    rm -rf $BEAKERLIB_DIR
+}
+
+test_rlJournalCompactMetafile(){
+    local BEAKERLIB_METAFILE_FORMAT=compact
+    journalReset
+    assertTrue "compact metafile is created" \
+            "head -n 1 $__INTERNAL_BEAKERLIB_METAFILE | grep -q '^#beakerlib-metafile compact$'"
+    silentIfNotDebug 'rlPhaseStart FAIL compact'
+    silentIfNotDebug 'rlAssert0 "ščř
+multiline" 0'
+    assertTrue "values are not encoded" \
+            "grep -q '^2 test [0-9]* message=[0-9]* =4$' $__INTERNAL_BEAKERLIB_METAFILE"
+    local out="$(rlJournalPrint raw)"
+    assertTrue "journal contains raw values" \
+            "echo \"\$out\" | grep -q 'message=\"ščř&#10;multiline (Assert: expected 0, got 0)\"[^>]*>PASS</test>'"
+    silentIfNotDebug 'rlPhaseEnd'
+    BEAKERLIB_METAFILE_FORMAT=''
+    rlJournalStart
+    assertTrue "format of existing metafile is kept" "[ -n \"\$__INTERNAL_METAFILE_COMPACT\" ]"
+    assertTrue "journal is well-formed XML" "rlJournalPrint | xmllint - >/dev/null"
+    rm -rf $BEAKERLIB_DIR
+}
+
+test_rlJournalBatch(){
+    journalReset
+    silentIfNotDebug 'rlPhaseStart FAIL batch'
+    silentIfNotDebug 'rlAssert0 "passed" 0'
+    silentIfNotDebug 'rlPhaseEnd'
+    local tmp=$(mktemp -d)
+    mkdir $tmp/first $tmp/second
+    cp $__INTERNAL_BEAKERLIB_METAFILE $tmp/first/journal.meta
+    cp $__INTERNAL_BEAKERLIB_METAFILE $tmp/second/journal.meta
+    local out
+    out="$($__INTERNAL_JOURNALIST --batch --jobs 2 "$tmp/*/journal.meta" $tmp/missing.meta 2>/dev/null)"
+    assertFalse "batch fails with a missing metafile" "[ $? -eq 0 ]"
+    assertTrue "success of each metafile is reported" \
+            "echo \"\$out\" | grep -q '^PASS $tmp/first/journal.meta$' && echo \"\$out\" | grep -q '^PASS $tmp/second/journal.meta$'"
+    assertTrue "failure of missing metafile is reported" \
+            "echo \"\$out\" | grep -q '^FAIL $tmp/missing.meta'"
+    $__INTERNAL_JOURNALIST --metafile $tmp/first/journal.meta --journal $tmp/journal.xml
+    assertTrue "journals are the same as converted one by one" \
+            "cmp $tmp/journal.xml $tmp/first/journal.xml && cmp $tmp/journal.xml $tmp/second/journal.xml"
+    rm -rf $tmp $BEAKERLIB_DIR
+}
+
+test_rlJournalStats(){
+    local BEAKERLIB_JOURNAL_STATS=$(mktemp)
+    journalReset
+    silentIfNotDebug 'rlPhaseStart FAIL stats'
+    silentIfNotDebug 'rlAssert0 "passed" 0'
+    silentIfNotDebug 'rlPhaseEnd'
+    rlJournalPrint raw > /dev/null
+    local count=$(wc -l < $BEAKERLIB_JOURNAL_STATS)
+    rlJournalPrint raw > /dev/null
+    assertTrue "statistics are appended for each journal creation" \
+            "[ $count -ge 1 -a \$(wc -l < $BEAKERLIB_JOURNAL_STATS) -eq $((count + 1)) ]"
+    assertTrue "statistics are valid JSON with stages" \
+            "head -n 1 $BEAKERLIB_JOURNAL_STATS | python -c 'import json, sys; r = json.load(sys.stdin); assert r[\"records\"] and r[\"peak_rss\"] and \"parse\" in r[\"stages\"]'"
+    assertTrue "statistics can be written to standard error output" \
+            "$__INTERNAL_JOURNALIST --metafile $__INTERNAL_BEAKERLIB_METAFILE --stats - 2>&1 >/dev/null | grep -q '\"elements\": [1-9]'"
+    rm -rf $BEAKERLIB_JOURNAL_STATS $BEAKERLIB_DIR
+}
+
+test_rlJournalIndex(){
+    local BEAKERLIB_JOURNAL_INDEX=1
+    journalReset
+    silentIfNotDebug 'rlPhaseStart FAIL first'
+    silentIfNotDebug 'rlAssert0 "failed" 1'
+    silentIfNotDebug 'rlPhaseEnd'
+    silentIfNotDebug 'rlPhaseStart WARN second'
+    silentIfNotDebug 'rlAssert0 "passed" 0'
+    rlJournalPrint raw > /dev/null
+    assertTrue "index is created with the journal" "[ -s $__INTERNAL_BEAKERLIB_JOURNAL_INDEX ]"
+    assertTrue "closed phase is read by the index" \
+            "$__INTERNAL_JOURNALIST --journal $__INTERNAL_BEAKERLIB_JOURNAL --index $__INTERNAL_BEAKERLIB_JOURNAL_INDEX --phase first | grep -q '^<phase name=\"first\" type=\"FAIL\" result=\"FAIL\".*</phase>\$'"
+    assertTrue "open phase is read by the index" \
+            "$__INTERNAL_JOURNALIST --journal $__INTERNAL_BEAKERLIB_JOURNAL --index $__INTERNAL_BEAKERLIB_JOURNAL_INDEX --phase second | grep -q '^<phase .*name=\"second\" type=\"WARN\".*passed.*</phase>\$'"
+    assertFalse "missing phase is reported" \
+            "$__INTERNAL_JOURNALIST --journal $__INTERNAL_BEAKERLIB_JOURNAL --index $__INTERNAL_BEAKERLIB_JOURNAL_INDEX --phase third"
+    echo >> $__INTERNAL_BEAKERLIB_JOURNAL
+    assertFalse "index of other journal is not used" \
+            "$__INTERNAL_JOURNALIST --journal $__INTERNAL_BEAKERLIB_JOURNAL --index $__INTERNAL_BEAKERLIB_JOURNAL_INDEX --phase first 2>/dev/null"
+    silentIfNotDebug 'rlPhaseEnd'
+    rm -rf $BEAKERLIB_DIR
+}
+
+test_rlJournalFollow(){
+    journalReset
+    local tmp=$(mktemp -d)
+    $__INTERNAL_JOURNALIST --metafile "$__INTERNAL_BEAKERLIB_METAFILE" --follow $tmp/events.json &
+    local follower=$!
+    silentIfNotDebug 'rlPhaseStart FAIL followed'
+    silentIfNotDebug 'rlAssert0 "passed" 0'
+    silentIfNotDebug 'rljAddMetric low followed_metric 42'
+    silentIfNotDebug 'rlPhaseEnd'
+    local i
+    for i in $(seq 20); do
+      grep -q '"phase-end"' $tmp/events.json 2>/dev/null && break
+      sleep 0.5
+    done
+    assertTrue "follower is running while the metafile exists" "kill -0 $follower"
+    assertTrue "phase start is reported" \
+            "grep -q '^{\"event\": \"phase-start\", \"name\": \"followed\", \"type\": \"FAIL\", \"level\": 0' $tmp/events.json"
+    assertTrue "test is reported with its phase" \
+            "grep -q '^{\"event\": \"test\", \"phase\": \"followed\", \"message\": \"passed.*\"result\": \"PASS\"' $tmp/events.json"
+    assertTrue "metric is reported" \
+            "grep -q '^{\"event\": \"metric\", \"phase\": \"followed\", \"name\": \"followed_metric\", \"type\": \"low\", \"value\": \"42\"' $tmp/events.json"
+    assertTrue "phase end is reported with the result" \
+            "grep -q '^{\"event\": \"phase-end\", \"name\": \"followed\", .*\"result\": \"PASS\"' $tmp/events.json"
+    rm -f "$__INTERNAL_BEAKERLIB_METAFILE"
+    for i in $(seq 10); do
+      kill -0 $follower 2>/dev/null || break
+      sleep 0.5
+    done
+    assertFalse "follower ends once the metafile is removed" "kill -0 $follower 2>/dev/null"
+    kill $follower 2>/dev/null
+    rm -rf $tmp $BEAKERLIB_DIR
+}
+
+test_rlJournalPrintXSLT(){
+    local BEAKERLIB_JOURNAL="xunit.xsl"
+    journalReset
+    silentIfNotDebug 'rlPhaseStart FAIL first'
+    silentIfNotDebug 'rlAssert0 "failed" 1'
+    silentIfNotDebug 'rlPhaseEnd'
+    silentIfNotDebug 'rlPhaseStart FAIL second'
+    silentIfNotDebug 'rlAssert0 "passed" 0'
+    local out="$(rlJournalPrint raw)"
+    assertTrue "journal is transformed by the template" \
+            "echo \"\$out\" | grep -q '<testsuite name=\"[^\"]*\" tests=\"2\" failures=\"1\"'"
+    assertTrue "closed phase is transformed" \
+            "echo \"\$out\" | grep -q '<testcase name=\"first\" assertions=\"1\">'"
+    assertTrue "open phase is transformed" \
+            "echo \"\$out\" | grep -q '<testcase name=\"second\" assertions=\"1\"'"
+    silentIfNotDebug 'rlPhaseEnd'
+    __INTERNAL_XSLT=''
+    rm -rf $BEAKERLIB_DIR
+}
+
+test_rlJournalReports(){
+    journalReset
+    silentIfNotDebug 'rlPhaseStart FAIL first'
+    silentIfNotDebug 'rlAssert0 "failed" 1'
+    silentIfNotDebug 'rlPhaseEnd'
+    silentIfNotDebug 'rlPhaseStart FAIL second'
+    silentIfNotDebug 'rlAssert0 "passed" 0'
+    local tmp=$(mktemp -d)
+    $__INTERNAL_JOURNALIST --metafile "$__INTERNAL_BEAKERLIB_METAFILE" \
+        --xslt "$BEAKERLIB/xslt-templates/xunit.xsl" --journal $tmp/xslt.xml
+    assertTrue "reports are created with the journal" \
+            "$__INTERNAL_JOURNALIST --metafile '$__INTERNAL_BEAKERLIB_METAFILE' --journal $tmp/journal.xml --xunit $tmp/xunit.xml --json $tmp/journal.json"
+    assertTrue "xunit report matches the xunit.xsl template" \
+            "cmp $tmp/xslt.xml $tmp/xunit.xml"
+    assertTrue "json report is valid" \
+            "python -c 'import json, sys; json.load(open(sys.argv[1]))' $tmp/journal.json"
+    assertTrue "json report contains phases" \
+            "grep -q '\"name\": \"second\"' $tmp/journal.json"
+    silentIfNotDebug 'rlPhaseEnd'
+    rm -rf $tmp $BEAKERLIB_DIR
+}
+
+test_journalCompareNested(){
+    local tmp=$(mktemp -d)
+    cat > $tmp/old.xml <<EOF
+<BEAKER_TEST><log><phase name="outer" type="FAIL" result="FAIL"><test message="outer test">PASS</test>
+<phase name="inner" type="FAIL" result="FAIL"><test message="inner test">FAIL</test>
+<metric name="inner_metric" type="low" value="10" tolerance="0.1"/></phase></phase></log></BEAKER_TEST>
+EOF
+    sed -e 's/>FAIL<\/test>/>PASS<\/test>/' -e 's/value="10"/value="20"/' $tmp/old.xml > $tmp/new.xml
+    local out="$($BEAKERLIB/python/journal-compare.py $tmp/old.xml $tmp/new.xml)"
+    assertTrue "nested phase is compared before the enclosing one" \
+            "echo \"\$out\" | grep 'comparing phase' | head -n 1 | grep -q 'phase inner'"
+    assertTrue "tests of nested phase count in the enclosing phase" \
+            "echo \"\$out\" | sed -n '/comparing phase outer/,\$p' | grep -qx '\[PASS\] inner test'"
+    assertTrue "metrics of nested phase count in the enclosing phase" \
+            "echo \"\$out\" | sed -n '/comparing phase outer/,\$p' | grep -q '^\[FAIL\] inner_metric '"
+    rm -rf $tmp
+}
+
+test_journalCompareSets(){
+    local tmp=$(mktemp -d) value
+    # means 11 and 13 with standard deviation 1 in three runs give t = 2.449
+    # with 4 degrees of freedom, one-sided p-value 0.0352
+    for value in 10 11 12 13 14; do
+        cat > $tmp/run$value.xml <<EOF
+<BEAKER_TEST><log><phase name="bench" type="FAIL" result="PASS"><test message="bench">PASS</test>
+<metric name="time" type="low" value="$value" tolerance="0.1"/>
+<metric name="noise" type="low" value="$value" tolerance="0.5"/>
+<metric name="speed" type="high" value="$value" tolerance="0.1"/></phase></log></BEAKER_TEST>
+EOF
+    done
+    local compare="$BEAKERLIB/python/journal-compare.py -b $tmp/run10.xml -b $tmp/run11.xml -b $tmp/run12.xml -c $tmp/run12.xml -c $tmp/run13.xml -c $tmp/run14.xml"
+    local out="$($compare)"
+    assertTrue "significant regression beyond tolerance fails" \
+            "echo \"\$out\" | grep '^\[FAIL\] time ' | grep -q 'confidence of regression 96.48%'"
+    assertTrue "significant regression within tolerance warns" "echo \"\$out\" | grep -q '^\[WARN\] noise '"
+    assertTrue "improvement passes" "echo \"\$out\" | grep -q '^\[PASS\] speed '"
+    assertFalse "failed comparison returns 1" "$compare > /dev/null"
+    assertTrue "regression below the confidence level passes" \
+            "$compare --confidence 0.99 | grep -q '^\[PASS\] time '"
+    assertTrue "single runs are compared by tolerance" \
+            "$BEAKERLIB/python/journal-compare.py -b $tmp/run10.xml -c $tmp/run14.xml | grep '^\[FAIL\] time ' | grep -q 'not enough runs'"
+    rm -rf $tmp
+}
+
+test_journalHistory(){
+    local tmp=$(mktemp -d) run hour zone
+    # runs each hour with growing time, every other one in another time zone
+    # so the text of start times does not sort
+    for run in 0 1 2 3 4; do
+        hour=$(( 10 + run )) zone=UTC
+        [[ $(( run % 2 )) -eq 1 ]] && hour=$(( 12 + run )) zone=+02:00
+        cat > $tmp/run$run.xml <<EOF
+<BEAKER_TEST><testname>bench</testname><hostname>host1</hostname><starttime>2024-07-17 $hour:00:00 $zone</starttime>
+<log><phase name="measure" type="FAIL" result="PASS"><test message="measure">PASS</test>
+<metric name="time" type="low" value="1$run" tolerance="0.1"/>
+<metric name="stable" type="low" value="10" tolerance="0.1"/></phase></log></BEAKER_TEST>
+EOF
+    done
+    local history="$BEAKERLIB/python/journal-history.py --database $tmp/history.db"
+    assertTrue "journals are added to the history" \
+            "[ \$($history ingest $tmp/run4.xml $tmp/run3.xml $tmp/run2.xml $tmp/run1.xml $tmp/run0.xml | grep -c '^ADDED ') -eq 5 ]"
+    assertTrue "journal already in the history is not added again" "$history ingest $tmp/run2.xml | grep -q '^KNOWN '"
+    local out="$($history drift)"
+    assertTrue "monotonic growth of metric is a drift" \
+            "echo \"\$out\" | grep -q '^\[DRIFT\] bench on host1, phase measure, metric time: 5 runs, change +40.00%'"
+    assertTrue "constant metric is not a drift" "echo \"\$out\" | grep -q '^\[OK\] bench on host1, phase measure, metric stable: 5 runs'"
+    assertFalse "drift returns 1" "$history drift > /dev/null"
+    assertTrue "filter of metric is applied" "[ \$($history drift --metric stable | wc -l) -eq 1 ]"
+    assertTrue "only the last runs are checked" "$history drift --last 3 --metric time | grep -q ': 3 runs, change +16.67%'"
+    rm -rf $tmp
+}
+
+test_journalMerge(){
+    local tmp=$(mktemp -d)
+    cat > $tmp/first.xml <<EOF
+<BEAKER_TEST><testname>first</testname><starttime>2024-07-17 10:00:00 UTC</starttime><endtime>2024-07-17 10:50:00 UTC</endtime>
+<log><phase name="a" type="FAIL" result="PASS" starttime="2024-07-17 10:00:00 UTC"><test message="a">PASS</test></phase>
+<phase name="c" type="FAIL" result="FAIL" starttime="2024-07-17 10:20:00 UTC"><test message="c">FAIL</test></phase></log></BEAKER_TEST>
+EOF
+    # starts 09:05 UTC and ends 10:40 UTC, text of the times sorts otherwise
+    cat > $tmp/second.xml <<EOF
+<BEAKER_TEST><testname>second</testname><starttime>2024-07-17 11:05:00 +02:00</starttime><endtime>2024-07-17 12:40:00 +02:00</endtime>
+<log><phase name="b" type="FAIL" result="PASS" starttime="2024-07-17 12:10:00 +02:00"><test message="b">PASS</test></phase>
+<phase name="d" type="WARN" result="PASS"><test message="d">PASS</test></phase></log></BEAKER_TEST>
+EOF
+    local merge="$BEAKERLIB/python/journal-merge.py"
+    assertTrue "journals are merged" "$merge --output $tmp/merged.xml --xunit $tmp/xunit.xml $tmp/first.xml $tmp/second.xml"
+    assertTrue "phases are ordered by start across time zones" \
+            "[ \"\$(grep -o 'phase name=\"[a-d]\"' $tmp/merged.xml | tr -d '\n')\" == 'phase name=\"a\"phase name=\"b\"phase name=\"d\"phase name=\"c\"' ]"
+    assertTrue "merged journal starts with the earliest start" \
+            "grep -q '<starttime>2024-07-17 11:05:00 +02:00</starttime>' $tmp/merged.xml"
+    assertTrue "merged journal ends with the latest end" \
+            "grep -q '<endtime>2024-07-17 10:50:00 UTC</endtime>' $tmp/merged.xml"
+    assertTrue "phases are kept in order of the journals on request" \
+            "[ \"\$($merge --order input $tmp/first.xml $tmp/second.xml | grep -o 'phase name=\"[a-d]\"' | tr -d '\n')\" == 'phase name=\"a\"phase name=\"c\"phase name=\"b\"phase name=\"d\"' ]"
+    assertTrue "xunit report has a testsuite of each journal" \
+            "grep -q '<testsuites tests=\"4\" failures=\"1\" errors=\"0\">' $tmp/xunit.xml && [ \$(grep -c '<testsuite ' $tmp/xunit.xml) -eq 2 ]"
+    rm -rf $tmp
+}
+
 test_rlJournalPrintText(){
     #this fnc is used a lot in other function's tests
     #so here goes only some specific (regression?) tests
@@ -185,7 +508,7 @@ out: 0x2083060, size: 24, use: 0
 handler: 0x2083be0, name: ISO-8859-5, input: (nil), iconv_in: 0x2083c30
 xmlCharEncInFunc result: 21
 out: 0x2083060, size: 24, use: 21
-e2 () 84 () 96 () e2 () 84 () 96 () e2 () 84 () 96 () e2 () 84 () 96 () e2 () 84 () 96 () e2 () 84 () 96 () e2 () 84 () 96 () 
+e2 (�) 84 (�) 96 (�) e2 (�) 84 (�) 96 (�) e2 (�) 84 (�) 96 (�) e2 (�) 84 (�) 96 (�) e2 (�) 84 (�) 96 (�) e2 (�) 84 (�) 96 (�) e2 (�) 84 (�) 96 (�) 
 EOF
     assertTrue "rlLog with specific UTF-8 characters won't give a traceback" \
                "rlLog '$(cat $A2 )' &>/dev/null"
@@ -315,6 +638,34 @@ test_rlGetPhaseState(){
     assertLog "Tests for this function are included in rlGetTestState since it is more or less the same"
 }
 
+test_journalPersistentData(){
+    journalReset
+    silentIfNotDebug 'rlPhaseStartTest phase1'
+    silentIfNotDebug 'rlAssert0 "passing assert" 0'
+    silentIfNotDebug 'rlAssert0 "failing assert" 1'
+    silentIfNotDebug 'rlLogMetricLow metric1 1'
+    assertTrue "asserts are appended to the delta file" \
+        "grep -c '^test ' $__INTERNAL_PERSISTENT_DELTA | grep -qx 2"
+    silentIfNotDebug '( rlAssert0 "failing assert in subshell" 1 )'
+    rlGetPhaseState ; assertTrue "assert in subshell is loaded from the delta file" "[ $? -eq 2 ]"
+    assertFalse "metric stays unique after loading" "rlLogMetricLow metric1 1 &> /dev/null"
+    assertTrue "state is restored in a new shell" \
+        "bash -c '. ../beakerlib.sh; rlJournalStart &> /dev/null; rlGetPhaseState &> /dev/null; echo \$?' | tail -n 1 | grep -qx 2"
+    # a save interrupted after the snapshot was replaced leaves the old deltas
+    cp $__INTERNAL_PERSISTENT_DELTA $__INTERNAL_PERSISTENT_DELTA.old
+    __INTERNAL_PersistentDataSave
+    mv -f $__INTERNAL_PERSISTENT_DELTA.old $__INTERNAL_PERSISTENT_DELTA
+    assertTrue "deltas included in the snapshot are not applied again" \
+        "bash -c '. ../beakerlib.sh; rlJournalStart &> /dev/null; rlGetPhaseState &> /dev/null; echo \$?' | tail -n 1 | grep -qx 2"
+    rlGetPhaseState ; assertTrue "state is kept after the interrupted save" "[ $? -eq 2 ]"
+    silentIfNotDebug 'rlPhaseEnd'
+    assertTrue "delta file is truncated at the phase end" "[ \$(wc -l < $__INTERNAL_PERSISTENT_DELTA) -eq 1 ]"
+    local fingerprint=$(tr '\n' ' ' < $__INTERNAL_ASSERT_STATUSES | head -c -1 | sha256sum | \
+        rlHash --stdin --algorithm hex --decode | rlHash --stdin --algorithm base64 | cut -c 1-8)
+    assertTrue "asserts fingerprint is stored" \
+        "grep -qx 'TESTRESULT_ASSERTS_FINGERPRINT=$fingerprint' $__INTERNAL_TEST_RESULTS"
+}
+
 test_packageLogging(){
   journalReset
   silentIfNotDebug 'rlPhaseStartTest'
@@ -0,0 +1,83 @@
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted material
+# is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+test_rlPerfResources(){
+    journalReset
+    rlPhaseStartTest &> /dev/null
+    assertTrue "rlPerfResources returns exit code of the command" \
+        "rlPerfResources --name res1 --interval 0.01 sh -c 'dd if=/dev/zero of=/dev/null bs=1M count=50; sleep 0.2; exit 0' &> /dev/null"
+    assertFalse "rlPerfResources returns failing exit code of the command" \
+        "rlPerfResources --name res2 false &> /dev/null"
+    assertFalse "rlPerfResources fails without a command" "rlPerfResources &> /dev/null"
+    silentIfNotDebug "__INTERNAL_JournalXMLCreate"
+    local metric
+    for metric in wall_time cpu_time rss_peak rss_avg read_bytes write_bytes ctx_switches; do
+        assertTrue "metric $metric found in journal" \
+            "xmllint --format $__INTERNAL_BEAKERLIB_JOURNAL | grep '<metric.*name=\"res1_$metric\"' | grep -q 'type=\"low\"'"
+    done
+    assertTrue "resource samples stored" "[ -s $BEAKERLIB_DIR/resources-res1.bin ]"
+    assertTrue "resource samples can be printed" \
+        "$__INTERNAL_RESOURCE_MONITOR --dump $BEAKERLIB_DIR/resources-res1.bin | head -n 1 | grep -q '^time.processes.cpu.rss'"
+    assertTrue "peak of resident memory is measured" \
+        "[ \$($__INTERNAL_RESOURCE_MONITOR --dump $BEAKERLIB_DIR/resources-res1.bin | awk 'NR > 1 && \$4 > max {max = \$4} END {print max + 0}') -gt 0 ]"
+    assertTrue "wall time is not rounded up to the interval" \
+        "$__INTERNAL_RESOURCE_MONITOR --interval 2 true | awk '\$1 == \"wall_time\" {exit !(\$2 < 1)}'"
+    rlPhaseEnd &> /dev/null
+    journalReset
+}
+
+test_rlPerfBenchmark(){
+    journalReset
+    rlPhaseStartTest &> /dev/null
+    assertTrue "rlPerfBenchmark measures a command" \
+        "rlPerfBenchmark --name bench1 --error 0.5 --max-time 5 sleep 0.01 &> /dev/null"
+    assertFalse "rlPerfBenchmark returns failing exit code of the command" \
+        "rlPerfBenchmark --name bench2 false &> /dev/null"
+    assertFalse "rlPerfBenchmark fails without a command" "rlPerfBenchmark &> /dev/null"
+    assertTrue "rlPerfBenchmark does fixed warmup and limits runs" \
+        "rlPerfBenchmark --name bench3 --warmup 1 --min-runs 3 --max-runs 3 true &> /dev/null"
+    assertTrue "rlPerfBenchmark does detected warmup within limit of runs" \
+        "rlPerfBenchmark --name bench4 --error 0.9 --min-runs 2 --max-runs 3 true &> /dev/null"
+    silentIfNotDebug "__INTERNAL_JournalXMLCreate"
+    local metric
+    for metric in median p95 ci_low ci_high mean; do
+        assertTrue "metric $metric found in journal" \
+            "xmllint --format $__INTERNAL_BEAKERLIB_JOURNAL | grep '<metric.*name=\"bench1_$metric\"' | grep -q 'type=\"low\"'"
+    done
+    assertFalse "no metrics of failed benchmark" \
+        "xmllint --format $__INTERNAL_BEAKERLIB_JOURNAL | grep -q 'name=\"bench2_'"
+    assertTrue "median is at least the sleep time" \
+        "xmllint --format $__INTERNAL_BEAKERLIB_JOURNAL | grep 'name=\"bench1_median\"' | grep -q 'value=\"0\.0[1-9]'"
+    assertTrue "run times are stored" "[ \$(wc -l < $BEAKERLIB_DIR/benchmark-bench3.txt) -eq 3 ]"
+    assertTrue "warmup does not measure more runs than the limit" \
+        "[ \$(wc -l < $BEAKERLIB_DIR/benchmark-bench4.txt) -le 3 ]"
+    assertTrue "warmup does not run more times than the limit" \
+        "$__INTERNAL_BENCHMARK --error 0.9 --min-runs 2 --max-runs 3 true | grep -qx 'warmup_runs [0-3]'"
+    rlPhaseEnd &> /dev/null
+    journalReset
+}
+
+test_rlMemTree(){
+    # the memory is allocated by a child of the measured program
+    local program='python -c "x = bytearray(100 << 20); import time; time.sleep(1)" & wait'
+    assertTrue "rlMemPeak includes memory of descendants" \
+        "[ \$($BEAKERLIB/python/rlMemPeak.py bash -c '$program') -ge 100000 ]"
+    assertTrue "rlMemAvg includes memory of descendants" \
+        "[ \$($BEAKERLIB/python/rlMemAvg.py bash -c '$program') -ge 50000 ]"
+    assertTrue "rlMemPeak does not report memory of the helper" \
+        "[ \$($BEAKERLIB/python/rlMemPeak.py sleep 0.3) -lt 5000 ]"
+    assertTrue "rlMemAvg does not report memory of the helper" \
+        "[ \$($BEAKERLIB/python/rlMemAvg.py sleep 0.3) -lt 5000 ]"
+    assertTrue "rlMemPeak samples in given interval" \
+        "[ \$($BEAKERLIB/python/rlMemPeak.py -i 0.01 sleep 0.1) -gt 0 ]"
+}
@@ -0,0 +1,106 @@
+# Copyright (c) 2026 Red Hat, Inc. All rights reserved. This copyrighted material
+# is made available to anyone wishing to use, modify, copy, or
+# redistribute it subject to the terms and conditions of the GNU General
+# Public License v.2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+test_profilingProcess(){
+    local tmp=$(mktemp -d)
+    # g calls f, then f is called from main; the last two records are
+    # written by the end of the test and they are not processed
+    cat > $tmp/profile <<'EOF'
+1.000000|t.sh(4)|main|g
+1.000010|t.sh(3)|g main|g
+1.000030|t.sh(3)|g main|f
+1.000040|t.sh(2)|f g main|f
+1.000100|t.sh(2)|f g main|:
+1.000200|t.sh(5)|main|f
+1.000210|t.sh(2)|f main|f
+1.000300|t.sh(6)|main|true
+1.000400|t.sh(7)|main|true
+1.000500|t.sh(8)|main|true
+EOF
+    cat > $tmp/functions <<'EOF'
+function,hits,spent,total spent,total cummulative spent
+main,1,0.000020,0.000020,0.000300
+f,2,0.000125,0.000250,0.000250
+g,1,0.000030,0.000030,0.000190
+EOF
+    cat > $tmp/lines <<'EOF'
+line,hits,spent,total spent
+t.sh(2),3,0.000083,0.000250
+t.sh(3),2,0.000015,0.000030
+t.sh(4),1,0.000010,0.000010
+t.sh(5),1,0.000010,0.000010
+t.sh(6),1,0,0
+EOF
+    cat > $tmp/stacks <<'EOF'
+main 20
+main;f 90
+main;g 30
+main;g;f 160
+EOF
+    local processor="$BEAKERLIB/python/profiling.py"
+    assertTrue "profile is processed" \
+            "$processor --lines $tmp/lines.out --stacks $tmp/stacks.out $tmp/profile > $tmp/functions.out"
+    assertTrue "functions are ordered by inclusive time" "diff -u $tmp/functions $tmp/functions.out"
+    assertTrue "source lines are ordered by time spent on them" "diff -u $tmp/lines $tmp/lines.out"
+    assertTrue "stacks are collapsed from the outermost function" "diff -u $tmp/stacks $tmp/stacks.out"
+    assertTrue "profile is read from standard input" "$processor - < $tmp/profile | diff -u $tmp/functions -"
+    # the processing in bash computes the times by bc
+    if command -v bc &> /dev/null; then
+        assertTrue "functions are the same as of the processing in bash" \
+                "diff <(sort $tmp/functions) <(PATH=/usr/bin:/bin bash $BEAKERLIB/profiling.sh process $tmp/profile | sort)"
+    fi
+    assertFalse "missing profile fails" "$processor $tmp/missing 2> /dev/null"
+    rm -rf $tmp
+}
+
+test_profilingCapture(){
+    local tmp=$(mktemp -d) mode
+    # g calls f twice, then f is called once more; the last two records
+    # are not processed
+    cat > $tmp/test.sh <<EOF
+. $BEAKERLIB/profiling.sh
+f() { :; :; }
+g() { f; f; }
+g
+f
+true
+true
+true
+EOF
+    for mode in default.all compact.all default.calls default.2; do
+        BEAKERLIB_PROFILING=$tmp/$mode BEAKERLIB_PROFILING_FORMAT=${mode%.*} BEAKERLIB_PROFILING_SAMPLE=${mode#*.} \
+            bash $tmp/test.sh
+    done
+    local processor="$BEAKERLIB/python/profiling.py"
+    assertTrue "profile is written to the file" "grep -q '^[0-9.]*|$tmp/test.sh(2)|f g main|:$' $tmp/default.all"
+    assertTrue "default profile has no header" "! grep -q '^#' $tmp/default.all"
+    assertTrue "calls are counted in default profile" \
+            "$processor $tmp/default.all | grep -q '^f,3,' && $processor $tmp/default.all | grep -q '^g,1,'"
+
+    assertTrue "compact profile has a header" "head -n 1 $tmp/compact.all | grep -qx '#beakerlib-profile compact all'"
+    assertTrue "compact profile has no commands" "[ -z \"\$(tail -n +2 $tmp/compact.all | awk -F'|' 'NF != 3')\" ]"
+    assertTrue "calls are counted in compact profile" \
+            "$processor $tmp/compact.all | grep -q '^f,3,' && $processor $tmp/compact.all | grep -q '^g,1,'"
+
+    assertTrue "profile of calls has a header" "head -n 1 $tmp/default.calls | grep -qx '#beakerlib-profile default calls'"
+    assertTrue "only calls are recorded" "! grep -q '|:$' $tmp/default.calls"
+    assertTrue "each call is recorded" "[ \$(grep -c '|f$' $tmp/default.calls) -eq 3 ]"
+    assertTrue "returns are recorded" "[ \$(grep -c '|g main|return$' $tmp/default.calls) -eq 2 ]"
+    assertTrue "calls are counted in profile of calls" "$processor $tmp/default.calls | grep -q '^g,1,'"
+
+    assertTrue "sampled profile has a header" "head -n 1 $tmp/default.2 | grep -qx '#beakerlib-profile default 2'"
+    assertTrue "every second command is recorded" \
+            "[ \$(tail -n +2 $tmp/default.2 | wc -l) -le \$(( (\$(wc -l < $tmp/default.all) + 1) / 2 )) ]"
+    assertTrue "sampled profile is processed" "$processor $tmp/default.2 | grep -q '^f,'"
+    rm -rf $tmp
+}
@@ -275,6 +275,8 @@ export TESTID='123456'
 export TEST='beakerlib-unit-tests'
 . ../beakerlib.sh
 export __INTERNAL_JOURNALIST="$BEAKERLIB/python/journalling.py"
+export __INTERNAL_RESOURCE_MONITOR="$BEAKERLIB/python/rlResMonitor.py"
+export __INTERNAL_BENCHMARK="$BEAKERLIB/python/rlBenchmark.py"
 export OUTPUTFILE=$(mktemp) # no-reboot
 export SCOREFILE=$(mktemp) # no-reboot
 rlJournalStart
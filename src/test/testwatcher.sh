@@ -129,6 +129,15 @@ mktest test.sh 'while [ $# -gt 0 ]; do echo "> $1" >> test.log; shift; done;'
 + grep '^> second argument' test.log || fail
 rm -f test.sh test.log
 
+########
+testcase "sanity: resource usage of test and cleanup reported"
+mktest test.sh 'echo ./cleanup.sh > "$TESTWATCHER_CLPATH"' 'exit 3'
+mktest cleanup.sh 'true'
++ ./testwatcher.py ./test.sh > watcher.log
++ grep 'test exited with code 3, user .*max RSS' watcher.log || fail
++ grep 'cleanup exited with code 0, user .*max RSS' watcher.log || fail
+rm -f test.sh cleanup.sh watcher.log
+
 #
 # user-controlled (no beah) scenarios (SIGINT):
 # - test interrupted, cleanup not set up
@@ -270,6 +279,30 @@ rm -f test.sh test.log cleanup.sh cleanup.log
 
 
 
+#
+# parallel scheduler:
+# - tests run concurrently, each with its own BEAKERLIB_DIR and cleanup
+# - test exceeding the timeout is killed, its cleanup still runs
+########
+testcase "parallel: tests run concurrently with own dirs and cleanups"
+mktest cleanup.sh 'echo end > "$BEAKERLIB_DIR/cleanup.log"'
+cat > tests.list <<'EOF2'
+echo ./cleanup.sh > "$TESTWATCHER_CLPATH"; sleep 2; echo "$BEAKERLIB_DIR" > "$BEAKERLIB_DIR/test.log"
+echo ./cleanup.sh > "$TESTWATCHER_CLPATH"; sleep 2; exit 1
+echo ./cleanup.sh > "$TESTWATCHER_CLPATH"; sleep 10
+EOF2
+start=$(date +%s)
++ ./testwatcher.py --parallel --jobs 3 --timeout 4 --dir "$PWD/parallel" tests.list && fail
++ [ $(( $(date +%s) - start )) -lt 8 ] || fail
++ grep "$PWD/parallel/001" parallel/001/test.log || fail
++ grep 'end' parallel/001/cleanup.log || fail
++ grep 'end' parallel/002/cleanup.log || fail
++ grep 'end' parallel/003/cleanup.log || fail
++ grep '^PASS .*parallel/001' parallel/summary || fail
++ grep '^FAIL .*parallel/002' parallel/summary || fail
++ grep '^TIMEOUT .*parallel/003' parallel/summary || fail
+rm -rf cleanup.sh tests.list parallel
+
 ################################################################################
 
 echo